@@ -13,12 +13,14 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
+import importlib
+import sys
+import types
+
 import task
 import file  # wtf @ naming
-import rpc
 import parameter
 import configuration
-import interface
 import target
 import event
 
@@ -32,13 +34,6 @@ Target = target.Target
 File = file.File  # TODO: remove, should be LocalTarget
 LocalTarget = File
 Parameter = parameter.Parameter
-RemoteScheduler = rpc.RemoteScheduler
-RPCError = rpc.RPCError
-
-expose = interface.expose
-expose_main = interface.expose_main
-run = interface.run
-build = interface.build
 
 # TODO: how can we get rid of these?
 DateHourParameter = parameter.DateHourParameter
@@ -51,4 +46,46 @@ TimeDeltaParameter = parameter.TimeDeltaParameter
 
 namespace = task.namespace
 
+# Attributes imported on first access: name -> (module, attribute or None for
+# the module itself). The scheduler client and the command line interface
+# pull in urllib2, argparse, multiprocessing etc. which processes that only
+# define or run tasks, like Hadoop map and reduce tasks, don't need.
+_lazy_attributes = {
+    'rpc': ('luigi.rpc', None),
+    'RemoteScheduler': ('luigi.rpc', 'RemoteScheduler'),
+    'RPCError': ('luigi.rpc', 'RPCError'),
+    'interface': ('luigi.interface', None),
+    'expose': ('luigi.interface', 'expose'),
+    'expose_main': ('luigi.interface', 'expose_main'),
+    'run': ('luigi.interface', 'run'),
+    'build': ('luigi.interface', 'build'),
+}
+
+
+class _LazyModule(types.ModuleType):
+    """ The luigi package, importing the attributes in ``_lazy_attributes`` on first access. """
+
+    def __getattr__(self, name):
+        try:
+            module_name, attribute = _lazy_attributes[name]
+        except KeyError:
+            raise AttributeError("'module' object has no attribute %r" % name)
+        value = importlib.import_module(module_name)
+        if attribute is not None:
+            value = getattr(value, attribute)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_lazy_attributes))
+
+
+__all__ = sorted(name for name in globals().keys() + _lazy_attributes.keys()
+                 if not name.startswith('_') and name not in ('importlib', 'sys', 'types'))
+
+_lazy_module = _LazyModule(__name__)
+_lazy_module.__dict__.update(globals())
+_lazy_module._module = sys.modules[__name__]  # keep the original alive, or its globals are cleared
+sys.modules[__name__] = _lazy_module
+
 import tools.range  # just makes the tool classes available from command line
@@ -0,0 +1,187 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Opt-in local cache of positive ``complete()`` results, shared across runs.
+
+Recurring (e.g. cron driven) invocations keep re-checking the same outputs
+that were done long ago. With this cache enabled the worker remembers every
+task it found complete, keyed by task_id and output path, in a small SQLite
+database, and skips ``complete()`` for those tasks until the entry expires.
+
+Enable it in client.cfg::
+
+    [completeness_cache]
+    path: /var/tmp/luigi/completeness.db
+    default-ttl: 3600
+
+    [completeness_cache_ttl]
+    HdfsTarget: 86400
+    File: 600
+
+Entries are only ever written for tasks whose outputs all have a ``path``.
+``FileSystemTarget.remove`` and moves of a target invalidate the entries of
+that path. Changes made to outputs outside of Luigi are only picked up when
+the entry expires, so choose the TTLs accordingly.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from ConfigParser import NoOptionError, NoSectionError
+
+import configuration
+
+logger = logging.getLogger('luigi-interface')
+
+
+class CompletenessCache(object):
+    """ Remembers which tasks were complete, backed by a SQLite file.
+
+    Errors talking to the database are logged and treated as cache misses,
+    the cache never makes a run fail.
+    """
+
+    def __init__(self, path, default_ttl=3600, ttls=None):
+        """
+        :param str path: location of the SQLite database file.
+        :param default_ttl: seconds to trust a positive result by default.
+        :param dict ttls: target class name -> seconds, overriding the
+                          default for outputs of that type (or subclasses).
+                          A TTL of 0 means tasks with such outputs are never
+                          cached.
+        """
+        self._path = path
+        self._default_ttl = default_ttl
+        self._ttls = dict((name.lower(), ttl) for name, ttl in (ttls or {}).iteritems())
+        self._conn = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        # sqlite connections must not be shared with forked task processes
+        if self._conn is None or self._pid != os.getpid():
+            parent = os.path.dirname(self._path)
+            if parent and not os.path.exists(parent):
+                os.makedirs(parent)
+            conn = sqlite3.connect(self._path, timeout=30)
+            conn.execute('CREATE TABLE IF NOT EXISTS complete '
+                         '(task_id TEXT, path TEXT, expires REAL, PRIMARY KEY (task_id, path))')
+            conn.execute('CREATE INDEX IF NOT EXISTS complete_path ON complete (path)')
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _ttl(self, target):
+        for cls in type(target).__mro__:
+            ttl = self._ttls.get(cls.__name__.lower())
+            if ttl is not None:
+                return ttl
+        return self._default_ttl
+
+    def _outputs(self, task):
+        """ Returns [(path, ttl)] for all outputs of task or None if it can't be cached """
+        from task import flatten  # task imports target, which imports this module
+        outputs = flatten(task.output())
+        if not outputs:
+            return None
+        result = []
+        for output in outputs:
+            path = getattr(output, 'path', None)
+            ttl = self._ttl(output)
+            if not path or not ttl:
+                return None
+            result.append((path, ttl))
+        return result
+
+    def get(self, task):
+        """ Returns ``True`` if ``task`` is known to be complete, ``False`` if unknown. """
+        outputs = self._outputs(task)
+        if outputs is None:
+            return False
+        try:
+            rows = self._connection().execute(
+                'SELECT path FROM complete WHERE task_id = ? AND expires > ?',
+                (task.task_id, time.time())).fetchall()
+        except sqlite3.Error:
+            logger.warning('Failed reading completeness cache %s', self._path, exc_info=1)
+            rows = []
+        known = set(path for (path,) in rows)
+        if all(path in known for path, ttl in outputs):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def put(self, task):
+        """ Records that ``task`` is complete. """
+        outputs = self._outputs(task)
+        if outputs is None:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.executemany('INSERT OR REPLACE INTO complete (task_id, path, expires) VALUES (?, ?, ?)',
+                             [(task.task_id, path, now + ttl) for path, ttl in outputs])
+            conn.commit()
+        except sqlite3.Error:
+            logger.warning('Failed writing completeness cache %s', self._path, exc_info=1)
+
+    def invalidate(self, path):
+        """ Forgets all tasks having ``path`` as an output. """
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM complete WHERE path = ?', (path,))
+            conn.commit()
+        except sqlite3.Error:
+            logger.warning('Failed invalidating %s in completeness cache %s', path, self._path, exc_info=1)
+
+    def clear(self):
+        """ Forgets everything. """
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM complete')
+            conn.commit()
+        except sqlite3.Error:
+            logger.warning('Failed clearing completeness cache %s', self._path, exc_info=1)
+
+
+_cache = None
+
+
+def get_cache():
+    """ Returns the configured :py:class:`CompletenessCache` or ``None`` if it isn't enabled. """
+    global _cache
+    config = configuration.get_config()
+    try:
+        path = config.get('completeness_cache', 'path', None)
+    except (NoOptionError, NoSectionError):
+        return None
+    if not path:
+        return None
+    if _cache is None or _cache._path != path:
+        _cache = CompletenessCache(
+            path,
+            default_ttl=config.getint('completeness_cache', 'default-ttl', 3600),
+            ttls=config.getintdict('completeness_cache_ttl'))
+    return _cache
+
+
+def invalidate(path):
+    """ Called when a target is removed or moved away. No-op unless the cache is enabled. """
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(path)
@@ -7,6 +7,9 @@ from ConfigParser import ConfigParser, NoOptionError, NoSectionError
 class LuigiConfigParser(ConfigParser):
     NO_DEFAULT = object()
     _instance = None
+    # Incremented on every change, so that values derived from the
+    # configuration can be cached until it changes
+    generation = 0
     _config_paths = ['/etc/luigi/client.cfg', 'client.cfg']
     if 'LUIGI_CONFIG_PATH' in os.environ:
         _config_paths.append(os.environ['LUIGI_CONFIG_PATH'])
@@ -30,6 +33,26 @@ class LuigiConfigParser(ConfigParser):
     def reload(cls):
         return cls.instance().read(cls._config_paths)
 
+    def read(self, filenames):
+        self.generation += 1
+        return ConfigParser.read(self, filenames)
+
+    def readfp(self, fp, filename=None):
+        self.generation += 1
+        return ConfigParser.readfp(self, fp, filename)
+
+    def add_section(self, section):
+        self.generation += 1
+        return ConfigParser.add_section(self, section)
+
+    def remove_section(self, section):
+        self.generation += 1
+        return ConfigParser.remove_section(self, section)
+
+    def remove_option(self, section, option):
+        self.generation += 1
+        return ConfigParser.remove_option(self, section, option)
+
     def _get_with_default(self, method, section, option, default, expected_type=None):
         """ Gets the value of the section/option using method. Returns default if value
         is not found. Raises an exception if the default value is not None and doesn't match
@@ -64,6 +87,7 @@ class LuigiConfigParser(ConfigParser):
             return {}
 
     def set(self, section, option, value):
+        self.generation += 1
         if not ConfigParser.has_section(self, section):
             ConfigParser.add_section(self, section)
 
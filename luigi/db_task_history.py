@@ -21,7 +21,7 @@ from contextlib import contextmanager
 from task_status import PENDING, FAILED, DONE, RUNNING
 
 from sqlalchemy.orm.collections import attribute_mapped_collection
-from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, create_engine
+from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, case, create_engine, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
@@ -126,6 +126,23 @@ class DbTaskHistory(task_history.TaskHistory):
                 order_by(TaskEvent.ts.desc()).\
                 all()
 
+    def find_average_durations(self, task_names, limit=100, session=None):
+        ''' Return task name -> average seconds from start to success over the
+        latest (up to limit) successful runs of tasks with that name
+        '''
+        # latest RUNNING and DONE events per record, newest records first
+        started = func.max(case([(TaskEvent.event_name == RUNNING, TaskEvent.ts)]))
+        done = func.max(case([(TaskEvent.event_name == DONE, TaskEvent.ts)]))
+        durations = {}
+        with self._session(session) as session:
+            for name in set(task_names):
+                runs = session.query(started, done).select_from(TaskRecord).join(TaskEvent).\
+                    filter(TaskRecord.name == name).group_by(TaskRecord.id).\
+                    having(done >= started).order_by(TaskRecord.id.desc()).limit(limit).all()
+                if runs:
+                    durations[name] = sum((end - start).total_seconds() for start, end in runs) / len(runs)
+        return durations
+
     def find_task_by_id(self, id, session=None):
         ''' Find task with the given record ID
         '''
@@ -0,0 +1,219 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Tells what running some tasks would do, without running anything.
+
+``luigi --dry-run`` expands the dependency graph like a worker does, but
+against an in-memory planner instead of the scheduler, and prints:
+
+* the number of tasks that would run per family,
+* the missing external dependencies,
+* the critical path, i.e. the longest chain of tasks that have to run one
+  after the other,
+* an estimate of the wall time with ``--workers`` workers.
+
+Durations are the averages of earlier successful runs recorded by
+:py:class:`luigi.db_task_history.DbTaskHistory`, if it's configured.
+Families without history are assumed to take the average of the others.
+"""
+
+import collections
+import heapq
+import logging
+
+import configuration
+from task_status import PENDING
+from worker import Worker
+
+logger = logging.getLogger('luigi-interface')
+
+
+class _Planner(object):
+    ''' Stands in for the scheduler and records what the worker adds '''
+
+    def __init__(self):
+        self.tasks = {}  # task_id -> (family, status, runnable, deps)
+
+    def add_task(self, worker, task_id, status=PENDING, runnable=False, deps=None,
+                 family='', **kwargs):
+        self.tasks[task_id] = (family, status, runnable, deps or [])
+
+    def add_tasks(self, worker, tasks):
+        for kwargs in tasks:
+            self.add_task(worker, **kwargs)
+
+    def ping(self, worker):
+        pass
+
+
+def plan(tasks, workers=1, durations=None):
+    """ Expands the graph of tasks and returns a :py:class:`DryRunPlan`.
+
+    :param durations: task family -> seconds. Looked up in the task
+                      history if None.
+    """
+    planner = _Planner()
+    w = Worker(scheduler=planner, worker_id='dry-run', parallel_scheduling=True)
+    w._write_caches = False  # nothing ran, the caches must not change either
+    try:
+        for t in tasks:
+            w.add(t)
+    finally:
+        w.stop()
+    if durations is None:
+        durations = task_durations(set(family for family, _, _, _ in planner.tasks.itervalues()))
+    return DryRunPlan(planner.tasks, workers, durations)
+
+
+def task_durations(families):
+    """ Average durations of earlier runs of the families from the task
+    history database, or an empty dict if there is none """
+    config = configuration.get_config()
+    if not config.get('task_history', 'db_connection', None):
+        return {}
+    try:
+        import db_task_history
+        return db_task_history.DbTaskHistory().find_average_durations(families)
+    except Exception:
+        logger.warning('Could not read durations from the task history', exc_info=1)
+        return {}
+
+
+class DryRunPlan(object):
+    """ The incomplete part of a graph of tasks and estimates of running it """
+
+    def __init__(self, tasks, workers, durations):
+        """
+        :param dict tasks: task_id -> (family, status, runnable, deps), as
+                           added by the worker.
+        """
+        self.workers = workers
+        self.families = dict((task_id, family) for task_id, (family, _, _, _) in tasks.iteritems())
+        self.to_run = set(task_id for task_id, (_, status, runnable, _) in tasks.iteritems()
+                          if status == PENDING and runnable)
+        self.missing = sorted(task_id for task_id, (_, status, runnable, _) in tasks.iteritems()
+                              if status == PENDING and not runnable)
+        self._deps = dict((task_id, [d for d in tasks[task_id][3] if d in self.to_run])
+                          for task_id in self.to_run)
+        self._dependents = collections.defaultdict(list)
+        for task_id, deps in self._deps.iteritems():
+            for dep in deps:
+                self._dependents[dep].append(task_id)
+        self.durations = durations
+        self.unknown_families = set(self.families[t] for t in self.to_run) - set(durations)
+        self._default_duration = (sum(durations.values()) / float(len(durations))
+                                  if durations else None)
+        self._order = self._topological_order()
+
+    def duration(self, task_id):
+        """ Estimated seconds to run the task, None if nothing is known """
+        return self.durations.get(self.families[task_id], self._default_duration)
+
+    def per_family(self):
+        """ family -> number of tasks to run """
+        return collections.Counter(self.families[t] for t in self.to_run)
+
+    def _topological_order(self):
+        ''' Tasks to run, each after all its requirements '''
+        waiting = dict((task_id, len(deps)) for task_id, deps in self._deps.iteritems())
+        order = [task_id for task_id, n in waiting.iteritems() if n == 0]
+        for task_id in order:
+            for dependent in self._dependents[task_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    order.append(dependent)
+        return order
+
+    def _longest_paths(self, weight):
+        ''' task_id -> total weight of the longest chain of tasks ending in it '''
+        paths = {}
+        for task_id in self._order:
+            paths[task_id] = weight(task_id) + max([paths[d] for d in self._deps[task_id]] or [0])
+        return paths
+
+    def critical_path(self):
+        """ Returns (number of tasks, seconds or None) of the longest chain of
+        tasks that have to run one after the other """
+        if not self.to_run:
+            return 0, 0
+        length = max(self._longest_paths(lambda task_id: 1).itervalues())
+        if self._default_duration is None:
+            return length, None
+        return length, max(self._longest_paths(self.duration).itervalues())
+
+    def wall_time(self):
+        """ Estimated seconds to run everything with the given number of
+        workers, None without durations. Tasks are started greedily as soon
+        as a worker is free, the ones on the longest remaining chain first. """
+        if self._default_duration is None:
+            return None
+        dependents = self._dependents
+        waiting = dict((task_id, len(deps)) for task_id, deps in self._deps.iteritems())
+        # longest chain from each task to the end, computed backwards
+        remaining = {}
+        for task_id in reversed(self._order):
+            remaining[task_id] = self.duration(task_id) + max(
+                [remaining[d] for d in dependents[task_id]] or [0])
+
+        ready = [(-remaining[t], t) for t in self._order if waiting[t] == 0]
+        heapq.heapify(ready)
+        running = []  # (finish time, task_id)
+        now = 0.0
+        while ready or running:
+            while ready and len(running) < max(self.workers, 1):
+                _, task_id = heapq.heappop(ready)
+                heapq.heappush(running, (now + self.duration(task_id), task_id))
+            now, task_id = heapq.heappop(running)
+            for dependent in dependents[task_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, (-remaining[dependent], dependent))
+        return now
+
+    def summary(self):
+        """ Human readable report of the plan """
+        lines = ['Dry run: %d tasks to run, %d missing external dependencies'
+                 % (len(self.to_run), len(self.missing))]
+        per_family = self.per_family()
+        if per_family:
+            width = max(len(family) for family in per_family)
+            for family, count in sorted(per_family.iteritems(), key=lambda item: (-item[1], item[0])):
+                known = self.durations.get(family)
+                lines.append('  %-*s %6d  %s' % (width, family, count,
+                                                 _format_seconds(known) + ' each' if known is not None else 'no history'))
+        for task_id in self.missing:
+            lines.append('  missing: %s' % task_id)
+        length, seconds = self.critical_path()
+        if seconds is None:
+            lines.append('Critical path: %d tasks' % length)
+        else:
+            lines.append('Critical path: %d tasks, %s' % (length, _format_seconds(seconds)))
+        wall_time = self.wall_time()
+        if wall_time is None:
+            lines.append('No task history, can not estimate the wall time')
+        else:
+            lines.append('Estimated wall time with %d workers: %s' % (self.workers, _format_seconds(wall_time)))
+            if self.unknown_families:
+                lines.append('  assuming %s per task of %s' % (_format_seconds(self._default_duration),
+                                                              ', '.join(sorted(self.unknown_families))))
+        return '\n'.join(lines)
+
+
+def _format_seconds(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return '%ds' % seconds
+    if seconds < 3600:
+        return '%dm %ds' % divmod(seconds, 60)
+    return '%dh %dm' % (seconds // 3600, seconds % 3600 // 60)
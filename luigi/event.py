@@ -22,5 +22,7 @@ class Event:
     FAILURE = "event.core.failure"
     SUCCESS = "event.core.success"
     PROCESSING_TIME = "event.core.processing_time"
+    RESOURCE_USAGE = "event.core.resource_usage"  # (task, dict of CPU seconds, peak RSS, I/O bytes and context switches) when a task is done or failed
+    NEW_REQUIREMENTS_TIME = "event.core.new_requirements_time"  # (task, seconds, number of requirements) after a task yielded requirements
 
 
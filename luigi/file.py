@@ -17,6 +17,7 @@ import random
 import tempfile
 import shutil
 import luigi.util
+import completeness_cache
 from target import FileSystem, FileSystemTarget
 from luigi.format import FileWrapper
 
@@ -110,12 +111,14 @@ class File(FileSystemTarget):
         if d and not os.path.exists(d):
             self.fs.mkdir(d)
         os.rename(self.path, new_path)
+        completeness_cache.invalidate(self.path)
 
     def move_dir(self, new_path):
         self.move(new_path)
 
     def remove(self):
         self.fs.remove(self.path)
+        completeness_cache.invalidate(self.path)
 
     @luigi.util.deprecate_kwarg('fail_if_exists', 'raise_if_exists', False)
     def copy(self, new_path, fail_if_exists=False):
@@ -130,6 +133,13 @@ class File(FileSystemTarget):
     def fn(self):
         return self.path
 
+    def stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime, st.st_size)
+
     def __del__(self):
         if self.is_tmp and self.exists():
             self.remove()
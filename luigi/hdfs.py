@@ -14,6 +14,13 @@
 
 import subprocess
 import os
+import httplib
+import json
+import posixpath
+import socket
+import threading
+import time
+import urllib
 import random
 import tempfile
 import urlparse
@@ -24,6 +31,8 @@ import re
 import warnings
 from luigi.target import FileSystem, FileSystemTarget, FileAlreadyExists
 import configuration
+import completeness_cache
+import hdfs_metadata_cache
 import logging
 import getpass
 logger = logging.getLogger('luigi-interface')
@@ -100,6 +109,85 @@ def tmppath(path=None, include_unix_username=True):
 
     return os.path.join(base_dir, subdir + addon)
 
+# paths passed to a single hadoop fs command, keeps it well below ARG_MAX
+MAX_PATHS_PER_COMMAND = 500
+
+NOT_FOUND_RE = re.compile(r"^\S+: `(.*)': No such file or directory$")
+
+
+def _is_glob(path):
+    return any(c in path for c in '*?[{')
+
+
+def _glob_regex(pattern):
+    """ Compiles a hadoop glob for one path component, supporting
+    ``*``, ``?``, ``[...]``, ``[^...]`` and ``{a,b}`` """
+    regex = ''
+    braces = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '*':
+            regex += '.*'
+        elif c == '?':
+            regex += '.'
+        elif c == '[':
+            end = pattern.index(']', i)
+            regex += '[' + pattern[i + 1:end] + ']'
+            i = end
+        elif c == '{':
+            braces += 1
+            regex += '(?:'
+        elif c == '}' and braces:
+            braces -= 1
+            regex += ')'
+        elif c == ',' and braces:
+            regex += '|'
+        else:
+            regex += re.escape(c)
+        i += 1
+    return re.compile(regex + '$')
+
+
+def _normpath(path):
+    return path.rstrip('/') or '/'
+
+
+def _parse_ls(lines, ignore_directories=False, ignore_files=False,
+              include_size=False, include_type=False, include_time=False):
+    """ Parses the output of ``hadoop fs -ls``, see :py:meth:`HdfsClient.listdir` """
+    for line in lines:
+        if not line:
+            continue
+        elif line.startswith('OpenJDK 64-Bit Server VM warning') or line.startswith('It\'s highly recommended') or line.startswith('Found'):
+            continue  # "hadoop fs -ls" outputs "Found %d items" as its first line
+        elif ignore_directories and line[0] == 'd':
+            continue
+        elif ignore_files and line[0] == '-':
+            continue
+        data = line.split(' ')
+
+        file = data[-1]
+        size = int(data[-4])
+        line_type = line[0]
+        extra_data = ()
+
+        if include_size:
+            extra_data += (size,)
+        if include_type:
+            extra_data += (line_type,)
+        if include_time:
+            time_str = '%sT%s' % (data[-3], data[-2])
+            modification_time = datetime.datetime.strptime(time_str,
+                                                           '%Y-%m-%dT%H:%M')
+            extra_data += (modification_time,)
+
+        if len(extra_data) > 0:
+            yield (file,) + extra_data
+        else:
+            yield file
+
+
 def list_path(path):
     if isinstance(path, list) or isinstance(path, tuple):
         return path
@@ -115,21 +203,73 @@ class HdfsClient(FileSystem):
     def exists(self, path):
         """ Use ``hadoop fs -stat`` to check file existence
         """
+        return self._stat(path) is not None
 
-        cmd = load_hadoop_cmd() + ['fs', '-stat', path]
+    def stamp(self, path):
+        """ Returns the modification time in ms and size of path with the
+        same single ``hadoop fs -stat`` call as :py:meth:`exists`, or ``None``
+        if it doesn't exist
+        """
+        stdout = self._stat(path, '%Y %b')
+        if stdout is None:
+            return None
+        return tuple(int(field) for field in stdout.split()[-2:])
+
+    def _stat(self, path, *format):
+        cmd = load_hadoop_cmd() + ['fs', '-stat'] + list(format) + [path]
         logger.debug('Running file existence check: %s' % u' '.join(cmd))
         p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
         stdout, stderr = p.communicate()
         if p.returncode == 0:
-            return True
+            return stdout
         else:
             not_found_pattern = "^.*No such file or directory$"
             not_found_re = re.compile(not_found_pattern)
             for line in stderr.split('\n'):
                 if not_found_re.match(line):
-                    return False
+                    return None
             raise HDFSCliError(cmd, p.returncode, stdout, stderr)
 
+    def exists_many(self, paths):
+        """ Checks existence of all paths with one ``hadoop fs -ls -d`` call
+        per MAX_PATHS_PER_COMMAND paths, instead of one JVM start per path
+        """
+        paths = list(paths)
+        result = dict((path, self.exists(path)) for path in paths if _is_glob(path))
+        plain = [path for path in paths if path not in result]
+        if plain:
+            lines, missing = self._call_many(['-ls', '-d'], plain)
+            listed = set(_normpath(entry) for entry in _parse_ls(lines))
+            missing = set(_normpath(path) for path in missing)
+            for path in plain:
+                if _normpath(path) in listed:
+                    result[path] = True
+                elif _normpath(path) in missing:
+                    result[path] = False
+                else:
+                    # hadoop printed it differently, e.g. fully qualified
+                    result[path] = self.exists(path)
+        return result
+
+    def _call_many(self, args, paths):
+        """ Runs ``hadoop fs`` with args and as many paths per JVM start as
+        possible. Paths that don't exist don't fail the command, they're
+        returned as a set next to the lines of output
+        """
+        lines = []
+        missing = set()
+        for i in xrange(0, len(paths), MAX_PATHS_PER_COMMAND):
+            cmd = load_hadoop_cmd() + ['fs'] + args + paths[i:i + MAX_PATHS_PER_COMMAND]
+            logger.debug('Running batched command: %s' % u' '.join(cmd))
+            p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+            stdout, stderr = p.communicate()
+            not_found = [m.group(1) for m in map(NOT_FOUND_RE.match, stderr.split('\n')) if m]
+            if p.returncode != 0 and not not_found:
+                raise HDFSCliError(cmd, p.returncode, stdout, stderr)
+            missing.update(not_found)
+            lines.extend(stdout.split('\n'))
+        return lines, missing
+
     def rename(self, path, dest):
         parent_dir = os.path.dirname(dest)
         if parent_dir != '' and not self.exists(parent_dir):
@@ -224,37 +364,20 @@ class HdfsClient(FileSystem):
         else:
             cmd = load_hadoop_cmd() + ['fs', '-ls', path]
         lines = call_check(cmd).split('\n')
+        return _parse_ls(lines, ignore_directories, ignore_files, include_size, include_type, include_time)
 
-        for line in lines:
-            if not line:
-                continue
-            elif line.startswith('OpenJDK 64-Bit Server VM warning') or line.startswith('It\'s highly recommended') or line.startswith('Found'):
-                continue  # "hadoop fs -ls" outputs "Found %d items" as its first line
-            elif ignore_directories and line[0] == 'd':
-                continue
-            elif ignore_files and line[0] == '-':
-                continue
-            data = line.split(' ')
-
-            file = data[-1]
-            size = int(data[-4])
-            line_type = line[0]
-            extra_data = ()
-
-            if include_size:
-                extra_data += (size,)
-            if include_type:
-                extra_data += (line_type,)
-            if include_time:
-                time_str = '%sT%s' % (data[-3], data[-2])
-                modification_time = datetime.datetime.strptime(time_str,
-                                                               '%Y-%m-%dT%H:%M')
-                extra_data += (modification_time,)
-
-            if len(extra_data) > 0:
-                yield (file,) + extra_data
-            else:
-                yield file
+    def listdir_many(self, paths, ignore_directories=False, ignore_files=False,
+                     include_size=False, include_type=False, include_time=False, recursive=False):
+        """ Like :py:meth:`listdir` for each of paths, with one ``hadoop fs -ls``
+        call per MAX_PATHS_PER_COMMAND paths. Paths (or globs) that don't exist
+        are skipped instead of failing the listing
+        """
+        if recursive:
+            args = self.recursive_listdir_cmd
+        else:
+            args = ['-ls']
+        lines, missing = self._call_many(args, list(paths))
+        return _parse_ls(lines, ignore_directories, ignore_files, include_size, include_type, include_time)
 
 class SnakebiteHdfsClient(HdfsClient):
     """
@@ -323,6 +446,34 @@ class SnakebiteHdfsClient(HdfsClient):
         except Exception as err:    # IGNORE:broad-except
             raise HDFSCliError("snakebite.test", -1, str(err), repr(err))
 
+    def stamp(self, path):
+        """
+        Use snakebite.stat to get the modification time and size of path.
+
+        :param path: path to stamp
+        :type path: string
+        :return: (modification time in ms, size) or None if it doesn't exist
+        """
+        from snakebite.errors import FileNotFoundException
+        try:
+            status = self.get_bite().stat(list_path(path))
+        except FileNotFoundException:
+            return None
+        return (status['modification_time'], status['length'])
+
+    def exists_many(self, paths):
+        """
+        Checks the paths one by one, snakebite talks to the namenode directly
+        without starting a JVM.
+        """
+        return dict((path, self.exists(path)) for path in paths)
+
+    def listdir_many(self, paths, **kwargs):
+        """
+        Use snakebite.ls, which takes many paths at once.
+        """
+        return self.listdir(list(paths), **kwargs)
+
     def rename(self, path, dest):
         """
         Use snakebite.rename, if available.
@@ -482,8 +633,528 @@ class SnakebiteHdfsClient(HdfsClient):
             else:
                 yield rval[0]
 
+
+class _ConnectionPool(object):
+    """ Idle keep-alive HTTP connections per (host, port), shared by threads.
+    Connections are never shared with forked processes. """
+
+    def __init__(self, timeout=None):
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+
+    def get(self, host, port):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle = {}
+                self._pid = os.getpid()
+            idle = self._idle.get((host, port))
+            if idle:
+                return idle.pop(), True
+        return httplib.HTTPConnection(host, port, timeout=self._timeout), False
+
+    def put(self, host, port, conn):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._idle.setdefault((host, port), []).append(conn)
+
+    def clear(self):
+        with self._lock:
+            for conns in self._idle.itervalues():
+                for conn in conns:
+                    conn.close()
+            self._idle = {}
+
+
+class WebHdfsReadFile(object):
+    """ Streams an HDFS file over WebHDFS, returning the connection to the
+    pool once the whole file is read """
+
+    def __init__(self, client, response, host, port, conn):
+        self._client = client
+        self._response = response
+        self._conn = (host, port, conn)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer + self._response.read()
+            self._buffer = ''
+            self._release()
+            return data
+        while len(self._buffer) < size and self._conn:
+            chunk = self._response.read(WebHdfsClient.CHUNK_SIZE)
+            if not chunk:
+                self._release()
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self):
+        while '\n' not in self._buffer and self._conn:
+            chunk = self._response.read(WebHdfsClient.CHUNK_SIZE)
+            if not chunk:
+                self._release()
+            self._buffer += chunk
+        pos = self._buffer.find('\n') + 1 or len(self._buffer)
+        line, self._buffer = self._buffer[:pos], self._buffer[pos:]
+        return line
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def _release(self):
+        if self._conn:
+            host, port, conn = self._conn
+            self._client._pool.put(host, port, conn)
+            self._conn = None
+
+    def close(self):
+        if self._conn:
+            # unread data left on the connection, it can't be reused
+            self._conn[2].close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+class WebHdfsAtomicWriteFile(object):
+    """ File like object for writing to HDFS over WebHDFS
+
+    Data is spooled to a local temporary file and uploaded to a temporary
+    location on close(), then renamed to the final location, like
+    :py:class:`HdfsAtomicWritePipe`.
+    """
+
+    def __init__(self, client, path):
+        self.path = path
+        self.tmppath = tmppath(path)
+        self._client = client
+        self._file = tempfile.TemporaryFile()
+        self.closed = False
+
+    def write(self, data):
+        self._file.write(data)
+
+    def writeLine(self, line):
+        self.write(line + '\n')
+
+    def abort(self):
+        self._file.close()
+        self.closed = True
+
+    def close(self):
+        if self.closed:
+            return
+        self._file.seek(0)
+        self._client.upload(self._file, self.tmppath)
+        self._file.close()
+        self.closed = True
+        self._client.rename(self.tmppath, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+
+class WebHdfsClient(HdfsClient):
+    """
+    This client talks to the namenode's WebHDFS REST API over pooled
+    keep-alive HTTP connections, without starting a JVM.
+
+    Configured with ``client: webhdfs`` in the [hdfs] section, using
+    namenode_host, webhdfs_port and user. Hadoop style globs are expanded
+    by listing directories. Operations it doesn't implement fall back to
+    the hadoop command line client.
+    """
+
+    # bytes read from a datanode at a time
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, host=None, port=None, user=None, timeout=None):
+        super(WebHdfsClient, self).__init__()
+        config = configuration.get_config()
+        self._host = host or config.get('hdfs', 'namenode_host')
+        self._port = port or config.getint('hdfs', 'webhdfs_port', 50070)
+        self._user = user or config.get('hdfs', 'user', None) or getpass.getuser()
+        self._pool = _ConnectionPool(timeout)
+        self._batch_listing = True
+
+    def _url(self, path, op, **params):
+        params['op'] = op
+        params['user.name'] = self._user
+        return '/webhdfs/v1%s?%s' % (urllib.quote(path), urllib.urlencode(sorted(params.items())))
+
+    def _request(self, method, url, body=None, host=None, port=None, headers=None):
+        """ Sends the request on a pooled connection and returns
+        (response, host, port, connection). A pooled connection the server
+        closed in the meantime is replaced by a new one. Once a request is
+        sent it's only sent again if it's a GET, others may have been run. """
+        host = host or self._host
+        port = port or self._port
+        while True:
+            conn, reused = self._pool.get(host, port)
+            try:
+                if body is not None and hasattr(body, 'read'):
+                    body.seek(0)
+                conn.request(method, url, body, headers or {})
+            except (httplib.HTTPException, socket.error):
+                conn.close()
+                if not reused:
+                    raise
+                continue
+            try:
+                return conn.getresponse(), host, port, conn
+            except (httplib.HTTPException, socket.error):
+                conn.close()
+                if not reused or method != 'GET':
+                    raise
+
+    def _check(self, op, path, response, conn):
+        if response.status < 300:
+            return
+        body = response.read()
+        conn.close()
+        try:
+            exception = json.loads(body)['RemoteException']
+            message = '%s: %s' % (exception['exception'], exception['message'])
+        except (ValueError, KeyError, TypeError):
+            message = body
+        raise HDFSCliError('webhdfs %s %s' % (op, path), response.status, body, message)
+
+    def _call(self, method, path, op, **params):
+        """ Runs an operation answered by the namenode and returns its JSON
+        response, or None if it was not found """
+        response, host, port, conn = self._request(method, self._url(path, op, **params))
+        if response.status == 404:
+            response.read()
+            self._pool.put(host, port, conn)
+            return None
+        self._check(op, path, response, conn)
+        body = response.read()
+        self._pool.put(host, port, conn)
+        return json.loads(body) if body else {}
+
+    def _call_redirected(self, method, path, op, body=None, **params):
+        """ Runs an operation the namenode redirects to a datanode, e.g.
+        OPEN and CREATE, and returns (response, host, port, connection) of
+        the datanode """
+        response, host, port, conn = self._request(method, self._url(path, op, **params))
+        if response.status not in (301, 302, 303, 307):
+            self._check(op, path, response, conn)
+            return response, host, port, conn
+        response.read()
+        self._pool.put(host, port, conn)
+        location = urlparse.urlsplit(response.getheader('location'))
+        headers = {'Content-Type': 'application/octet-stream'} if body is not None else None
+        response, host, port, conn = self._request(
+            method, location.path + '?' + location.query, body,
+            location.hostname, location.port or 80, headers)
+        self._check(op, path, response, conn)
+        return response, host, port, conn
+
+    def _status(self, path):
+        result = self._call('GET', path, 'GETFILESTATUS')
+        return result and result['FileStatus']
+
+    def stamp(self, path):
+        """ Returns the modification time in ms and size of path, from the
+        same GETFILESTATUS request as :py:meth:`exists`, or ``None`` if it
+        doesn't exist """
+        status = self._status(path)
+        return status and (status['modificationTime'], status['length'])
+
+    def _list_status(self, path):
+        """ Yields the FileStatus of each entry of the directory, a page of
+        entries at a time with LISTSTATUS_BATCH where the namenode has it """
+        if self._batch_listing:
+            start_after = None
+            while True:
+                params = {'startAfter': start_after} if start_after else {}
+                try:
+                    result = self._call('GET', path, 'LISTSTATUS_BATCH', **params)
+                except HDFSCliError as ex:
+                    if ex.returncode != 400 or start_after:
+                        raise
+                    logger.debug('LISTSTATUS_BATCH not supported, using LISTSTATUS')
+                    self._batch_listing = False
+                    break
+                if result is None:
+                    raise HDFSCliError('webhdfs LISTSTATUS_BATCH %s' % path, 404, '', 'File does not exist: %s' % path)
+                listing = result['DirectoryListing']
+                statuses = listing['partialListing']['FileStatuses']['FileStatus']
+                for status in statuses:
+                    yield status
+                if not listing['remainingEntries'] or not statuses:
+                    return
+                start_after = statuses[-1]['pathSuffix']
+        result = self._call('GET', path, 'LISTSTATUS')
+        if result is None:
+            raise HDFSCliError('webhdfs LISTSTATUS %s' % path, 404, '', 'File does not exist: %s' % path)
+        for status in result['FileStatuses']['FileStatus']:
+            yield status
+
+    def _glob(self, pattern):
+        """ (path, FileStatus) of the paths matching a hadoop style glob,
+        found by listing the directories of each component containing
+        wildcards. The status is ``None`` where no listing returned it """
+        parts = pattern.rstrip('/').split('/')
+        matches = [('/' if pattern.startswith('/') else '', None)]
+        for part in parts[1:] if pattern.startswith('/') else parts:
+            if not part:
+                continue
+            if not _is_glob(part):
+                matches = [(posixpath.join(m, part), None) for m, status in matches]
+                continue
+            regex = _glob_regex(part)
+            expanded = []
+            for parent, status in matches:
+                if status is not None and status['type'] != 'DIRECTORY':
+                    continue
+                try:
+                    statuses = list(self._list_status(parent))
+                except HDFSCliError as ex:
+                    if ex.returncode != 404:
+                        raise
+                    continue
+                # listing a file returns the file itself, with no suffix
+                expanded.extend((posixpath.join(parent, s['pathSuffix']), s)
+                                for s in statuses if s['pathSuffix'] and regex.match(s['pathSuffix']))
+            matches = sorted(expanded, key=lambda match: match[0])
+        return [(m, status) for m, status in matches
+                if status is not None or self._status(m) is not None]
+
+    def _expand(self, path):
+        return [p for p, status in self._expand_status(path)]
+
+    def _expand_status(self, path):
+        """ (path, FileStatus or ``None`` if not known yet) of path, a list
+        of paths or globs """
+        paths = list_path(path)
+        return [m for p in paths for m in (self._glob(p) if _is_glob(p) else [(p, None)])]
+
+    def exists(self, path):
+        if _is_glob(path):
+            return bool(self._glob(path))
+        return self._status(path) is not None
+
+    def exists_many(self, paths):
+        """ Checks the paths one by one on the same keep-alive connection """
+        return dict((path, self.exists(path)) for path in paths)
+
+    def rename(self, path, dest):
+        parent_dir = posixpath.dirname(dest)
+        if parent_dir != '' and not self.exists(parent_dir):
+            self.mkdir(parent_dir)
+        sources = self._expand(path)
+        if len(sources) > 1:
+            warnings.warn("Renaming multiple files at once is not atomic.")
+        dest_status = self._status(dest)
+        for source in sources:
+            target = dest
+            if dest_status is not None and dest_status['type'] == 'DIRECTORY':
+                target = posixpath.join(dest, posixpath.basename(source.rstrip('/')))
+            if not self._call('PUT', source, 'RENAME', destination=target)['boolean']:
+                raise HDFSCliError('webhdfs RENAME %s' % source, -1, '', 'Failed renaming %s to %s' % (source, target))
+
+    def remove(self, path, recursive=True, skip_trash=False):
+        """ Moves path to the trash of the user, like ``hadoop fs -rm``, or
+        deletes it if skip_trash """
+        for p in self._expand(path):
+            if not skip_trash:
+                self._move_to_trash(p, recursive)
+                continue
+            result = self._call('DELETE', p, 'DELETE', recursive=str(bool(recursive)).lower())
+            if not result or not result['boolean']:
+                raise HDFSCliError('webhdfs DELETE %s' % p, -1, '', 'Failed deleting %s' % p)
+
+    def _move_to_trash(self, path, recursive):
+        """ Renames path to the same path under /user/<user>/.Trash/Current,
+        suffixed with the time in ms if that exists, as the trash of hadoop
+        does """
+        if not recursive:
+            status = self._status(path)
+            if status is not None and status['type'] == 'DIRECTORY':
+                raise HDFSCliError('webhdfs RENAME %s' % path, -1, '', '%s is a directory' % path)
+        trash = posixpath.join('/user', self._user, '.Trash/Current')
+        dest = posixpath.join(trash, posixpath.join('/user', self._user, path).lstrip('/'))
+        self._call('PUT', posixpath.dirname(dest), 'MKDIRS')
+        if self._status(dest) is not None:
+            dest += str(int(time.time() * 1000))
+        if not self._call('PUT', path, 'RENAME', destination=dest)['boolean']:
+            raise HDFSCliError('webhdfs RENAME %s' % path, -1, '', 'Failed moving %s to trash' % path)
+
+    def chmod(self, path, permissions, recursive=False):
+        for p in self._expand(path):
+            for target in self._walk(p) if recursive else [p]:
+                self._call('PUT', target, 'SETPERMISSION', permission='%o' % permissions)
+
+    def chown(self, path, owner, group, recursive=False):
+        params = {}
+        if owner:
+            params['owner'] = owner
+        if group:
+            params['group'] = group
+        for p in self._expand(path):
+            for target in self._walk(p) if recursive else [p]:
+                self._call('PUT', target, 'SETOWNER', **params)
+
+    def _walk(self, path):
+        yield path
+        status = self._status(path)
+        if status is not None and status['type'] == 'DIRECTORY':
+            for entry in self._list_status(path):
+                for p in self._walk(posixpath.join(path, entry['pathSuffix'])):
+                    yield p
+
+    def count(self, path):
+        summary = self._call('GET', path, 'GETCONTENTSUMMARY')
+        if summary is None:
+            raise HDFSCliError('webhdfs GETCONTENTSUMMARY %s' % path, 404, '', 'File does not exist: %s' % path)
+        summary = summary['ContentSummary']
+        return {'content_size': summary['length'], 'dir_count': summary['directoryCount'],
+                'file_count': summary['fileCount']}
+
+    def mkdir(self, path, parents=True, raise_if_exists=False):
+        if self.exists(path):
+            if raise_if_exists:
+                raise FileAlreadyExists("%s exists" % (path, ))
+            return
+        if not parents and not self.exists(posixpath.dirname(path.rstrip('/')) or '/'):
+            raise HDFSCliError('webhdfs MKDIRS %s' % path, -1, '', 'Parent of %s does not exist' % path)
+        self._call('PUT', path, 'MKDIRS')
+
+    def open_read(self, path):
+        """ Returns a file like object streaming the contents of path """
+        response, host, port, conn = self._call_redirected('GET', path, 'OPEN')
+        return WebHdfsReadFile(self, response, host, port, conn)
+
+    def open_write(self, path):
+        """ Returns a file like object writing path atomically on close() """
+        return WebHdfsAtomicWriteFile(self, path)
+
+    def upload(self, local_file, destination, overwrite=False):
+        """ Streams an open local file to destination """
+        response, host, port, conn = self._call_redirected(
+            'PUT', destination, 'CREATE', local_file, overwrite=str(overwrite).lower())
+        response.read()
+        self._pool.put(host, port, conn)
+
+    def put(self, local_path, destination):
+        with open(local_path, 'rb') as f:
+            self.upload(f, destination)
+
+    def get(self, path, local_destination):
+        with self.open_read(path) as src:
+            with open(local_destination, 'wb') as dst:
+                while True:
+                    chunk = src.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+
+    def listdir(self, path, ignore_directories=False, ignore_files=False,
+                include_size=False, include_type=False, include_time=False,
+                recursive=False):
+        """
+        Lists path like ``hadoop fs -ls``, yielding a string, or a tuple
+        starting with the path and include_* items in order, like
+        :py:meth:`SnakebiteHdfsClient.listdir`.
+        """
+        for p, status in self._expand_status(path):
+            if status is None:
+                status = self._status(p)
+            if status is None:
+                raise HDFSCliError('webhdfs LISTSTATUS %s' % p, 404, '', 'File does not exist: %s' % p)
+            if status['type'] != 'DIRECTORY':
+                entries = [(p, status)]
+            else:
+                entries = self._list_entries(p, recursive)
+            for entry_path, entry in entries:
+                file_type = 'd' if entry['type'] == 'DIRECTORY' else 'f'
+                if ignore_directories and file_type == 'd':
+                    continue
+                if ignore_files and file_type == 'f':
+                    continue
+                rval = [entry_path]
+                if include_size:
+                    rval.append(entry['length'])
+                if include_type:
+                    rval.append(file_type)
+                if include_time:
+                    rval.append(datetime.datetime.fromtimestamp(entry['modificationTime'] / 1000))
+                if len(rval) > 1:
+                    yield tuple(rval)
+                else:
+                    yield rval[0]
+
+    def _list_entries(self, path, recursive):
+        for entry in self._list_status(path):
+            entry_path = posixpath.join(path, entry['pathSuffix'])
+            yield entry_path, entry
+            if recursive and entry['type'] == 'DIRECTORY':
+                for child in self._list_entries(entry_path, recursive):
+                    yield child
+
+    def listdir_many(self, paths, **kwargs):
+        """ Lists each of paths, skipping the ones that don't exist """
+        for path in paths:
+            try:
+                for entry in self.listdir(path, **kwargs):
+                    yield entry
+            except HDFSCliError as ex:
+                if ex.returncode != 404:
+                    raise
+
+
 class HdfsClientCdh3(HdfsClient):
     """This client uses CDH3 syntax for file system commands"""
+
+    def exists_many(self, paths):
+        """ Checks existence of paths sharing a parent directory with one
+        listing of that directory, as ``hadoop fs -ls -d`` isn't available
+        """
+        result = {}
+        by_parent = {}
+        for path in paths:
+            parent, name = os.path.split(path.rstrip('/'))
+            if not name or _is_glob(path):
+                result[path] = self.exists(path)
+            else:
+                by_parent.setdefault(parent, []).append((path, name))
+
+        for parent, children in by_parent.iteritems():
+            if len(children) == 1:
+                path = children[0][0]
+                result[path] = self.exists(path)
+                continue
+            try:
+                listing = set(os.path.basename(p.rstrip('/')) for p in self.listdir(parent))
+            except Exception:  # IGNORE:broad-except
+                if self.exists(parent):
+                    # Listing failed for some other reason, be conservative
+                    for path, name in children:
+                        result[path] = self.exists(path)
+                    continue
+                listing = set()
+            for path, name in children:
+                result[path] = name in listing
+        return result
+
     def mkdir(self, path):
         '''
         No -p switch, so this will fail creating ancestors
@@ -569,7 +1240,15 @@ def create_hadoopcli_client():
                         "configuration parameter")
 
 def get_autoconfig_client(show_warnings=True):
-    """Creates the client as specified in the `client.cfg` configuration"""
+    """Creates the client as specified in the `client.cfg` configuration,
+    behind the metadata cache if it's enabled"""
+    return hdfs_metadata_cache.wrap(_create_configured_client(show_warnings))
+
+
+_webhdfs_clients = {}  # (host, port, user) -> WebHdfsClient
+
+
+def _create_configured_client(show_warnings):
     configured_client = get_configured_hdfs_client(show_warnings=show_warnings)
     if configured_client == "snakebite":
         return SnakebiteHdfsClient()
@@ -578,6 +1257,10 @@ def get_autoconfig_client(show_warnings=True):
                                                      create_hadoopcli_client()])
     if configured_client == "hadoopcli":
         return create_hadoopcli_client()
+    if configured_client == "webhdfs":
+        client = WebHdfsClient()
+        # one client per namenode and user, keeping their connections in one pool
+        return _webhdfs_clients.setdefault((client._host, client._port, client._user), client)
     raise Exception("Unknown hdfs client " + get_configured_hdfs_client())
 
 # Suppress warnings so that importing luigi.hdfs doesn't show a deprecated warning.
@@ -686,6 +1369,11 @@ class HdfsTarget(FileSystemTarget):
     def fs(self):
         return self._fs
 
+    def stamp(self):
+        """ Modification time and size, with a client that can get them """
+        stamp = getattr(self.fs, 'stamp', None)
+        return stamp(self.path) if stamp is not None and not _is_glob(self.path) else None
+
     def glob_exists(self, expected_files):
         ls = list(listdir(self.path))
         if len(ls) == expected_files:
@@ -696,6 +1384,13 @@ class HdfsTarget(FileSystemTarget):
         if mode not in ('r', 'w'):
             raise ValueError("Unsupported open mode '%s'" % mode)
 
+        if hasattr(self.fs, 'open_read') and self.format is Plain:
+            # stream over HTTP instead of piping through hadoop fs, also
+            # when the client is behind the metadata cache
+            if mode == 'r':
+                return self.fs.open_read(self.path)
+            return self.fs.open_write(self.path)
+
         if mode == 'r':
             try:
                 return self.format.hdfs_reader(self.path)
@@ -709,6 +1404,7 @@ class HdfsTarget(FileSystemTarget):
 
     def remove(self, skip_trash=False):
         remove(self.path, skip_trash=skip_trash)
+        completeness_cache.invalidate(self.path)
 
     @luigi.util.deprecate_kwarg('fail_if_exists', 'raise_if_exists', False)
     def rename(self, path, fail_if_exists=False):
@@ -721,6 +1417,7 @@ class HdfsTarget(FileSystemTarget):
         if fail_if_exists and exists(path):
             raise RuntimeError('Destination exists: %s' % path)
         rename(self.path, path)
+        completeness_cache.invalidate(self.path)
 
     @luigi.util.deprecate_kwarg('fail_if_exists', 'raise_if_exists', False)
     def move(self, path, fail_if_exists=False):
@@ -0,0 +1,279 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Opt-in, process-local cache of HDFS existence checks and listings.
+
+During a run the same paths are checked many times: by ``complete()`` when
+tasks are added, again before a task runs to check its requirements, and
+by the parent directory checks of ``rename`` and ``move_dir``. With this
+cache enabled the HDFS client returned by
+:py:func:`luigi.hdfs.get_autoconfig_client` remembers for a few seconds:
+
+* whether a path exists, from ``exists()`` calls,
+* the entries of a directory and their sizes, from ``listdir()`` calls,
+  which also answer ``exists()`` for the paths in that directory.
+
+Enable it in client.cfg::
+
+    [hdfs_metadata_cache]
+    ttl: 30
+    negative-ttl: 5
+
+Paths are invalidated when this process changes them through the client
+(``mkdir``, ``rename``, ``remove``, ``put``, ...) and when the worker gets
+the result of a task, as its outputs were written by another process.
+Negative results are only cached if ``negative-ttl`` is set, and forked
+processes forget the negative results of their parent.
+"""
+
+import logging
+import os
+import posixpath
+import threading
+import time
+from ConfigParser import NoOptionError, NoSectionError
+
+import configuration
+
+logger = logging.getLogger('luigi-interface')
+
+
+def _normpath(path):
+    return path.rstrip('/') or '/'
+
+
+def _is_glob(path):
+    return any(c in path for c in '*?[{')
+
+
+class MetadataCache(object):
+    """ Existence and directory listings of paths, expiring after ttl seconds """
+
+    def __init__(self, ttl, negative_ttl=0):
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._exists = {}  # path -> (expires, exists)
+        self._listings = {}  # directory -> (time listed, [(path, size, type)])
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_pid(self):
+        ''' Drops the negative results of the parent in a forked process,
+        the parent may have seen other processes create those paths since '''
+        if self._pid != os.getpid():
+            self._exists = dict((path, entry) for path, entry in self._exists.iteritems() if entry[1])
+            self._pid = os.getpid()
+            self.hits = self.misses = self.invalidations = 0
+
+    def exists(self, path):
+        """ Returns ``True`` or ``False`` if it's known whether path exists,
+        ``None`` otherwise """
+        path = _normpath(path)
+        now = time.time()
+        with self._lock:
+            self._check_pid()
+            entry = self._exists.get(path)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            listing = self._listings.get(posixpath.dirname(path))
+            if listing is not None and listing[0] + self._ttl > now:
+                names = set(posixpath.basename(_normpath(p)) for p, size, file_type in listing[1])
+                if posixpath.basename(path) in names:
+                    self.hits += 1
+                    return True
+                if listing[0] + self._negative_ttl > now:
+                    self.hits += 1
+                    return False
+            self.misses += 1
+            return None
+
+    def put_exists(self, path, exists):
+        ttl = self._ttl if exists else self._negative_ttl
+        if ttl:
+            with self._lock:
+                self._check_pid()
+                self._exists[_normpath(path)] = (time.time() + ttl, exists)
+
+    def listing(self, path):
+        """ Returns [(path, size, type)] of the entries of directory path, or
+        ``None`` if it isn't cached """
+        now = time.time()
+        with self._lock:
+            self._check_pid()
+            listing = self._listings.get(_normpath(path))
+            if listing is not None and listing[0] + self._ttl > now:
+                self.hits += 1
+                return listing[1]
+            self.misses += 1
+            return None
+
+    def put_listing(self, path, entries):
+        path = _normpath(path)
+        if not all(_normpath(posixpath.dirname(_normpath(p))).endswith(path) for p, size, file_type in entries):
+            return  # path is a file, listing it doesn't tell what's in a directory
+        with self._lock:
+            self._check_pid()
+            self._listings[path] = (time.time(), entries)
+
+    def invalidate(self, path):
+        """ Forgets path, everything below it, the listings of its ancestors
+        and that they don't exist, as creating path may have created them.
+        For globs, everything below the directory the glob starts in. """
+        path = _normpath(path)
+        if _is_glob(path):
+            path = _normpath(posixpath.dirname(path[:min(path.find(c) for c in '*?[{' if c in path)]))
+        prefix = path.rstrip('/') + '/'
+        with self._lock:
+            self._check_pid()
+            self.invalidations += 1
+            for entries in (self._exists, self._listings):
+                for p in [p for p in entries if p == path or p.startswith(prefix)]:
+                    del entries[p]
+            ancestor = path
+            while ancestor != posixpath.dirname(ancestor):
+                ancestor = posixpath.dirname(ancestor)
+                self._listings.pop(ancestor, None)
+                if self._exists.get(ancestor, (0, True))[1] is False:
+                    del self._exists[ancestor]
+
+    def clear(self):
+        with self._lock:
+            self._exists.clear()
+            self._listings.clear()
+
+
+def _moved_paths(path, *args, **kwargs):
+    return [path] + list(args[:1]) + [kwargs[k] for k in ('dest', 'destination') if k in kwargs]
+
+
+class CachingClient(object):
+    """ Wraps an HDFS client, answering ``exists`` and ``listdir`` from a
+    :py:class:`MetadataCache` and invalidating it on changes """
+
+    # methods changing the path given as first argument
+    INVALIDATING_METHOD_NAMES = ['mkdir', 'remove', 'chmod', 'chown']
+    # methods changing the path given as second argument, and their source
+    MOVING_METHOD_NAMES = ['rename', 'put', 'copy']
+
+    def __init__(self, client, cache):
+        self._client = client
+        self._cache = cache
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in self.INVALIDATING_METHOD_NAMES:
+            return self._invalidating(attr, lambda path, *args, **kwargs: [path])
+        if name in self.MOVING_METHOD_NAMES:
+            return self._invalidating(attr, _moved_paths)
+        return attr
+
+    def _invalidating(self, method, changed_paths):
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                for path in changed_paths(*args, **kwargs):
+                    for p in path if isinstance(path, (list, tuple)) else [path]:
+                        self._cache.invalidate(p)
+        return wrapper
+
+    def exists(self, path):
+        if _is_glob(path):
+            return self._client.exists(path)
+        exists = self._cache.exists(path)
+        if exists is None:
+            exists = self._client.exists(path)
+            self._cache.put_exists(path, exists)
+        return exists
+
+    def exists_many(self, paths):
+        result = {}
+        unknown = []
+        for path in paths:
+            exists = None if _is_glob(path) else self._cache.exists(path)
+            if exists is None:
+                unknown.append(path)
+            else:
+                result[path] = exists
+        if unknown:
+            for path, exists in self._client.exists_many(unknown).iteritems():
+                if not _is_glob(path):
+                    self._cache.put_exists(path, exists)
+                result[path] = exists
+        return result
+
+    def listdir(self, path, ignore_directories=False, ignore_files=False,
+                include_size=False, include_type=False, include_time=False,
+                recursive=False):
+        if include_time or recursive or _is_glob(path):
+            return self._client.listdir(path, ignore_directories=ignore_directories,
+                                        ignore_files=ignore_files, include_size=include_size,
+                                        include_type=include_type, include_time=include_time,
+                                        recursive=recursive)
+        entries = self._cache.listing(path)
+        if entries is None:
+            entries = list(self._client.listdir(path, include_size=True, include_type=True))
+            self._cache.put_listing(path, entries)
+        return self._format(entries, ignore_directories, ignore_files, include_size, include_type)
+
+    def _format(self, entries, ignore_directories, ignore_files, include_size, include_type):
+        for entry_path, size, file_type in entries:
+            if ignore_directories and file_type == 'd':
+                continue
+            if ignore_files and file_type != 'd':
+                continue
+            extra = ()
+            if include_size:
+                extra += (size,)
+            if include_type:
+                extra += (file_type,)
+            yield (entry_path,) + extra if extra else entry_path
+
+
+_cache = None
+_clients = {}  # class of a stateless client -> its CachingClient
+
+
+def get_cache():
+    """ Returns the process wide :py:class:`MetadataCache` or ``None`` if it isn't enabled. """
+    global _cache
+    config = configuration.get_config()
+    try:
+        ttl = config.getint('hdfs_metadata_cache', 'ttl', 0)
+    except (NoOptionError, NoSectionError):
+        return None
+    if not ttl:
+        return None
+    negative_ttl = config.getint('hdfs_metadata_cache', 'negative-ttl', 0)
+    if _cache is None or (_cache._ttl, _cache._negative_ttl) != (ttl, negative_ttl):
+        _cache = MetadataCache(ttl, negative_ttl)
+    return _cache
+
+
+def wrap(client):
+    """ Returns client behind the cache if it's enabled, client otherwise """
+    cache = get_cache()
+    if cache is None:
+        return client
+    if vars(client):
+        return CachingClient(client, cache)
+    # share one wrapper, so targets keep being checked together by exists_many
+    caching_client = _clients.get(type(client))
+    if caching_client is None or caching_client._cache is not cache:
+        caching_client = _clients[type(client)] = CachingClient(client, cache)
+    return caching_client
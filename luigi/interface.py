@@ -52,23 +52,26 @@ def setup_interface_logging(conf_file=None):
     setup_interface_logging.has_run = True
 
 
-def load_task(parent_task, task_name, params):
-    """ Imports task and uses ArgParseInterface to initialize it
+def task_module_name(task):
+    """ The name another process can import the module of a task or task class by
     """
     # How the module is represented depends on if Luigi was started from
     # that file or if the module was imported later on
-    module = sys.modules[parent_task.__module__]
+    module = sys.modules[task.__module__]
     if module.__name__ == '__main__':
         parent_module_path = os.path.abspath(module.__file__)
         for p in sys.path:
             if parent_module_path.startswith(p):
                 end = parent_module_path.rfind('.py')
-                actual_module = parent_module_path[len(p):end].strip(
+                return parent_module_path[len(p):end].strip(
                     '/').replace('/', '.')
-                break
-    else:
-        actual_module = module.__name__
-    return init_task(actual_module, task_name, params, {})
+    return module.__name__
+
+
+def load_task(parent_task, task_name, params):
+    """ Imports task and uses ArgParseInterface to initialize it
+    """
+    return init_task(task_module_name(parent_task), task_name, params, {})
 
 
 def init_task(module_name, task, str_params, global_str_params):
@@ -115,6 +118,36 @@ class EnvironmentParamsContainer(task.Task):
     workers = parameter.IntParameter(
         is_global=True, default=1,
         description='Maximum number of parallel tasks to run')
+    worker_executor = parameter.Parameter(
+        is_global=True, default='process',
+        description='How to run tasks when workers > 1: "process" forks once per task, '
+                    '"pool" reuses long-lived processes, "thread" uses threads of the worker process',
+        config_path=dict(section='core', name='worker-executor'))
+    worker_daemon = parameter.Parameter(
+        is_global=True, default=None,
+        description='Unix socket of a luigi-worker-daemon to run the tasks with',
+        config_path=dict(section='core', name='worker-daemon'))
+    dry_run = parameter.BooleanParameter(
+        is_global=True, default=False,
+        description='Only print what would run and estimates of how long it would take')
+    profile_tasks = parameter.BooleanParameter(
+        is_global=True, default=False,
+        description='Profile tasks with cProfile, see the [profiling] configuration section')
+    profile_families = parameter.Parameter(
+        is_global=True, default=None,
+        description='Comma separated task families to profile with --profile-tasks')
+    profile_sample_rate = parameter.FloatParameter(
+        is_global=True, default=None,
+        description='Fraction of tasks to profile with --profile-tasks')
+    instance_cache = parameter.Parameter(
+        is_global=True, default='dict',
+        description='How task instances are cached: "dict" keeps all of them, '
+                    '"weak" only those still referenced, "lru" the most recently used ones',
+        config_path=dict(section='core', name='instance-cache'))
+    instance_cache_size = parameter.IntParameter(
+        is_global=True, default=10000,
+        description='Number of task instances kept with --instance-cache lru',
+        config_path=dict(section='core', name='instance-cache-size'))
     logging_conf_file = parameter.Parameter(
         is_global=True, default=None,
         description='Configuration file for logging',
@@ -154,9 +187,9 @@ class WorkerSchedulerFactory(object):
     def create_remote_scheduler(self, host, port):
         return rpc.RemoteScheduler(host=host, port=port)
 
-    def create_worker(self, scheduler, worker_processes):
+    def create_worker(self, scheduler, worker_processes, **kwargs):
         return worker.Worker(
-            scheduler=scheduler, worker_processes=worker_processes)
+            scheduler=scheduler, worker_processes=worker_processes, **kwargs)
 
 
 class Interface(object):
@@ -193,10 +226,23 @@ class Interface(object):
                 DeprecationWarning
             )
 
+        if env_params.dry_run:
+            import dry_run
+            print dry_run.plan(tasks, workers=env_params.workers).summary()
+            return True
+
         if (not env_params.no_lock and
                 not(lock.acquire_for(env_params.lock_pid_dir, env_params.lock_size))):
             sys.exit(1)
 
+        if env_params.worker_daemon:
+            import worker_daemon
+            return worker_daemon.submit(env_params.worker_daemon, tasks)
+
+        if env_params.instance_cache != 'dict':
+            Register.set_instance_cache_policy(
+                env_params.instance_cache, env_params.instance_cache_size)
+
         if env_params.local_scheduler:
             sch = worker_scheduler_factory.create_local_scheduler()
         else:
@@ -204,8 +250,18 @@ class Interface(object):
                 host=env_params.scheduler_host,
                 port=env_params.scheduler_port)
 
+        # only pass non-default options, custom factories may not accept them
+        worker_kwargs = {}
+        if env_params.worker_executor != 'process':
+            worker_kwargs['worker_executor'] = env_params.worker_executor
+        if env_params.profile_tasks:
+            import profiling
+            worker_kwargs['profiler'] = profiling.TaskProfiler.from_config(
+                families=env_params.profile_families,
+                sample_rate=env_params.profile_sample_rate)
+
         w = worker_scheduler_factory.create_worker(
-            scheduler=sch, worker_processes=env_params.workers)
+            scheduler=sch, worker_processes=env_params.workers, **worker_kwargs)
 
         success = True
         for t in tasks:
@@ -121,6 +121,7 @@ class Parameter(object):
         if config_path is not None and (not 'section' in config_path or not 'name' in config_path):
             raise ParameterException('config_path must be a hash containing entries for section and name')
         self.__config = config_path
+        self.__config_cache = None  # (config, generation, value)
 
         self.counter = Parameter.counter  # We need to keep track of this to get the order right (see Task class)
         Parameter.counter += 1
@@ -132,17 +133,24 @@ class Parameter(object):
             return _no_value
 
         conf = configuration.get_config()
+        cached = self.__config_cache
+        if cached is not None and cached[0] is conf and cached[1] == conf.generation:
+            return cached[2]
+
         (section, name) = (self.__config['section'], self.__config['name'])
 
         try:
             value = conf.get(section, name)
         except (NoSectionError, NoOptionError), e:
-            return _no_value
-
-        if self.is_list:
-            return tuple(self.parse(p.strip()) for p in value.strip().split('\n'))
+            value = _no_value
         else:
-            return self.parse(value)
+            if self.is_list:
+                value = tuple(self.parse(p.strip()) for p in value.strip().split('\n'))
+            else:
+                value = self.parse(value)
+
+        self.__config_cache = (conf, conf.generation, value)
+        return value
 
     @property
     def has_value(self):
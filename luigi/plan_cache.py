@@ -0,0 +1,186 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Opt-in cache of the done part of the dependency graph, kept between runs.
+
+Recurring runs of the same root task mostly rediscover tasks that were done
+in the previous run. With this cache enabled the worker saves, after each
+run, every task it found or made done together with:
+
+* a hash of the source file defining the task class,
+* a stamp of each of its outputs, see :py:meth:`luigi.target.Target.stamp`,
+* with ``check-inputs``, the stamps of the outputs of its requirements,
+  for tasks it ran.
+
+In the next run such a task is considered done without calling
+``complete()`` as long as its code, its outputs and (with
+``check-inputs``) its inputs are unchanged. Everything else, including
+tasks that weren't done, is evaluated as usual. Only tasks whose outputs
+all have a stamp (local files, HDFS paths and S3 keys) are cached.
+
+Checking a task takes one stamp per output, which costs about as much as
+the ``exists()`` calls of ``complete()``. Checking inputs also stamps the
+outputs of the requirements, which ``complete()`` never looks at, so it's
+off by default.
+
+Enable it in client.cfg::
+
+    [plan_cache]
+    path: /var/tmp/luigi/plan.pickle
+    check-inputs: true
+"""
+
+import cPickle as pickle
+import hashlib
+import inspect
+import logging
+import os
+import tempfile
+import time
+from ConfigParser import NoOptionError, NoSectionError
+
+import configuration
+from task import flatten
+
+logger = logging.getLogger('luigi-interface')
+
+
+class PlanCache(object):
+    """ Done tasks of earlier runs, see the module documentation.
+
+    Entries are loaded lazily and written back by :py:meth:`save`. Errors
+    reading or writing the file are logged and treated as an empty cache.
+    """
+
+    def __init__(self, path, max_entries=100000, check_inputs=False):
+        self._path = path
+        self._max_entries = max_entries
+        self._check_inputs = check_inputs
+        self._entries = None  # task_id -> (code hash, stamps, {dep task_id: stamps} or None, time saved)
+        self._dirty = False
+        self._code_hashes = {}  # class -> hash of its source file
+        self._stamps = {}  # task_id -> stamps of its outputs in this run
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self._path):
+                try:
+                    with open(self._path, 'rb') as f:
+                        self._entries = pickle.load(f)
+                except Exception:
+                    logger.warning('Failed reading plan cache %s', self._path, exc_info=1)
+        return self._entries
+
+    def _code_hash(self, task_cls):
+        if task_cls not in self._code_hashes:
+            try:
+                with open(inspect.getsourcefile(task_cls), 'rb') as f:
+                    self._code_hashes[task_cls] = hashlib.md5(f.read()).hexdigest()
+            except (TypeError, IOError):
+                self._code_hashes[task_cls] = None
+        return self._code_hashes[task_cls]
+
+    def _task_stamps(self, task):
+        """ Stamps of all outputs of task, or None if any of them has none """
+        if task.task_id not in self._stamps:
+            outputs = flatten(task.output())
+            stamps = [output.stamp() for output in outputs]
+            if not outputs or None in stamps:
+                stamps = None
+            self._stamps[task.task_id] = stamps
+        return self._stamps[task.task_id]
+
+    def is_done(self, task):
+        """ Returns ``True`` if task was done in an earlier run and neither its
+        code, its outputs nor its inputs changed since. """
+        entry = self._load().get(task.task_id)
+        if entry is not None and self._matches(task, entry):
+            self.hits += 1
+            return True
+        self.misses += 1
+        if entry is not None:
+            self.forget(task)
+        return False
+
+    def _matches(self, task, entry):
+        code_hash, stamps, input_stamps, saved = entry
+        if code_hash is None or code_hash != self._code_hash(task.__class__):
+            return False
+        if stamps != self._task_stamps(task):
+            return False
+        if input_stamps is None or not self._check_inputs:
+            return True
+        try:
+            deps = task.deps()
+        except Exception:
+            logger.debug('Failed getting the requirements of %s', task, exc_info=1)
+            return False
+        return input_stamps == dict((dep.task_id, self._task_stamps(dep)) for dep in deps)
+
+    def done(self, task, deps=None):
+        """ Records that task is done. Pass the requirements of tasks that
+        were run, so they are run again if their inputs change. """
+        if deps is not None:
+            self._stamps.pop(task.task_id, None)  # its outputs were just written
+        stamps = self._task_stamps(task)
+        code_hash = self._code_hash(task.__class__)
+        if stamps is None or code_hash is None:
+            return
+        input_stamps = None
+        if deps is not None and self._check_inputs:
+            input_stamps = dict((dep.task_id, self._task_stamps(dep)) for dep in deps)
+        self._load()[task.task_id] = (code_hash, stamps, input_stamps, time.time())
+        self._dirty = True
+
+    def forget(self, task):
+        """ Records that task isn't done """
+        if self._load().pop(task.task_id, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """ Writes the entries back, dropping the oldest ones above max_entries """
+        if not self._dirty:
+            return
+        entries = self._entries
+        if len(entries) > self._max_entries:
+            newest = sorted(entries, key=lambda task_id: entries[task_id][3])[-self._max_entries:]
+            entries = dict((task_id, entries[task_id]) for task_id in newest)
+        parent = os.path.dirname(self._path)
+        try:
+            if parent and not os.path.exists(parent):
+                os.makedirs(parent)
+            fd, tmp_path = tempfile.mkstemp(dir=parent or None, prefix='.plan-cache-')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entries, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self._path)  # atomic, concurrent runs never see half a file
+        except (IOError, OSError):
+            logger.warning('Failed writing plan cache %s', self._path, exc_info=1)
+        self._dirty = False
+        self._stamps.clear()  # outputs may change before the next run
+
+
+def get_cache():
+    """ Returns a new :py:class:`PlanCache` if it's enabled, or ``None``. """
+    config = configuration.get_config()
+    try:
+        path = config.get('plan_cache', 'path', None)
+    except (NoOptionError, NoSectionError):
+        return None
+    if not path:
+        return None
+    return PlanCache(path, max_entries=config.getint('plan_cache', 'max-entries', 100000),
+                     check_inputs=config.getboolean('plan_cache', 'check-inputs', False))
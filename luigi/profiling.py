@@ -0,0 +1,123 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Profiling of task execution with cProfile, enabled with ``--profile-tasks``.
+
+Each profiled task writes ``<task_id>.pstats`` to the profile directory and
+logs its top functions. When the worker is done, the stats of all profiled
+tasks of a family are merged into ``family-<family>.pstats`` and logged too.
+The files can be inspected with the :py:mod:`pstats` module or tools like
+snakeviz. Configuration, all optional::
+
+    [profiling]
+    dir: /tmp/luigi-profiles
+    families: MyHadoopTask,OtherTask
+    sample-rate: 0.1
+    top: 20
+"""
+
+import cProfile
+import hashlib
+import logging
+import os
+import pstats
+import random
+import re
+import StringIO
+import tempfile
+
+import configuration
+
+logger = logging.getLogger('luigi-interface')
+
+
+class TaskProfiler(object):
+    """ Decides which tasks to profile, profiles them and reports on them. """
+
+    def __init__(self, directory, families=None, sample_rate=1.0, top=20):
+        """
+        :param str directory: where to write the ``.pstats`` files.
+        :param families: only profile tasks of these families, all if None.
+        :param float sample_rate: fraction of the tasks to profile.
+        :param int top: number of functions to log for each task and family.
+        """
+        self.directory = directory
+        self.families = set(families) if families else None
+        self.sample_rate = sample_rate
+        self.top = top
+
+    @classmethod
+    def from_config(cls, families=None, sample_rate=None):
+        """ Creates a profiler from the ``[profiling]`` section, arguments that
+        are not None take precedence. ``families`` may be a comma separated string. """
+        config = configuration.get_config()
+        if families is None:
+            families = config.get('profiling', 'families', None)
+        if isinstance(families, basestring):
+            families = [f.strip() for f in families.split(',') if f.strip()]
+        if sample_rate is None:
+            sample_rate = config.getfloat('profiling', 'sample-rate', 1.0)
+        return cls(
+            directory=config.get('profiling', 'dir', os.path.join(tempfile.gettempdir(), 'luigi-profiles')),
+            families=families,
+            sample_rate=sample_rate,
+            top=config.getint('profiling', 'top', 20))
+
+    def should_profile(self, task):
+        if self.families is not None and task.task_family not in self.families:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def path(self, task_id):
+        """ Returns the ``.pstats`` path for a task_id """
+        name = re.sub(r'[^\w.,=-]', '_', task_id)
+        if len(name) > 200:
+            name = name[:160] + '-' + hashlib.md5(task_id).hexdigest()
+        return os.path.join(self.directory, name + '.pstats')
+
+    def profile(self, task_id, function):
+        """ Calls ``function`` under cProfile and saves and logs the stats. """
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(function)
+        finally:
+            try:
+                if not os.path.exists(self.directory):
+                    os.makedirs(self.directory)
+                path = self.path(task_id)
+                profile.dump_stats(path)
+                logger.info('Profile of %s written to %s\n%s', task_id, path, self._top(pstats.Stats(profile)))
+            except (IOError, OSError):
+                logger.warning('Failed saving profile of %s', task_id, exc_info=1)
+
+    def report(self, task_ids_by_family):
+        """ Merges and logs the stats of the given tasks per family.
+
+        :param dict task_ids_by_family: family -> list of profiled task_ids.
+        """
+        for family, task_ids in sorted(task_ids_by_family.iteritems()):
+            paths = [self.path(task_id) for task_id in task_ids]
+            paths = [path for path in paths if os.path.exists(path)]
+            if not paths:
+                continue
+            stats = pstats.Stats(*paths)
+            path = os.path.join(self.directory, 'family-%s.pstats' % family)
+            stats.dump_stats(path)
+            logger.info('Profile of %d %s tasks written to %s\n%s', len(paths), family, path, self._top(stats))
+
+    def _top(self, stats):
+        out = StringIO.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(self.top)
+        return out.getvalue()
@@ -91,11 +91,12 @@ class RemoteScheduler(Scheduler):
 
     def ping(self, worker):
         # just one attemtps, keep-alive thread will keep trying anyway
-        self._request('/api/ping', {'worker': worker}, attempts=1)
+        return self._request('/api/ping', {'worker': worker}, attempts=1)
 
     def add_task(self, worker, task_id, status=PENDING, runnable=False,
                  deps=None, new_deps=None, expl=None, resources={},priority=0,
-                 family='', params={}):
+                 family='', params={}, resource_usage=None, batch_params=None,
+                 max_batch_size=None):
         self._request('/api/add_task', {
             'task_id': task_id,
             'worker': worker,
@@ -108,8 +109,18 @@ class RemoteScheduler(Scheduler):
             'priority': priority,
             'family': family,
             'params': params,
+            'resource_usage': resource_usage,
+            'batch_params': batch_params,
+            'max_batch_size': max_batch_size,
         })
 
+    def add_tasks(self, worker, tasks):
+        # single attempt, the worker falls back to add_task if this fails
+        self._request('/api/add_tasks', {
+            'worker': worker,
+            'tasks': tasks,
+        }, log_exceptions=False, attempts=1)
+
     def get_work(self, worker, host=None):
         ''' Ugly work around for an older scheduler version, where get_work doesn't have a host argument. Try once passing
             host to it, falling back to the old version. Should be removed once people have had time to update everything
@@ -146,9 +157,15 @@ class RemoteScheduler(Scheduler):
     def fetch_error(self, task_id):
         return self._request('/api/fetch_error', {'task_id': task_id})
 
+    def cancel_task(self, task_id):
+        return self._request('/api/cancel_task', {'task_id': task_id})
+
     def add_worker(self, worker, info):
         return self._request('/api/add_worker', {'worker': worker, 'info': info})
 
+    def resource_usage(self):
+        return self._request('/api/resource_usage', {})
+
 
 class RemoteSchedulerResponder(object):
     """ Use on the server side for responding to requests
@@ -165,10 +182,15 @@ class RemoteSchedulerResponder(object):
         self._scheduler = scheduler
 
     def add_task(self, worker, task_id, status, runnable, deps, new_deps, expl,
-                 resources=None, priority=0, family='', params={}, **kwargs):
+                 resources=None, priority=0, family='', params={}, resource_usage=None,
+                 batch_params=None, max_batch_size=None, **kwargs):
         return self._scheduler.add_task(
             worker, task_id, status, runnable, deps, new_deps, expl,
-            resources, priority, family, params)
+            resources, priority, family, params, resource_usage,
+            batch_params, max_batch_size)
+
+    def add_tasks(self, worker, tasks, **kwargs):
+        return self._scheduler.add_tasks(worker, tasks)
 
     def add_worker(self, worker, info, **kwargs):
         return self._scheduler.add_worker(worker, info)
@@ -199,9 +221,15 @@ class RemoteSchedulerResponder(object):
     def task_search(self, task_str, **kwargs):
         return self._scheduler.task_search(task_str)
 
+    def resource_usage(self, **kwargs):
+        return self._scheduler.resource_usage()
+
     def fetch_error(self, task_id, **kwargs):
         return self._scheduler.fetch_error(task_id)
 
+    def cancel_task(self, task_id, **kwargs):
+        return self._scheduler.cancel_task(task_id)
+
     @property
     def task_history(self):
         return self._scheduler.task_history
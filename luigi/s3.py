@@ -461,6 +461,13 @@ class S3Target(FileSystemTarget):
             else:
                 return AtomicS3File(self.path, self.fs)
 
+    def stamp(self):
+        """
+        The etag of the key, or None for directories
+        """
+        s3_key = self.fs.get_key(self.path)
+        return s3_key.etag if s3_key else None
+
 
 class S3FlagTarget(S3Target):
     """
@@ -493,6 +500,10 @@ class S3FlagTarget(S3Target):
         hadoopSemaphore = self.path + self.flag
         return self.fs.exists(hadoopSemaphore)
 
+    def stamp(self):
+        s3_key = self.fs.get_key(self.path + self.flag)
+        return s3_key.etag if s3_key else None
+
 
 class S3EmrTarget(S3FlagTarget):
     """
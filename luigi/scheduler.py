@@ -24,6 +24,7 @@ import bisect
 import task_history as history
 logger = logging.getLogger("luigi.server")
 
+from task import id_to_name_and_params
 from task_status import PENDING, FAILED, DONE, RUNNING, SUSPENDED, UNKNOWN, DISABLED
 
 
@@ -113,6 +114,9 @@ class Task(object):
         self.disable_failures = disable_failures
         self.failures = Failures(disable_window)
         self.scheduler_disable_time = None
+        self.resource_usage = None  # reported by the worker when the task last finished
+        self.batch_params = None  # params that may differ between tasks run together
+        self.max_batch_size = None
 
     def __repr__(self):
         return "Task(%r)" % vars(self)
@@ -273,6 +277,8 @@ class CentralPlannerScheduler(Scheduler):
             disable_window=datetime.timedelta(seconds=disable_window))
         self._disable_persist = disable_persist
         self._disable_time = datetime.timedelta(seconds=disable_persist)
+        self._family_resource_usage = {}  # family -> totals, see add_task
+        self._cancel_requests = collections.defaultdict(set)  # worker id -> task ids, see cancel_task
 
     def load(self):
         self._state.load()
@@ -383,15 +389,23 @@ class CentralPlannerScheduler(Scheduler):
             if t is not None and prio > t.priority:
                 self._update_priority(t, prio, worker)
 
+    def add_tasks(self, worker, tasks):
+        """ Calls :py:meth:`add_task` for each dict of arguments in tasks """
+        for kwargs in tasks:
+            self.add_task(worker, **kwargs)
+
     def add_task(self, worker, task_id, status=PENDING, runnable=True,
                  deps=None, new_deps=None, expl=None, resources=None,
-                 priority=0, family='', params={}):
+                 priority=0, family='', params={}, resource_usage=None,
+                 batch_params=None, max_batch_size=None):
         """
         * Add task identified by task_id if it doesn't exist
         * If deps is not None, update dependency list
         * Update status of task
         * Add additional workers/stakeholders
         * Update priority when needed
+        * Record resource usage reported by the worker for a finished task
+        * Record if the task can be run in a batch with others of its family
         """
         self.update(worker)
 
@@ -442,6 +456,29 @@ class CentralPlannerScheduler(Scheduler):
         if expl is not None:
             task.expl = expl
 
+        if resource_usage:
+            task.resource_usage = resource_usage
+            self._add_family_resource_usage(task.family, resource_usage)
+
+        if batch_params:
+            task.batch_params = batch_params
+            task.max_batch_size = max_batch_size
+
+    def _add_family_resource_usage(self, family, usage):
+        totals = self._family_resource_usage.setdefault(family, {'count': 0})
+        totals['count'] += 1
+        for key, value in usage.iteritems():
+            if key == 'max_rss_kb':
+                totals[key] = max(totals.get(key, 0), value)
+            else:
+                totals[key] = totals.get(key, 0) + value
+
+    def resource_usage(self):
+        ''' Resource usage of finished tasks per family: number of reports,
+        summed CPU time, I/O bytes and context switches and the highest peak
+        RSS seen. '''
+        return self._family_resource_usage
+
     def add_worker(self, worker, info):
         self._state.get_worker(worker).add_info(info)
 
@@ -559,19 +596,67 @@ class CentralPlannerScheduler(Scheduler):
 
                             break
 
+        batch = []
         if best_task:
-            best_task.status = RUNNING
-            best_task.worker_running = worker
-            best_task.time_running = time.time()
-            self._update_task_history(best_task.id, RUNNING, host=host)
-
-        return {'n_pending_tasks': locally_pending_tasks,
-                'n_unique_pending': n_unique_pending,
-                'task_id': best_task_id,
-                'running_tasks': running_tasks}
+            batch = [best_task] + self._batch_with(best_task, tasks, worker, used_resources)
+            for task in batch:
+                task.status = RUNNING
+                task.worker_running = worker
+                task.time_running = time.time()
+                self._update_task_history(task.id, RUNNING, host=host)
+
+        response = {'n_pending_tasks': locally_pending_tasks,
+                    'n_unique_pending': n_unique_pending,
+                    'task_id': best_task_id,
+                    'running_tasks': running_tasks}
+        if len(batch) > 1:
+            response['batch_task_ids'] = [task.id for task in batch]
+        return response
+
+    def _batch_with(self, best_task, tasks, worker, used_resources):
+        ''' Other tasks that the worker can run together with best_task: of
+        the same family, with the same parameters except for batch_params,
+        up to max_batch_size in total '''
+        batch_params = getattr(best_task, 'batch_params', None)
+        max_batch_size = getattr(best_task, 'max_batch_size', None) or 1
+        if not batch_params or max_batch_size <= 1:
+            return []
+
+        def batch_key(task):
+            return sorted((k, v) for k, v in task.params.iteritems() if k not in batch_params)
+
+        key = batch_key(best_task)
+        used_resources = collections.defaultdict(int, used_resources)
+        for resource, amount in (best_task.resources or {}).items():
+            used_resources[resource] += amount
+        batch = []
+        for task in tasks:
+            if len(batch) + 1 >= max_batch_size:
+                break
+            if (task is best_task or task.family != best_task.family or worker not in task.workers or
+                    not self._schedulable(task) or batch_key(task) != key or
+                    not self._has_resources(task.resources, used_resources)):
+                continue
+            for resource, amount in (task.resources or {}).items():
+                used_resources[resource] += amount
+            batch.append(task)
+        return batch
 
     def ping(self, worker):
+        ''' Returns the ids of running tasks the worker should stop, see cancel_task '''
         self.update(worker)
+        return {'cancel': sorted(self._cancel_requests.pop(worker, []))}
+
+    def cancel_task(self, task_id):
+        ''' Asks the worker running the task to kill it on its next ping.
+        It will then report the task as FAILED. Returns False if the task
+        isn't running. '''
+        task = self._state.get_task(task_id)
+        if task is None or task.status != RUNNING or not task.worker_running:
+            return False
+        logger.info('Cancelling %s running on worker %s', task_id, task.worker_running)
+        self._cancel_requests[task.worker_running].add(task_id)
+        return True
 
     def _upstream_status(self, task_id, upstream_status_table):
         if task_id in upstream_status_table:
@@ -612,6 +697,7 @@ class CentralPlannerScheduler(Scheduler):
             'name': task.family,
             'priority': task.priority,
             'resources': task.resources,
+            'resource_usage': getattr(task, 'resource_usage', None),
         }
         if include_deps:
             ret['deps'] = list(task.deps)
@@ -632,9 +718,8 @@ class CentralPlannerScheduler(Scheduler):
 
                 # try to infer family and params from task_id
                 try:
-                    family, _, param_str = task_id.rstrip(')').partition('(')
-                    params = dict(param.split('=') for param in param_str.split(', '))
-                except:
+                    family, params = id_to_name_and_params(task_id)
+                except ValueError:
                     family, params = '', {}
                 serialized[task_id] = {
                     'deps': [],
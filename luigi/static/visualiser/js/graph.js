@@ -26,6 +26,7 @@ Graph = (function() {
             deps: deps,
             params: task.params,
             priority: task.priority,
+            resourceUsage: task.resource_usage,
             depth: -1
         };
     }
@@ -192,6 +193,14 @@ Graph = (function() {
                 titleText += param_name + "=" + param_value + '<br/>';
             });
             titleText += "priority" + "=" + node.priority + '<br/>';
+            if (node.resourceUsage) {
+                var usage = node.resourceUsage;
+                titleText += "cpu" + "=" + (usage.user_time + usage.system_time).toFixed(1) + "s" + '<br/>';
+                if (usage.max_rss_kb !== undefined) {
+                    // only known for tasks run in a process of their own
+                    titleText += "peak rss" + "=" + Math.round(usage.max_rss_kb / 1024) + "MB" + '<br/>';
+                }
+            }
             g.attr("title", $.trim(titleText))
                 .tooltip();
         });
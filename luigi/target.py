@@ -14,6 +14,7 @@
 
 import abc
 import logging
+import completeness_cache
 logger = logging.getLogger('luigi-interface')
 
 
@@ -35,6 +36,14 @@ class Target(object):
         """
         pass
 
+    def stamp(self):
+        """Returns a value that changes whenever the :py:class:`Target` changes, like a
+        modification time or an etag, or ``None`` if it doesn't exist or can't be stamped.
+
+        Used by :py:mod:`luigi.plan_cache`. The default returns ``None``.
+        """
+        return None
+
 
 class FileSystemException(Exception):
     """Base class for generic file system exceptions. """
@@ -113,6 +122,17 @@ class FileSystem(object):
         """
         raise NotImplementedError("isdir() not implemented on {0}".format(self.__class__.__name__))
 
+    def exists_many(self, paths):
+        """ Return a ``dict`` mapping each of ``paths`` to ``True`` if it exists, ``False`` otherwise
+
+        The default implementation calls :py:meth:`exists` once per path. Subclasses can override
+        it to answer for many paths at once, e.g. by listing each parent directory only once. Used
+        by :py:meth:`luigi.task.Task.bulk_complete`.
+
+        :param list paths: paths within the FileSystem to check for existence.
+        """
+        return dict((path, self.exists(path)) for path in paths)
+
 
 class FileSystemTarget(Target):
     """Base class for FileSystem Targets like LocalTarget and HdfsTarget.
@@ -166,3 +186,4 @@ class FileSystemTarget(Target):
         This method is implemented by using :py:meth:`fs`.
         """
         self.fs.remove(self.path)
+        completeness_cache.invalidate(self.path)
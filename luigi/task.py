@@ -13,17 +13,78 @@
 # the License.
 
 import abc
+import collections
 import logging
 import parameter
 import warnings
 import traceback
 import itertools
-import pyparsing as pp
+import os
+import Queue
+import re
+import sys
+import threading
+import weakref
+from target import FileSystem, FileSystemTarget
 
 Parameter = parameter.Parameter
 logger = logging.getLogger('luigi-interface')
 
 
+class _EventQueue(object):
+    """ Bounded queue of callbacks run by a daemon thread, for event handlers
+    registered with ``background=True``. """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        # (Re)start after a fork, threads don't survive it
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = Queue.Queue(self.maxsize)
+                    thread = threading.Thread(target=self._run, name='event-callbacks')
+                    thread.daemon = True
+                    thread.start()
+                    self._pid = os.getpid()
+
+    def put(self, event, callback, args, kwargs):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((event, callback, args, kwargs))
+        except Queue.Full:
+            self.dropped += 1
+            logger.warning("Event callback queue full, dropped callback for %r", event)
+
+    def join(self):
+        """ Waits until all queued callbacks have run """
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            event, callback, args, kwargs = self._queue.get()
+            try:
+                callback(*args, **kwargs)
+            except:
+                logger.exception("Error in event callback for %r", event)
+            finally:
+                self._queue.task_done()
+
+
+_event_queue = _EventQueue()
+
+
+def flush_events():
+    """ Waits for the callbacks of background event handlers to finish. Call
+    before a process exits to not lose them. """
+    _event_queue.join()
+
+
 def namespace(namespace=None):
     """ Call to set namespace of tasks declared after the call.
 
@@ -35,43 +96,108 @@ def namespace(namespace=None):
     Register._default_namespace = namespace
 
 
+_TASK_ID_RE = re.compile(r'\s*([\w.]+)\((.*)\)\s*\Z', re.S)
+_PARAM_NAME_RE = re.compile(r'\s*(\w+)=')
+_PARAM_SEP_RE = re.compile(r',\s*(?=\w+=)')
+_LIST_END_RE = re.compile(r'\s*(,\s*|$)')
+_CLOSING = {'[': ']', '(': ')'}
+_parsed_task_ids = {}
+
+
+def _parse_list(value):
+    items = [item.strip() for item in value[1:-1].split(',')]
+    return [item[1:-1] if len(item) > 1 and item[0] == item[-1] and item[0] in '\'"' else item
+            for item in items if item]
+
+
+def _parse_task_id(task_id):
+    match = _TASK_ID_RE.match(task_id)
+    if not match:
+        raise ValueError('Invalid task_id %r' % task_id)
+    task_name, param_str = match.groups()
+
+    params = {}
+    pos = 0
+    while pos < len(param_str):
+        name_match = _PARAM_NAME_RE.match(param_str, pos)
+        if not name_match:
+            raise ValueError('Invalid parameters in task_id %r' % task_id)
+        name = name_match.group(1)
+        pos = name_match.end()
+        closing = _CLOSING.get(param_str[pos:pos + 1])
+        if closing is not None:
+            end = param_str.find(closing, pos)
+            if end == -1:
+                raise ValueError('Unterminated list parameter %s in task_id %r' % (name, task_id))
+            params[name] = _parse_list(param_str[pos:end + 1])
+            sep = _LIST_END_RE.match(param_str, end + 1)
+            if sep is None:
+                raise ValueError('Invalid parameters in task_id %r' % task_id)
+            pos = sep.end()
+        else:
+            sep = _PARAM_SEP_RE.search(param_str, pos)
+            if sep is None:
+                params[name] = param_str[pos:]
+                pos = len(param_str)
+            else:
+                params[name] = param_str[pos:sep.start()]
+                pos = sep.end()
+    return task_name, params
+
+
 def id_to_name_and_params(task_id):
     ''' Turn a task_id into a (task_family, {params}) tuple.
         E.g. calling with ``Foo(bar=bar, baz=baz)`` returns
         ``('Foo', {'bar': 'bar', 'baz': 'baz'})``
+
+        List parameters like ``foo=[a, b]`` are returned as lists. Results
+        are memoized since the same ids tend to be parsed over and over.
     '''
-    name_chars = pp.alphanums + '_'
-    parameter = (
-        (pp.Word(name_chars) +
-         pp.Literal('=').suppress() +
-         ((pp.Literal('(').suppress() | pp.Literal('[').suppress()) +
-          pp.ZeroOrMore(pp.Word(name_chars) +
-                        pp.ZeroOrMore(pp.Literal(',')).suppress()) +
-          (pp.Literal(')').suppress() |
-           pp.Literal(']').suppress()))).setResultsName('list_params',
-                                                        listAllMatches=True) |
-        (pp.Word(name_chars) +
-         pp.Literal('=').suppress() +
-         pp.Word(name_chars)).setResultsName('params', listAllMatches=True))
-
-    parser = (
-        pp.Word(name_chars).setResultsName('task') +
-        pp.Literal('(').suppress() +
-        pp.ZeroOrMore(parameter + (pp.Literal(',')).suppress()) +
-        pp.ZeroOrMore(parameter) +
-        pp.Literal(')').suppress())
-
-    parsed = parser.parseString(task_id).asDict()
-    task_name = parsed['task']
+    try:
+        task_name, params = _parsed_task_ids[task_id]
+    except KeyError:
+        task_name, params = _parse_task_id(task_id)
+        if len(_parsed_task_ids) >= 100000:
+            _parsed_task_ids.clear()
+        _parsed_task_ids[task_id] = task_name, params
+    # copy, callers may modify the result
+    return task_name, dict((k, list(v) if isinstance(v, list) else v) for k, v in params.iteritems())
+
+
+class _LRUInstanceCache(object):
+    """ Mapping holding at most ``size`` instances, evicting the least recently used. """
+
+    def __init__(self, size):
+        self._size = size
+        self._items = collections.OrderedDict()
+
+    def get(self, k):
+        try:
+            v = self._items.pop(k)
+        except KeyError:
+            return None
+        self._items[k] = v
+        return v
+
+    def __setitem__(self, k, v):
+        self._items.pop(k, None)
+        self._items[k] = v
+        while len(self._items) > self._size:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
 
-    params = {}
-    if 'params' in parsed:
-        for k, v in parsed['params']:
-            params[k] = v
-    if 'list_params' in parsed:
-        for x in parsed['list_params']:
-            params[x[0]] = x[1:]
-    return task_name, params
+
+class _ParamSchema(object):
+    """ The parameters of a Task class in the order they were declared and the
+    lookups derived from them, computed once per class. """
+
+    def __init__(self, params):
+        self.params = params
+        self.params_dict = dict(params)
+        self.positional = [(n, p) for n, p in params if not p.is_global]
+        self.globals = [(n, p) for n, p in params if p.is_global]
 
 
 class Register(abc.ABCMeta):
@@ -82,10 +208,19 @@ class Register(abc.ABCMeta):
     1. Cache instances of objects so that eg. ``X(1, 2, 3)`` always returns the
        same object.
     2. Keep track of all subclasses of :py:class:`Task` and expose them.
+
+    The instance cache holds every instance for the life of the process by
+    default. Long-lived processes can bound it with
+    :py:meth:`set_instance_cache_policy`.
     """
     __instance_cache = {}
+    __instance_cache_policy = ('dict', None)
+    _param_schemas = {}
+    _instance_cache_hits = 0
+    _instance_cache_misses = 0
     _default_namespace = None
     _reg = []
+    _reg_index = None  # task_family -> class, see _get_reg
     AMBIGUOUS_CLASS = object()  # Placeholder denoting an error
     """If this value is returned by :py:meth:`get_reg` then there is an
     ambiguous task name (two :py:class:`Task` have the same name). This denotes
@@ -101,9 +236,28 @@ class Register(abc.ABCMeta):
 
         cls = super(Register, metacls).__new__(metacls, classname, bases, classdict)
         metacls._reg.append(cls)
+        if Register._reg_index is not None:
+            Register._add_to_reg_index(Register._reg_index, cls)
 
         return cls
 
+    def __setattr__(cls, name, value):
+        """ Drops the cached parameter schemas when parameters are added or
+        replaced after class creation, e.g. by :py:func:`luigi.util.inherits`,
+        and the registry index when a class is renamed. """
+        if isinstance(value, Parameter) or isinstance(getattr(cls, name, None), Parameter):
+            Register._param_schemas = {}
+        if name in Register._REG_ATTRIBUTES:
+            Register._reg_index = None
+        super(Register, cls).__setattr__(name, value)
+
+    def __delattr__(cls, name):
+        if isinstance(getattr(cls, name, None), Parameter):
+            Register._param_schemas = {}
+        if name in Register._REG_ATTRIBUTES:
+            Register._reg_index = None
+        super(Register, cls).__delattr__(name)
+
     def __call__(cls, *args, **kwargs):
         """ Custom class instantiation utilizing instance cache.
 
@@ -117,8 +271,7 @@ class Register(abc.ABCMeta):
         if h == None:  # disabled
             return instantiate()
 
-        params = cls.get_params()
-        param_values = cls.get_param_values(params, args, kwargs)
+        param_values = cls._get_param_values(cls._get_param_schema(), args, kwargs)
 
         k = (cls, tuple(param_values))
 
@@ -128,21 +281,58 @@ class Register(abc.ABCMeta):
             logger.debug("Not all parameter values are hashable so instance isn't coming from the cache")
             return instantiate()  # unhashable types in parameters
 
-        if k not in h:
-            h[k] = instantiate()
+        instance = h.get(k)
+        if instance is None:
+            Register._instance_cache_misses += 1
+            instance = h[k] = instantiate()
+        else:
+            Register._instance_cache_hits += 1
+
+        return instance
 
-        return h[k]
+    @classmethod
+    def set_instance_cache_policy(self, policy, size=10000):
+        """Sets how instances are cached and clears the instance cache.
+
+        * ``dict`` (default) keeps all instances for the life of the process.
+        * ``weak`` keeps instances only while they are referenced elsewhere,
+          so a live task is still always returned for the same parameters.
+        * ``lru`` keeps the ``size`` most recently used instances. An evicted
+          instance that is still referenced is no longer the one returned
+          for its parameters.
+        """
+        if policy not in ('dict', 'weak', 'lru'):
+            logger.warning('Unknown instance cache policy %r, using dict', policy)
+            policy = 'dict'
+        Register.__instance_cache_policy = (policy, size)
+        Register.clear_instance_cache()
 
     @classmethod
     def clear_instance_cache(self):
         """Clear/Reset the instance cache."""
-        Register.__instance_cache = {}
+        policy, size = Register.__instance_cache_policy
+        if policy == 'weak':
+            Register.__instance_cache = weakref.WeakValueDictionary()
+        elif policy == 'lru':
+            Register.__instance_cache = _LRUInstanceCache(size)
+        else:
+            Register.__instance_cache = {}
+        Register._instance_cache_hits = Register._instance_cache_misses = 0
 
     @classmethod
     def disable_instance_cache(self):
         """Disables the instance cache."""
         Register.__instance_cache = None
 
+    @classmethod
+    def instance_cache_stats(self):
+        """Returns a dict with the number of cache ``hits``, ``misses`` and
+        the ``size`` of the instance cache."""
+        h = Register.__instance_cache
+        return {'hits': Register._instance_cache_hits,
+                'misses': Register._instance_cache_misses,
+                'size': 0 if h is None else len(h)}
+
     @property
     def task_family(cls):
         """The task family for the given class.
@@ -155,40 +345,54 @@ class Register(abc.ABCMeta):
         else:
             return "%s.%s" % (cls.task_namespace, cls.__name__)
 
+    # Attributes determining the task family of a class or if it's registered
+    _REG_ATTRIBUTES = frozenset(['__name__', 'task_namespace', 'run'])
+
+    @classmethod
+    def _add_to_reg_index(cls, reg, task_cls):
+        if task_cls.run != NotImplemented:
+            name = task_cls.task_family
+            if name in reg and reg[name] != task_cls and \
+                    reg[name] != cls.AMBIGUOUS_CLASS and \
+                    not issubclass(task_cls, reg[name]):
+                # Registering two different classes - this means we can't instantiate them by name
+                # The only exception is if one class is a subclass of the other. In that case, we
+                # instantiate the most-derived class (this fixes some issues with decorator wrappers).
+                reg[name] = cls.AMBIGUOUS_CLASS
+            else:
+                reg[name] = task_cls
+
+    @classmethod
+    def _get_reg(cls):
+        """ The registry index, kept up to date as classes are created and
+        rebuilt when a class is renamed. Don't modify it. """
+        reg = Register._reg_index
+        if reg is None:
+            reg = {}
+            for task_cls in cls._reg:
+                cls._add_to_reg_index(reg, task_cls)
+            Register._reg_index = reg
+        return reg
+
     @classmethod
     def get_reg(cls):
         """Return all of the registery classes.
 
         :return:  a ``dict`` of task_family -> class
         """
-        # We have to do this on-demand in case task names have changed later
-        reg = {}
-        for cls in cls._reg:
-            if cls.run != NotImplemented:
-                name = cls.task_family
-                if name in reg and reg[name] != cls and \
-                        reg[name] != cls.AMBIGUOUS_CLASS and \
-                        not issubclass(cls, reg[name]):
-                    # Registering two different classes - this means we can't instantiate them by name
-                    # The only exception is if one class is a subclass of the other. In that case, we
-                    # instantiate the most-derived class (this fixes some issues with decorator wrappers).
-                    reg[name] = cls.AMBIGUOUS_CLASS
-                else:
-                    reg[name] = cls
-
-        return reg
+        return dict(cls._get_reg())
 
     @classmethod
     def tasks_str(cls):
         """Human-readable register contents dump.
         """
-        return repr(sorted(Register.get_reg().keys()))
+        return repr(sorted(Register._get_reg().keys()))
 
     @classmethod
     def get_task_cls(cls, name):
         """Returns an unambiguous class or raises an exception.
         """
-        task_cls = Register.get_reg().get(name)
+        task_cls = Register._get_reg().get(name)
         if not task_cls:
             raise Exception('Task %r not found. Candidates are: %s' % (name, Register.tasks_str()))
         if task_cls == Register.AMBIGUOUS_CLASS:
@@ -202,7 +406,7 @@ class Register(abc.ABCMeta):
         :return: a ``dict`` of parameter name -> parameter.
         """
         global_params = {}
-        for t_name, t_cls in cls.get_reg().iteritems():
+        for t_name, t_cls in cls._get_reg().items():
             if t_cls == cls.AMBIGUOUS_CLASS:
                 continue
             for param_name, param_obj in t_cls.get_global_params():
@@ -248,6 +452,9 @@ class Task(object):
     __metaclass__ = Register
 
     _event_callbacks = {}
+    _background_callbacks = set()  # (class, event, callback) run in the background
+    # (class, event) -> callbacks, filled by _get_event_callbacks
+    _event_dispatch = {}
 
     # Priority of the task: the scheduler should favor available
     # tasks with higher priority values first.
@@ -258,30 +465,84 @@ class Task(object):
     # task requires 1 unit of the scp resource.
     resources = {}
 
+    # Whether run() may be executed in a thread of the worker process when
+    # the worker uses the "thread" executor. Set to False for tasks that
+    # install signal handlers, rely on random.seed being different per task,
+    # change the working directory or environment, or use libraries that
+    # aren't thread safe. Such tasks get a process of their own.
+    thread_safe = True
+
+    # Expected peak memory use of run() in MB. Workers with a memory budget
+    # only start the task when it fits. If None, the peak RSS of earlier runs
+    # of the same family is used.
+    memory_mb = None
+
+    # Seconds run() may take before the worker kills the process running it
+    # and marks the task as failed. If None, core/worker-timeout is used.
+    # Tasks with a timeout always run in a process of their own.
+    worker_timeout = None
+
+    # Parameters that may differ between tasks run together by run_batch().
+    # If set, the scheduler hands workers up to max_batch_size ready tasks of
+    # the family that agree on all other parameters at once.
+    batch_params = None
+    max_batch_size = 100
+
     @classmethod
-    def event_handler(cls, event):
-        """ Decorator for adding event handlers """
+    def event_handler(cls, event, background=False):
+        """ Decorator for adding event handlers
+
+        With ``background=True`` the handler is called in a separate thread
+        through a bounded queue, so slow handlers like metrics exporters don't
+        slow down the worker. Calls are dropped when the queue is full.
+        """
         def wrapped(callback):
             cls._event_callbacks.setdefault(cls, {}).setdefault(event, set()).add(callback)
+            if background:
+                Task._background_callbacks.add((cls, event, callback))
+            else:
+                Task._background_callbacks.discard((cls, event, callback))
+            Task._event_dispatch.clear()
             return callback
         return wrapped
 
+    @classmethod
+    def remove_event_handler(cls, event, callback):
+        """ Removes a handler added with :py:meth:`event_handler` """
+        cls._event_callbacks.get(cls, {}).get(event, set()).discard(callback)
+        Task._background_callbacks.discard((cls, event, callback))
+        Task._event_dispatch.clear()
+
+    @classmethod
+    def _get_event_callbacks(cls, event):
+        """ The callbacks for ``event`` on this class, as ``(callback, background)`` pairs """
+        try:
+            return Task._event_dispatch[cls, event]
+        except KeyError:
+            callbacks = []
+            for event_class, event_callbacks in cls._event_callbacks.items():
+                if issubclass(cls, event_class):
+                    callbacks.extend((callback, (event_class, event, callback) in Task._background_callbacks)
+                                     for callback in event_callbacks.get(event, ()))
+            Task._event_dispatch[cls, event] = callbacks
+            return callbacks
+
     def trigger_event(self, event, *args, **kwargs):
         """Trigger that calls all of the specified events associated with this
         class.
         """
-        for event_class, event_callbacks in self._event_callbacks.iteritems():
-            if not isinstance(self, event_class):
+        for callback, background in self._get_event_callbacks(event):
+            if background:
+                _event_queue.put(event, callback, args, kwargs)
                 continue
-            for callback in event_callbacks.get(event, []):
-                try:
-                    # callbacks are protected
-                    callback(*args, **kwargs)
-                except KeyboardInterrupt:
-                    return
-                except:
-                    logger.exception("Error in event callback for %r", event)
-                    pass
+            try:
+                # callbacks are protected
+                callback(*args, **kwargs)
+            except KeyboardInterrupt:
+                return
+            except:
+                logger.exception("Error in event callback for %r", event)
+                pass
 
     @property
     def task_family(self):
@@ -290,31 +551,39 @@ class Task(object):
         """
         return self.__class__.task_family
 
+    @classmethod
+    def _get_param_schema(cls):
+        try:
+            return Register._param_schemas[cls]
+        except KeyError:
+            # Computed on first use and not at class creation, or else there is no room to extend classes dynamically
+            params = []
+            for param_name in dir(cls):
+                param_obj = getattr(cls, param_name)
+                if not isinstance(param_obj, Parameter):
+                    continue
+
+                params.append((param_name, param_obj))
+
+            # The order the parameters are created matters. See Parameter class
+            params.sort(key=lambda t: t[1].counter)
+            schema = Register._param_schemas[cls] = _ParamSchema(params)
+            return schema
+
     @classmethod
     def get_params(cls):
         """Returns all of the Parameters for this Task."""
-        # We want to do this here and not at class instantiation, or else there is no room to extend classes dynamically
-        params = []
-        for param_name in dir(cls):
-            param_obj = getattr(cls, param_name)
-            if not isinstance(param_obj, Parameter):
-                continue
-
-            params.append((param_name, param_obj))
-
-        # The order the parameters are created matters. See Parameter class
-        params.sort(key=lambda t: t[1].counter)
-        return params
+        return list(cls._get_param_schema().params)
 
     @classmethod
     def get_global_params(cls):
         """Return the global parameters for this Task."""
-        return [(param_name, param_obj) for param_name, param_obj in cls.get_params() if param_obj.is_global]
+        return list(cls._get_param_schema().globals)
 
     @classmethod
     def get_nonglobal_params(cls):
         """Return the non-global parameters for this Task."""
-        return [(param_name, param_obj) for param_name, param_obj in cls.get_params() if not param_obj.is_global]
+        return list(cls._get_param_schema().positional)
 
     @classmethod
     def get_param_values(cls, params, args, kwargs):
@@ -325,16 +594,21 @@ class Task(object):
         :param kwargs: keyword arguments.
         :returns: list of `(name, value)` tuples, one for each parameter.
         """
+        return cls._get_param_values(_ParamSchema(params), args, kwargs)
+
+    @classmethod
+    def _get_param_values(cls, schema, args, kwargs):
         result = {}
 
-        params_dict = dict(params)
+        params = schema.params
+        params_dict = schema.params_dict
 
         # In case any exceptions are thrown, create a helpful description of how the Task was invoked
         # TODO: should we detect non-reprable arguments? These will lead to mysterious errors
         exc_desc = '%s[args=%s, kwargs=%s]' % (cls.__name__, args, kwargs)
 
         # Fill in the positional arguments
-        positional_params = [(n, p) for n, p in params if not p.is_global]
+        positional_params = schema.positional
         for i, arg in enumerate(args):
             if i >= len(positional_params):
                 raise parameter.UnknownParameterException('%s: takes at most %d parameters (%d given)' % (exc_desc, len(positional_params), len(args)))
@@ -377,8 +651,8 @@ class Task(object):
 
         can be instantiated as ``MyTask(count=10)``.
         """
-        params = self.get_params()
-        param_values = self.get_param_values(params, args, kwargs)
+        schema = self._get_param_schema()
+        param_values = self._get_param_values(schema, args, kwargs)
 
         # Set all values on class instance
         for key, value in param_values:
@@ -390,10 +664,9 @@ class Task(object):
 
         # Build up task id
         task_id_parts = []
-        param_objs = dict(params)
-        for param_name, param_value in param_values:
-            if dict(params)[param_name].significant:
-                task_id_parts.append('%s=%s' % (param_name, param_objs[param_name].serialize(param_value)))
+        for (param_name, param_value), (_, param_obj) in zip(param_values, schema.params):
+            if param_obj.significant:
+                task_id_parts.append('%s=%s' % (param_name, param_obj.serialize(param_value)))
 
         self.task_id = '%s(%s)' % (self.task_family, ', '.join(task_id_parts))
         self.__hash = hash(self.task_id)
@@ -426,7 +699,7 @@ class Task(object):
     def to_str_params(self):
         """Opposite of from_str_params"""
         params_str = {}
-        params = dict(self.get_params())
+        params = self._get_param_schema().params_dict
         for param_name, param_value in self.param_kwargs.iteritems():
             params_str[param_name] = params[param_name].serialize(param_value)
 
@@ -473,8 +746,50 @@ class Task(object):
             warnings.warn("Task %r without outputs has no custom complete() method" % self)
             return False
 
+        if len(outputs) > 1 and all(_has_plain_exists(output) and _batches_exists(output.fs) for output in outputs):
+            # one exists_many() per file system, e.g. one hadoop fs call for all outputs on HDFS
+            by_fs = {}
+            for output in outputs:
+                by_fs.setdefault(_fs_key(output.fs), (output.fs, []))[1].append(output.path)
+            return all(all(fs.exists_many(paths).itervalues()) for fs, paths in by_fs.itervalues())
+
         return all(itertools.imap(lambda output: output.exists(), outputs))
 
+    @classmethod
+    def bulk_complete(cls, parameter_tuples):
+        """Returns those of ``parameter_tuples`` for which this Task is complete.
+
+        Each element is either a tuple of values for the non-global parameters
+        (in positional order) or, for a Task with a single parameter, a bare
+        value. The worker uses this to check many sibling instances of a family
+        at once, e.g. when :py:meth:`requires` returns one instance per date.
+
+        If :py:meth:`complete` is not overridden and all outputs are plain
+        :py:class:`~luigi.target.FileSystemTarget` instances, existence of all
+        outputs is checked with one
+        :py:meth:`~luigi.target.FileSystem.exists_many` call per file system.
+        Otherwise :py:meth:`complete` is called for each instance. Tasks with a
+        custom :py:meth:`complete` can override this with an efficient
+        implementation, keeping the logic consistent with :py:meth:`complete`.
+        """
+        parameter_tuples = list(parameter_tuples)
+        tasks = [cls(*p) if isinstance(p, tuple) else cls(p) for p in parameter_tuples]
+
+        if cls.complete.im_func is Task.complete.im_func:
+            outputs = [flatten(t.output()) for t in tasks]
+            if all(outputs) and all(_has_plain_exists(o) for out in outputs for o in out):
+                paths_by_fs = {}
+                for out in outputs:
+                    for o in out:
+                        paths_by_fs.setdefault(_fs_key(o.fs), (o.fs, set()))[1].add(o.path)
+                existing = set()
+                for key, (fs, paths) in paths_by_fs.iteritems():
+                    existing.update((key, path) for path, exists in fs.exists_many(paths).iteritems() if exists)
+                return [p for p, out in zip(parameter_tuples, outputs)
+                        if all((_fs_key(o.fs), o.path) in existing for o in out)]
+
+        return [p for p, t in zip(parameter_tuples, tasks) if t.complete()]
+
     def output(self):
         """The output that this Task produces.
 
@@ -541,6 +856,29 @@ class Task(object):
         """The task run method, to be overridden in a subclass."""
         pass  # default impl
 
+    @classmethod
+    def run_batch(cls, tasks):
+        """Runs several tasks of this class together, for classes with
+        :py:attr:`batch_params`. Override to share setup like connections or
+        loaded models between the tasks.
+
+        Raising an exception fails all the tasks. To fail only some, return a
+        dict of task -> exception for them, the others succeed. For their
+        tracebacks to be reported, return ``sys.exc_info()`` instead of the
+        exception, taken in the except clause handling it.
+
+        The default implementation calls :py:meth:`run` of each task. Tasks
+        whose run() yields dynamic requirements are never batched.
+        """
+        failures = {}
+        for task in tasks:
+            try:
+                task.run()
+            except Exception:
+                logger.exception('Batched task %s failed', task.task_id)
+                failures[task] = sys.exc_info()
+        return failures
+
     def on_failure(self, exception):
         """ Override for custom error handling
 
@@ -589,6 +927,26 @@ class WrapperTask(Task):
         return all(r.complete() for r in flatten(self.requires()))
 
 
+def _has_plain_exists(output):
+    """True if ``output`` is a FileSystemTarget delegating exists() to its file system."""
+    return (isinstance(output, FileSystemTarget) and
+            type(output).exists.im_func is FileSystemTarget.exists.im_func)
+
+
+def _batches_exists(fs):
+    """True if ``fs`` overrides exists_many(), checking many paths at once
+    saves something there. Otherwise it's an exists() call per path anyway."""
+    exists_many = getattr(type(fs), 'exists_many', None)
+    return exists_many is not None and \
+        getattr(exists_many, 'im_func', exists_many) is not getattr(FileSystem.exists_many, 'im_func', FileSystem.exists_many)
+
+
+def _fs_key(fs):
+    """Groups targets by file system. Targets often get their own instance of a
+    stateless client (e.g. HdfsTarget), those are interchangeable."""
+    return type(fs) if not getattr(fs, '__dict__', True) else id(fs)
+
+
 def getpaths(struct):
     """ Maps all Tasks in a structured data object to their .output()"""
     if isinstance(struct, Task):
@@ -103,10 +103,12 @@ class RangeHourlyBase(luigi.WrapperTask):
     def missing_datehours(self, task_cls, finite_datehours):
         """Override in subclasses to do bulk checks.
 
-        This is a conservative base implementation that brutally checks
-        completeness, instance by instance. Inadvisable as it may be slow.
+        This is a conservative base implementation that relies on
+        task_cls.bulk_complete, which checks completeness instance by instance
+        unless the task or its outputs provide something smarter.
         """
-        return [d for d in finite_datehours if not task_cls(d).complete()]
+        complete = set(task_cls.bulk_complete(finite_datehours))
+        return [d for d in finite_datehours if d not in complete]
 
     def _emit_metrics(self, missing_datehours, now):
         """For consistent metrics one should consider the entire range, but it
@@ -293,9 +295,13 @@ class RangeHourly(RangeHourlyBase):
         globs = _constrain_glob(glob, paths)
         time_start = time.time()
         listing = []
-        for g in sorted(globs):
-            logger.debug('Listing %s' % g)
-            listing.extend(filesystem.listdir(g))
+        if hasattr(filesystem, 'listdir_many'):
+            logger.debug('Listing %d globs at once' % len(globs))
+            listing.extend(filesystem.listdir_many(sorted(globs)))
+        else:
+            for g in sorted(globs):
+                logger.debug('Listing %s' % g)
+                listing.extend(filesystem.listdir(g))
         logger.debug('%d %s listings took %f s to return %d items' % (len(globs), filesystem.__class__.__name__, time.time() - time_start, len(listing)))
         return set(listing)
 
@@ -12,28 +12,42 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
+# Not imported by ``import luigi``, only to schedule and run tasks, which
+# needs multiprocessing, notifications, rpc and the caches anyway. interface
+# is imported where it's used, it imports this module and argparse.
 import random
+import resource
 from scheduler import (CentralPlannerScheduler, PENDING, RUNNING, FAILED,
                        SUSPENDED, DONE, DISABLED)
 import collections
+import errno
+import fcntl
+import select
+import signal
+import subprocess
 import threading
 import time
 import os
 import socket
 import configuration
+import completeness_cache
+import hdfs_metadata_cache
+import plan_cache
 import traceback
 import logging
 import warnings
 import notifications
 import getpass
+import inspect
+import cPickle as pickle
 import multiprocessing # Note: this seems to have some stability issues: https://github.com/spotify/luigi/pull/438
 import Queue
-import luigi.interface
+from multiprocessing.pool import ThreadPool
 import sys
 import types
-import interface
+import rpc
 from target import Target
-from task import Task, flatten, getpaths
+from task import Task, flatten, flush_events, getpaths
 from event import Event
 
 try:
@@ -55,25 +69,70 @@ class TaskException(Exception):
 class TaskProcess(multiprocessing.Process):
     ''' Wrap all task execution in this class.
 
-    Mainly for convenience since this is run in a separate process. '''
-    def __init__(self, task, worker_id, result_queue, random_seed=False):
+    Mainly for convenience since this is run in a separate process.
+
+    If ``resume_conn`` is given, a task whose ``run()`` yields requirements
+    that aren't complete yet is not ended as SUSPENDED. Instead it reports
+    SUSPENDED and waits for a message on ``resume_conn``, then continues the
+    same generator: a true value means the requirements should be done now,
+    a false value (or the pipe being closed) that the task is abandoned.
+
+    Pass ``shared_process=True`` when running it in a thread or in the worker
+    process itself, where the memory it uses can't be told apart. '''
+    def __init__(self, task, worker_id, result_queue, random_seed=False, resume_conn=None,
+                 profiler=None, shared_process=False):
         super(TaskProcess, self).__init__()
         self.task = task
         self.worker_id = worker_id
         self.result_queue = result_queue
         self.random_seed = random_seed
+        self.resume_conn = resume_conn
+        self.profiler = profiler
+        self.shared_process = shared_process
+        self._results = []
+
+    def _park(self, missing, new_deps):
+        ''' Reports the task as suspended and waits until it is resumed.
+        Returns False if it was abandoned instead. '''
+        self.result_queue.put(
+            (self.task.task_id, SUSPENDED, '', missing, new_deps, None))
+        logger.info('[pid %s] Worker %s suspended %s', os.getpid(),
+                    self.worker_id, self.task.task_id)
+        try:
+            resumed = self.resume_conn.recv()
+        except EOFError:
+            resumed = False
+        if resumed:
+            logger.info('[pid %s] Worker %s resumed   %s', os.getpid(),
+                        self.worker_id, self.task.task_id)
+        return resumed
 
     def run(self):
+        try:
+            if self.profiler is None:
+                self._run()
+            else:
+                self.profiler.profile(self.task.task_id, self._run)
+        finally:
+            # sent after the profile is saved, so it's there when the worker is done
+            for result in self._results:
+                self.result_queue.put(result)
+            if multiprocessing.current_process() is self:
+                flush_events()  # the process exits right after this
+
+    def _run(self):
         logger.info('[pid %s] Worker %s running   %s', os.getpid(), self.worker_id, self.task.task_id)
 
         if self.random_seed:
             # Need to have different random seeds if running in separate processes
             random.seed((os.getpid(), time.time()))
 
+        usage_before = _resource_snapshot(reset_peak_rss=not self.shared_process)
         status = FAILED
         error_message = ''
         missing = []
         new_deps = []
+        abandoned = False
         try:
             # Verify that all the tasks are fulfilled!
             missing = [dep.task_id for dep in self.task.deps() if not dep.complete()]
@@ -104,7 +163,17 @@ class TaskProcess(multiprocessing.Process):
                         if status == RUNNING:
                             self.result_queue.put(
                                 (self.task.task_id, status, '', missing,
-                                 new_deps))
+                                 new_deps, None))
+                            next_send = getpaths(requires)
+                        elif self.resume_conn is not None:
+                            parked_at = time.time()
+                            while status == SUSPENDED:
+                                if not self._park(missing, new_deps):
+                                    abandoned = True
+                                    return
+                                status = (RUNNING if all(t.complete() for t in new_req)
+                                          else SUSPENDED)
+                            t0 += time.time() - parked_at  # don't count time spent waiting
                             next_send = getpaths(requires)
                         else:
                             logger.info(
@@ -131,8 +200,270 @@ class TaskProcess(multiprocessing.Process):
             subject = "Luigi: %s FAILED" % self.task
             notifications.send_error_email(subject, error_message)
         finally:
-            self.result_queue.put(
-                (self.task.task_id, status, error_message, missing, new_deps))
+            if not abandoned:
+                usage = None
+                if status in (DONE, FAILED):
+                    usage = _resource_usage(usage_before, _resource_snapshot())
+                self._results.append((self.task.task_id, status, error_message, missing, new_deps, usage))
+
+
+class BatchTaskProcess(TaskProcess):
+    ''' Runs tasks of a family with ``batch_params`` together through the
+    ``run_batch`` class method, reporting a result for each of them. '''
+    def __init__(self, tasks, worker_id, result_queue, random_seed=False, profiler=None,
+                 shared_process=False):
+        super(BatchTaskProcess, self).__init__(tasks[0], worker_id, result_queue,
+                                               random_seed=random_seed, profiler=profiler,
+                                               shared_process=shared_process)
+        self.tasks = tasks
+
+    def _run(self):
+        logger.info('[pid %s] Worker %s running   batch of %d %s tasks', os.getpid(),
+                    self.worker_id, len(self.tasks), self.task.task_family)
+
+        if self.random_seed:
+            random.seed((os.getpid(), time.time()))
+
+        usage_before = _resource_snapshot(reset_peak_rss=not self.shared_process)
+        runnable = []
+        for task in self.tasks:
+            try:
+                missing = [dep.task_id for dep in task.deps() if not dep.complete()]
+            except KeyboardInterrupt:
+                raise
+            except BaseException as ex:
+                logger.exception('[pid %s] Worker %s failed    %s', os.getpid(), self.worker_id, task)
+                self._results.append((task.task_id, FAILED, notifications.wrap_traceback(task.on_failure(ex)), [], [], None))
+                continue
+            if missing:
+                deps = 'dependency' if len(missing) == 1 else 'dependencies'
+                error_message = 'Unfulfilled %s at run time: %s' % (deps, ', '.join(missing))
+                logger.info('[pid %s] Worker %s failed    %s: %s', os.getpid(), self.worker_id, task, error_message)
+                self._results.append((task.task_id, FAILED, error_message, missing, [], None))
+                continue
+            runnable.append(task)
+        if not runnable:
+            return
+
+        for task in runnable:
+            task.trigger_event(Event.START, task)
+        t0 = time.time()
+        try:
+            failures = type(self.task).run_batch(runnable) or {}
+        except KeyboardInterrupt:
+            raise
+        except BaseException as ex:
+            logger.exception('[pid %s] Worker %s failed    batch of %d %s tasks', os.getpid(),
+                             self.worker_id, len(runnable), self.task.task_family)
+            failures = dict((task, ex) for task in runnable)
+            # the traceback is only available here
+            error_messages = dict((task, notifications.wrap_traceback(task.on_failure(ex))) for task in runnable)
+        else:
+            error_messages = {}
+            for task, failure in failures.items():
+                failures[task], error_messages[task] = _batch_failure(task, failure)
+        processing_time = (time.time() - t0) / len(runnable)
+        usage = _split_resource_usage(_resource_usage(usage_before, _resource_snapshot()), len(runnable))
+
+        for task in runnable:
+            task.trigger_event(Event.PROCESSING_TIME, task, processing_time)
+            if task in failures:
+                task.trigger_event(Event.FAILURE, task, failures[task])
+                self._results.append((task.task_id, FAILED, error_messages[task], [], [], usage))
+            else:
+                try:
+                    expl = json.dumps(task.on_success())
+                except Exception:
+                    logger.exception('[pid %s] Worker %s on_success of %s failed', os.getpid(), self.worker_id, task)
+                    self._results.append((task.task_id, FAILED, traceback.format_exc(), [], [], usage))
+                    continue
+                task.trigger_event(Event.SUCCESS, task)
+                self._results.append((task.task_id, DONE, expl, [], [], usage))
+
+        if failures:
+            subject = 'Luigi: %d of %d %s tasks FAILED' % (len(failures), len(runnable), self.task.task_family)
+            notifications.send_error_email(subject, '\n\n'.join(error_messages[task] for task in runnable
+                                                                  if task in failures))
+        logger.info('[pid %s] Worker %s done      batch of %d %s tasks, %d failed', os.getpid(),
+                    self.worker_id, len(runnable), self.task.task_family, len(failures))
+
+
+def _batch_failure(task, failure):
+    ''' Returns the exception and error message of a task failed by
+    run_batch(), given its exception or sys.exc_info() of it. on_failure()
+    is called handling it again, so that it can format its traceback. '''
+    exc_info = failure if isinstance(failure, tuple) else (type(failure), failure, None)
+    try:
+        raise exc_info[0], exc_info[1], exc_info[2]
+    except BaseException as ex:
+        return ex, notifications.wrap_traceback(task.on_failure(ex))
+
+
+def _batchable(task):
+    ''' Whether the task is run through run_batch(), which can't suspend a
+    task for the requirements its run() yields '''
+    return bool(task.batch_params) and not inspect.isgeneratorfunction(task.run)
+
+
+class PoolProcess(multiprocessing.Process):
+    ''' Long-lived child process of the ``pool`` executor.
+
+    Receives pickled tasks over a pipe and runs them one at a time using
+    :py:class:`TaskProcess`, so results are reported through the same queue
+    as with the default fork-per-task executor. '''
+    def __init__(self, worker_id, result_queue, profiler=None):
+        super(PoolProcess, self).__init__()
+        self.worker_id = worker_id
+        self.result_queue = result_queue
+        self.profiler = profiler
+        self.tasks_run = 0
+        self._task_reader, self._task_writer = multiprocessing.Pipe(duplex=False)
+
+    def submit(self, task_id, payload, profile=False):
+        self.tasks_run += 1
+        self._task_writer.send((task_id, payload, profile))
+
+    def retire(self):
+        ''' Asks the process to exit once it's done with its current task '''
+        try:
+            self._task_writer.send(None)
+        except (IOError, OSError):
+            pass  # already gone
+
+    def run(self):
+        random.seed((os.getpid(), time.time()))
+        try:
+            self._serve()
+        finally:
+            flush_events()
+
+    def _serve(self):
+        while True:
+            try:
+                message = self._task_reader.recv()
+            except EOFError:
+                return
+            if message is None:
+                return
+            task_id, payload, profile = message
+            try:
+                task = pickle.loads(payload)
+            except Exception:
+                logger.exception('[pid %s] Worker %s failed to unpickle %s', os.getpid(), self.worker_id, task_id)
+                self.result_queue.put((task_id, FAILED, traceback.format_exc(), [], [], None))
+                continue
+            TaskProcess(task, self.worker_id, self.result_queue,
+                        profiler=self.profiler if profile else None).run()
+
+
+def _resource_snapshot(reset_peak_rss=False):
+    ''' CPU, memory, I/O and context switch counters of the current process.
+
+    With reset_peak_rss, the peak RSS of the process is first reset to its
+    current RSS, so the peak of a later snapshot is the peak since this one.
+    Memory and I/O counters are only available on Linux. '''
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    snapshot = {
+        'user_time': usage.ru_utime,
+        'system_time': usage.ru_stime,
+        'voluntary_switches': usage.ru_nvcsw,
+        'involuntary_switches': usage.ru_nivcsw,
+    }
+    try:
+        with open('/proc/self/io') as f:
+            io = dict(line.split(':', 1) for line in f if ':' in line)
+        # bytes actually fetched from or sent to storage, unlike rchar/wchar
+        # which count page cache hits and pipes too
+        snapshot['read_bytes'] = int(io['read_bytes'])
+        snapshot['write_bytes'] = int(io['write_bytes'])
+    except (IOError, KeyError, ValueError):
+        pass
+    if reset_peak_rss:
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')  # resets VmHWM, see proc(5)
+            snapshot['peak_rss_reset'] = True
+        except IOError:
+            pass
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+        snapshot['rss_kb'] = int(status['VmRSS'].split()[0])
+        snapshot['peak_rss_kb'] = int(status['VmHWM'].split()[0])
+    except (IOError, KeyError, ValueError):
+        pass
+    return snapshot
+
+
+_RESOURCE_COUNTERS = ('user_time', 'system_time', 'voluntary_switches', 'involuntary_switches',
+                      'read_bytes', 'write_bytes')
+
+
+def _resource_usage(before, after):
+    ''' Resources used between two snapshots.
+
+    ``max_rss_kb`` is how far the RSS of the process rose above its RSS at
+    the first snapshot, which must have reset the peak. Memory inherited
+    from the worker or kept by earlier tasks of a pool process isn't
+    counted. It's left out when the peak couldn't be reset. When tasks run in
+    threads or in the worker process itself, the counters include everything
+    else running in that process at the same time. '''
+    usage = dict((key, after[key] - before[key]) for key in _RESOURCE_COUNTERS
+                 if key in before and key in after)
+    if before.get('peak_rss_reset') and 'rss_kb' in before and 'peak_rss_kb' in after:
+        usage['max_rss_kb'] = max(0, after['peak_rss_kb'] - before['rss_kb'])
+    return usage
+
+
+def _split_resource_usage(usage, n):
+    ''' The share of each of n tasks run together: counters are divided
+    evenly, the peak RSS is the one of the whole batch '''
+    return dict((key, value if key == 'max_rss_kb' else value / float(n))
+                for key, value in usage.iteritems())
+
+
+def _kill_process_tree(pid):
+    ''' Kills a process and all of its descendants '''
+    children = collections.defaultdict(list)
+    try:
+        ps = subprocess.Popen(['ps', '-e', '-o', 'pid=', '-o', 'ppid='], stdout=subprocess.PIPE)
+        for line in ps.communicate()[0].splitlines():
+            child, parent = line.split()
+            children[int(parent)].append(int(child))
+    except (OSError, ValueError):
+        logger.warning('Could not list processes, killing only %s and not its children', pid, exc_info=1)
+    pids = [pid]
+    for p in pids:  # parents come first, so they can't start new children
+        pids.extend(children[p])
+    for p in pids:
+        try:
+            os.kill(p, signal.SIGKILL)
+        except OSError:
+            pass  # already gone
+
+
+def _available_memory_mb():
+    ''' MemAvailable from /proc/meminfo in MB or None if it can't be read '''
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, ValueError):
+        pass
+    return None
+
+
+def _rss_mb(pid):
+    ''' Resident set size of a process in MB or None if it can't be read (non-Linux) '''
+    try:
+        with open('/proc/%d/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, ValueError):
+        pass
+    return None
 
 
 class Worker(object):
@@ -145,7 +476,9 @@ class Worker(object):
 
     def __init__(self, scheduler=CentralPlannerScheduler(), worker_id=None,
                  worker_processes=1, ping_interval=None, keep_alive=None,
-                 wait_interval=None, max_reschedules=None, count_uniques=None):
+                 wait_interval=None, max_reschedules=None, count_uniques=None,
+                 worker_executor='process', keep_suspended=None, profiler=None,
+                 parallel_scheduling=None):
         self.worker_processes = int(worker_processes)
         self._worker_info = self._generate_worker_info()
 
@@ -175,6 +508,38 @@ class Worker(object):
             max_reschedules = config.getint('core', 'max-reschedules', 1)
         self.__max_reschedules = max_reschedules
 
+        # keep tasks that yield incomplete requirements waiting in their
+        # process instead of running them again from the start
+        if keep_suspended is None:
+            keep_suspended = config.getboolean('core', 'worker-keep-suspended', False)
+        self.__keep_suspended = keep_suspended
+
+        # admit new tasks only while they fit in these, see _wait_for_memory
+        self.__memory_budget_mb = config.getint('core', 'worker-memory-budget-mb', 0)
+        self.__memory_reserve_mb = config.getint('core', 'worker-memory-reserve-mb', 0)
+        self._family_memory_mb = {}  # largest peak RSS seen per task family
+
+        # kill tasks running for longer than this, unless they set worker_timeout
+        self.__task_timeout = config.getint('core', 'worker-timeout', 0)
+        self._deadlines = {}  # task_id -> time after which its process is killed
+        self._cancel_requests = set()  # task_ids the scheduler asked to stop
+        self._starting = set()  # task_ids got from the scheduler, not started yet
+
+        # a profiling.TaskProfiler if tasks should be profiled
+        self._profiler = profiler
+        self._profiled = collections.defaultdict(list)  # family -> task_ids
+
+        # How tasks are run apart from the worker: "process" forks once
+        # per task, "pool" reuses a fixed set of long-lived processes and
+        # "thread" runs tasks in threads of this process
+        if worker_executor not in ('process', 'pool', 'thread'):
+            logger.warning('Unknown worker executor %r, forking once per task', worker_executor)
+            worker_executor = 'process'
+        self._executor = worker_executor
+        self._pool_max_tasks = config.getint('core', 'worker-pool-max-tasks', 0)
+        self._pool_max_rss_mb = config.getint('core', 'worker-pool-max-rss-mb', 0)
+        self._pool_idle = []
+
         self._id = worker_id
         self._scheduler = scheduler
 
@@ -183,16 +548,34 @@ class Worker(object):
         self._suspended_tasks = {}
 
         self._first_task = None
+        self._add_task_batch = None  # add_task calls to send together, see _schedule
+        self._batch_add_supported = True
+        self.__check_complete_threads = config.getint('core', 'worker-check-complete-threads', 8)
+        # also check the requirements of each task in parallel in add(), not
+        # only those yielded by running tasks
+        if parallel_scheduling is None:
+            parallel_scheduling = config.getboolean('core', 'parallel-scheduling', False)
+        self._parallel_scheduling = parallel_scheduling
+        self._precomputed_complete = {}  # task_id -> result of a bulk completeness check
+        self._cached_complete = set()  # task_ids a bulk check found complete in a cache
+        self._cache_checked = set()  # task_ids a bulk check looked up in the caches
+        self._completeness_cache = completeness_cache.get_cache()
+        self._plan_cache = plan_cache.get_cache()
+        self._hdfs_metadata_cache = hdfs_metadata_cache.get_cache()
+        self._write_caches = True  # dry runs only read the caches
 
         self.add_succeeded = True
         self.run_succeeded = True
         self.unfulfilled_counts = collections.defaultdict(int)
 
+        cancel_requests = self._cancel_requests
+
         class KeepAliveThread(threading.Thread):
             """ Periodically tell the scheduler that the worker still lives """
             def __init__(self):
                 super(KeepAliveThread, self).__init__()
                 self._should_stop = threading.Event()
+                self.worker_id = worker_id  # changed by worker daemons between runs
 
             def stop(self):
                 self._should_stop.set()
@@ -201,11 +584,14 @@ class Worker(object):
                 while True:
                     self._should_stop.wait(ping_interval)
                     if self._should_stop.is_set():
-                        logger.info("Worker %s was stopped. Shutting down Keep-Alive thread" % worker_id)
+                        logger.info("Worker %s was stopped. Shutting down Keep-Alive thread" % self.worker_id)
                         break
                     fork_lock.acquire()
                     try:
-                        scheduler.ping(worker=worker_id)
+                        response = scheduler.ping(worker=self.worker_id)
+                        # tasks to cancel, from schedulers supporting it
+                        if isinstance(response, dict):
+                            cancel_requests.update(response.get('cancel', []))
                     except:  # httplib.BadStatusLine:
                         logger.warning('Failed pinging scheduler')
                     finally:
@@ -218,20 +604,29 @@ class Worker(object):
         # Keep info about what tasks are running (could be in other processes)
         self._task_result_queue = multiprocessing.Queue()
         self._running_tasks = {}
+        self._sentinels = {}  # fd -> child process, see _start_process
+        self._parked_tasks = collections.OrderedDict()  # task_id -> process or thread of a suspended task
+        self._resume_conns = {}  # task_id -> pipe to resume it, see TaskProcess
 
     def stop(self):
         """ Stop the KeepAliveThread associated with this Worker
             This should be called whenever you are done with a worker instance to clean up
 
         Warning: this should _only_ be performed if you are sure this worker
-        is not performing any work or will perform any work after this has been called
+        is not performing any work or will perform any work after this has been called.
+        Processes still running tasks are killed.
 
-        TODO: also kill all currently running tasks
         TODO (maybe): Worker should be/have a context manager to enforce calling this
             whenever you stop using a Worker instance
         """
         self._keep_alive_thread.stop()
         self._keep_alive_thread.join()
+        for fd, p in self._sentinels.items():
+            if any(running is p for running in self._running_tasks.itervalues()):
+                logger.warning('Killing process %s still running tasks', p.pid)
+                _kill_process_tree(p.pid)
+                self._reap_child(fd, report=False)
+        flush_events()
 
     def _generate_worker_info(self):
         # Generate as much info as possible about the worker
@@ -292,17 +687,28 @@ class Worker(object):
         if self._first_task is None and hasattr(task, 'task_id'):
             self._first_task = task.task_id
         self.add_succeeded = True
-        stack = [task]
         self._validate_task(task)
-        seen = set([task.task_id])
+        try:
+            self._add_walk(task, set())
+        finally:
+            self._clear_precomputed()
+        return self.add_succeeded
+
+    def _add_walk(self, task, seen):
+        """ Schedules task and its dependencies, skipping tasks in seen """
+        stack = [task]
+        seen.add(task.task_id)
         try:
             while stack:
                 current = stack.pop()
+                siblings = []
                 for next in self._add(current):
                     if next.task_id not in seen:
                         self._validate_task(next)
                         seen.add(next.task_id)
                         stack.append(next)
+                        siblings.append(next)
+                self._bulk_check_complete(siblings, parallel=self._parallel_scheduling)
         except (KeyboardInterrupt, TaskException):
             raise
         except Exception as ex:
@@ -311,10 +717,146 @@ class Worker(object):
             self._log_unexpected_error(task)
             task.trigger_event(Event.BROKEN_TASK, task, ex)
             self._email_unexpected_error(task, formatted_traceback)
-        return self.add_succeeded
+
+    def _add_new_requirements(self, task, new_requirements):
+        """ Loads and schedules the requirements yielded by a running task.
+
+        Duplicates are loaded once, completeness is checked in bulk or in
+        parallel and all tasks are registered with a single ``add_tasks``
+        call if the scheduler supports it. Returns the loaded tasks.
+        """
+        import interface  # imports this module, and argparse etc. for the command line
+        t0 = time.time()
+        new_req = []
+        loaded = set()
+        for name, params in new_requirements:
+            key = (name, repr(sorted(params.items())))
+            if key not in loaded:
+                loaded.add(key)
+                new_req.append(interface.load_task(task, name, params))
+
+        for t in new_req:
+            self._validate_task(t)
+        self._bulk_check_complete(new_req, parallel=True)
+        self._add_task_batch = []
+        seen = set()
+        try:
+            for t in new_req:
+                if t.task_id not in seen:
+                    self._add_walk(t, seen)
+        finally:
+            self._clear_precomputed()
+            batch, self._add_task_batch = self._add_task_batch, None
+            self._flush_add_tasks(batch)
+
+        task.trigger_event(Event.NEW_REQUIREMENTS_TIME, task, time.time() - t0, len(new_req))
+        return new_req
+
+    def _schedule(self, **kwargs):
+        """ Calls add_task on the scheduler, or queues the call while the
+        requirements of a task are added in a batch """
+        if self._add_task_batch is not None:
+            self._add_task_batch.append(kwargs)
+        else:
+            self._scheduler.add_task(self._id, **kwargs)
+
+    def _flush_add_tasks(self, batch):
+        if not batch:
+            return
+        if self._batch_add_supported:
+            try:
+                self._scheduler.add_tasks(self._id, batch)
+                return
+            except (AttributeError, rpc.RPCError):
+                logger.info('Scheduler does not support add_tasks, adding tasks one by one. '
+                            'Is it possible that you need to update your scheduler?')
+                self._batch_add_supported = False
+        for kwargs in batch:
+            self._scheduler.add_task(self._id, **kwargs)
+
+    def _clear_precomputed(self):
+        ''' Don't let results of one traversal leak into later ones '''
+        self._precomputed_complete.clear()
+        self._cached_complete.clear()
+        self._cache_checked.clear()
+
+    def _is_cached_complete(self, task):
+        ''' Looks task up in the caches of complete tasks '''
+        if self._plan_cache is not None and self._plan_cache.is_done(task):
+            return True
+        return self._completeness_cache is not None and self._completeness_cache.get(task)
 
     def _check_complete(self, task):
-        return task.complete()
+        if task.task_id in self._cached_complete:
+            self._cached_complete.discard(task.task_id)
+            return True
+        if task.task_id in self._precomputed_complete:
+            is_complete = self._precomputed_complete.pop(task.task_id)
+        elif task.task_id not in self._cache_checked and self._is_cached_complete(task):
+            return True
+        else:
+            is_complete = task.complete()
+        self._cache_checked.discard(task.task_id)
+        # only computed results, a hit must not renew the expiry of its entry
+        if is_complete is True and self._completeness_cache is not None and self._write_caches:
+            self._completeness_cache.put(task)
+        return is_complete
+
+    def _bulk_check_complete(self, tasks, parallel=False):
+        """ Checks sibling tasks of the same family with one ``bulk_complete``
+        call per family. Results are picked up by :py:meth:`_check_complete`.
+        With parallel=True, tasks that weren't checked in bulk are then
+        checked using a pool of threads.
+
+        Any error falls back to checking the tasks one by one, so that errors
+        in ``complete()`` are reported for the right task.
+        """
+        by_class = collections.defaultdict(list)
+        for task in tasks:
+            if self._is_cached_complete(task):
+                self._cached_complete.add(task.task_id)
+            else:
+                self._cache_checked.add(task.task_id)
+                by_class[task.__class__].append(task)
+
+        for task_cls, siblings in by_class.iteritems():
+            if len(siblings) < 2:
+                continue
+            if (task_cls.bulk_complete.im_func is Task.bulk_complete.im_func and
+                    task_cls.complete.im_func is not Task.complete.im_func):
+                continue  # the default would just call complete() on each one
+            param_names = [name for name, _ in task_cls.get_nonglobal_params()]
+            try:
+                by_params = dict((tuple(t.param_kwargs[name] for name in param_names), t)
+                                 for t in siblings)
+                complete = set(task_cls.bulk_complete(by_params.keys()))
+            except KeyboardInterrupt:
+                raise
+            except:
+                logger.debug('bulk_complete() of %s failed, checking tasks one by one',
+                             task_cls.task_family, exc_info=1)
+                continue
+            for params, task in by_params.iteritems():
+                self._precomputed_complete[task.task_id] = params in complete
+
+        remaining = [t for t in tasks if t.task_id not in self._precomputed_complete and
+                     t.task_id not in self._cached_complete]
+        if parallel and len(remaining) > 1 and self.__check_complete_threads > 1:
+            pool = ThreadPool(min(self.__check_complete_threads, len(remaining)))
+            try:
+                results = pool.map(self._try_complete, remaining)
+            finally:
+                pool.close()
+                pool.join()
+            for task, is_complete in zip(remaining, results):
+                if is_complete in (True, False):
+                    self._precomputed_complete[task.task_id] = is_complete
+
+    def _try_complete(self, task):
+        try:
+            return task.complete()
+        except Exception:
+            return None  # checked again and reported by _add
 
     def _add(self, task):
         logger.debug("Checking if %s is complete", task)
@@ -340,6 +882,8 @@ class Worker(object):
             deps = None
             status = DONE
             runnable = False
+            if self._plan_cache is not None and self._write_caches:
+                self._plan_cache.done(task)
 
             task.trigger_event(Event.DEPENDENCY_PRESENT, task)
         elif task.run == NotImplemented:
@@ -367,11 +911,19 @@ class Worker(object):
             deps = [d.task_id for d in deps]
 
         self._scheduled_tasks[task.task_id] = task
-        self._scheduler.add_task(self._id, task.task_id, status=status,
-                                 deps=deps, runnable=runnable, priority=task.priority,
-                                 resources=task.process_resources(),
-                                 params=task.to_str_params(),
-                                 family=task.task_family)
+        # only passed when set, for schedulers not knowing about batching
+        extra = {}
+        if task.batch_params and not _batchable(task):
+            warnings.warn('%s yields requirements in run(), its tasks are run one by one '
+                          'despite batch_params' % task.task_family)
+        elif task.batch_params and runnable:
+            extra['batch_params'] = list(task.batch_params)
+            extra['max_batch_size'] = task.max_batch_size
+        self._schedule(task_id=task.task_id, status=status,
+                       deps=deps, runnable=runnable, priority=task.priority,
+                       resources=task.process_resources(),
+                       params=task.to_str_params(),
+                       family=task.task_family, **extra)
 
         logger.info('Scheduled %s (%s)', task.task_id, status)
 
@@ -386,9 +938,8 @@ class Worker(object):
             raise Exception("Return value of Task.complete() must be boolean (was %r)" % is_complete)
 
     def _add_worker(self):
-        self._worker_info.append(('first_task', self._first_task))
         try:
-            self._scheduler.add_worker(self._id, self._worker_info)
+            self._scheduler.add_worker(self._id, self._worker_info + [('first_task', self._first_task)])
         except:
             logger.exception('Exception adding worker - scheduler might be running an older version')
 
@@ -411,38 +962,317 @@ class Worker(object):
             n_pending_tasks, task_id = r
             running_tasks = []
             n_unique_pending = 0
+            batch_task_ids = None
         else:
             n_pending_tasks = r['n_pending_tasks']
             task_id = r['task_id']
             running_tasks = r['running_tasks']
             # support old version of scheduler
             n_unique_pending = r.get('n_unique_pending', 0)
-        return task_id, running_tasks, n_pending_tasks, n_unique_pending
+            batch_task_ids = r.get('batch_task_ids')
+        return task_id, running_tasks, n_pending_tasks, n_unique_pending, batch_task_ids
+
+    def _runs_apart(self, task):
+        ''' Whether the task is run apart from the worker, by its executor,
+        rather than in the worker process itself. Tasks with a timeout are,
+        their process is killed when it expires. '''
+        return self.worker_processes > 1 or bool(self._timeout(task))
 
     def _run_task(self, task_id):
+        if task_id in self._parked_tasks and self._resume_task(task_id):
+            return
+
         task = self._scheduled_tasks[task_id]
+        profiler = None
+        if self._profiler is not None and self._profiler.should_profile(task):
+            profiler = self._profiler
+            self._profiled[task.task_family].append(task_id)
+
+        apart = self._runs_apart(task)
+        if apart and self._executor == 'pool' and self._submit_to_pool(task, profiler):
+            self._set_deadline(task_id, task)
+            return
+
+        # Tasks with a process or thread of their own can wait in it for
+        # requirements they yield, see TaskProcess
+        resume_conn = None
+        if apart and self.__keep_suspended:
+            resume_conn, self._resume_conns[task_id] = multiprocessing.Pipe(duplex=False)
+
+        if apart and self._executor == 'thread' and task.thread_safe and not self._timeout(task):
+            self._start_thread(task, resume_conn, profiler)
+            return
+
         p = TaskProcess(task, self._id, self._task_result_queue,
-                        random_seed=bool(self.worker_processes > 1))
+                        random_seed=apart, resume_conn=resume_conn, profiler=profiler,
+                        shared_process=not apart)
         self._running_tasks[task_id] = p
 
-        if self.worker_processes > 1:
-            fork_lock.acquire()
-            try:
-                p.start()
-            finally:
-                fork_lock.release()
+        if apart:
+            self._start_process(p)
+            self._set_deadline(task_id, task)
+            if resume_conn is not None:
+                resume_conn.close()  # the child has its own copy
         else:
             # Run in the same process
             p.run()
 
-    def _purge_children(self):
-        ''' Find dead children and put a response on the result queue '''
+    def _run_batch(self, task_ids):
+        ''' Runs the tasks with one call to their run_batch(), in a process of
+        their own unless they run in the worker process, see _runs_apart '''
+        tasks = [self._scheduled_tasks[task_id] for task_id in task_ids]
+        profiler = None
+        if self._profiler is not None and self._profiler.should_profile(tasks[0]):
+            profiler = self._profiler
+            self._profiled[tasks[0].task_family].append(tasks[0].task_id)
+
+        apart = any(self._runs_apart(task) for task in tasks)
+        p = BatchTaskProcess(tasks, self._id, self._task_result_queue,
+                             random_seed=apart, profiler=profiler, shared_process=not apart)
+        for task_id in task_ids:
+            self._running_tasks[task_id] = p
+
+        if apart:
+            self._start_process(p)
+            for task_id, task in zip(task_ids, tasks):
+                self._set_deadline(task_id, task)
+        else:
+            p.run()
+
+    def _timeout(self, task):
+        return task.worker_timeout if task.worker_timeout is not None else self.__task_timeout
+
+    def _set_deadline(self, task_id, task):
+        timeout = self._timeout(task)
+        if timeout:
+            self._deadlines[task_id] = time.time() + timeout
+
+    def _kill_expired_tasks(self):
+        ''' Kills the processes of tasks that ran past their deadline or were
+        cancelled through the scheduler, and reports the tasks as FAILED.
+        Returns the number of processes killed. '''
+        if not self._deadlines and not self._cancel_requests:
+            return 0
+        now = time.time()
+        cancelled = set(self._cancel_requests)
+        # those about to be started are failed by _cancel_starting
+        self._cancel_requests.difference_update(cancelled - self._starting)
+        for task_id in cancelled.intersection(self._parked_tasks).difference(self._starting):
+            self._fail_cancelled(task_id)  # parked before the request reached the worker
+        reasons = {}  # process -> why it's killed
+        for task_id, p in self._running_tasks.iteritems():
+            if task_id in cancelled:
+                reasons[p] = 'cancelled through the scheduler'
+            elif self._deadlines.get(task_id, now + 1) <= now:
+                reasons[p] = 'timed out after %s seconds' % self._timeout(self._scheduled_tasks[task_id])
+        killed = 0
+        for fd, p in self._sentinels.items():
+            if p not in reasons:
+                continue
+            killed += 1
+            _kill_process_tree(p.pid)
+            self._reap_child(fd, report=False)
+            for task_id, running in self._running_tasks.iteritems():
+                if running is p:
+                    error_message = 'Task %s %s, killed process %s' % (task_id, reasons[p], p.pid)
+                    logger.warning(error_message)
+                    notifications.send_error_email('Luigi: %s FAILED' % task_id, error_message)
+                    self._task_result_queue.put((task_id, FAILED, error_message, [], [], None))
+            del reasons[p]
         for task_id, p in self._running_tasks.iteritems():
-            if not p.is_alive() and p.exitcode:
+            if p in reasons:
+                logger.warning('Task %s %s, but it does not run in a process of its own', task_id, reasons[p])
+                self._deadlines.pop(task_id, None)
+        return killed
+
+    def _time_to_wait(self):
+        ''' Seconds to wait for a result before checking deadlines again '''
+        wait = float(self.__wait_interval)
+        deadlines = [self._deadlines[task_id] for task_id in self._running_tasks if task_id in self._deadlines]
+        if deadlines:
+            wait = max(0, min(wait, min(deadlines) - time.time()))
+        return wait
+
+    def _running_count(self):
+        ''' Number of processes or threads running tasks, a batch counts once '''
+        return len(set(id(p) for p in self._running_tasks.itervalues()))
+
+    def _start_thread(self, task, resume_conn=None, profiler=None):
+        # No random_seed here, seeding the shared generator would affect all threads
+        p = TaskProcess(task, self._id, self._task_result_queue, resume_conn=resume_conn,
+                        profiler=profiler, shared_process=True)
+        thread = threading.Thread(target=p.run, name='TaskThread-%s' % task.task_id)
+        thread.daemon = True
+        self._running_tasks[task.task_id] = thread
+        thread.start()
+
+    def _resume_task(self, task_id):
+        ''' Lets a parked task continue. Returns False if its process is gone,
+        the task then has to be run from the start '''
+        p = self._parked_tasks.pop(task_id)
+        if not p.is_alive():
+            self._resume_conns.pop(task_id).close()
+            return False
+        logger.debug('Resuming %s', task_id)
+        self._running_tasks[task_id] = p
+        self._set_deadline(task_id, self._scheduled_tasks[task_id])
+        self._resume_conns[task_id].send(True)
+        return True
+
+    def _abandon_parked_tasks(self):
+        ''' Ends all parked tasks, they will be run from the start if they
+        are scheduled again '''
+        for task_id in self._parked_tasks.keys():
+            self._abandon_parked_task(task_id)
+
+    def _limit_parked_tasks(self):
+        ''' Parked tasks don't count as running, but keep their process and
+        its memory. Abandons the oldest ones beyond worker_processes. '''
+        while len(self._parked_tasks) > self.worker_processes:
+            task_id = next(iter(self._parked_tasks))
+            logger.info('More than %d parked tasks, %s will run from the start', self.worker_processes, task_id)
+            self._abandon_parked_task(task_id)
+
+    def _abandon_parked_task(self, task_id):
+        self._parked_tasks.pop(task_id)
+        conn = self._resume_conns.pop(task_id)
+        try:
+            conn.send(False)
+        except (IOError, OSError):
+            pass  # already gone
+        conn.close()
+
+    def _cancel_starting(self, task_ids):
+        ''' Fails the tasks cancelled through the scheduler while the worker
+        was about to start or resume them. Returns the others. '''
+        cancelled = self._starting & self._cancel_requests
+        self._starting = set()
+        self._cancel_requests.difference_update(cancelled)
+        for task_id in cancelled:
+            self._fail_cancelled(task_id)
+        return [task_id for task_id in task_ids if task_id not in cancelled]
+
+    def _fail_cancelled(self, task_id):
+        ''' Reports a task cancelled while not running as FAILED, ending its
+        process if it's parked '''
+        if task_id in self._parked_tasks:
+            self._abandon_parked_task(task_id)
+        task = self._scheduled_tasks[task_id]
+        error_message = 'Task %s cancelled through the scheduler while not running' % task_id
+        logger.warning(error_message)
+        notifications.send_error_email('Luigi: %s FAILED' % task_id, error_message)
+        self._scheduler.add_task(self._id, task_id, status=FAILED, expl=error_message,
+                                 runnable=None, params=task.to_str_params(),
+                                 family=task.task_family)
+        self.run_succeeded = False
+
+    def _submit_to_pool(self, task, profiler=None):
+        ''' Hands the task to an idle pool process, starting one if needed.
+
+        Returns False if the task can't be pickled, it then has to be run in
+        a process of its own. '''
+        try:
+            payload = pickle.dumps(task, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logger.debug('Can not pickle %s, running it in a new process', task.task_id, exc_info=1)
+            return False
+
+        if self._pool_idle:
+            p = self._pool_idle.pop()
+        else:
+            p = PoolProcess(self._id, self._task_result_queue, self._profiler)
+            self._start_process(p)
+        self._running_tasks[task.task_id] = p
+        p.submit(task.task_id, payload, profile=profiler is not None)
+        return True
+
+    def _release_process(self, p):
+        ''' Called when a task is done, returns pool processes to the pool
+        unless they have run enough tasks or use too much memory '''
+        if not isinstance(p, PoolProcess):
+            return
+        if not p.is_alive():
+            return  # reaped through its sentinel
+        if self._pool_max_tasks and p.tasks_run >= self._pool_max_tasks:
+            logger.debug('Recycling pool process %s after %d tasks', p.pid, p.tasks_run)
+        elif self._pool_max_rss_mb and _rss_mb(p.pid) > self._pool_max_rss_mb:
+            logger.debug('Recycling pool process %s using more than %d MB', p.pid, self._pool_max_rss_mb)
+        else:
+            self._pool_idle.append(p)
+            return
+        self._retire(p)
+
+    def _retire(self, p):
+        p.retire()
+        for fd, child in self._sentinels.items():
+            if child is p:
+                self._reap_child(fd)
+
+    def _shutdown_children(self):
+        ''' Stops idle pool processes and reaps children that already exited '''
+        while self._pool_idle:
+            self._retire(self._pool_idle.pop())
+        for fd in self._sentinels.keys():
+            self._reap_child(fd)
+
+    def _start_process(self, p):
+        ''' Forks p and registers a sentinel, a pipe that becomes readable
+        when the child exits, so that crashes are noticed right away '''
+        read_fd, write_fd = os.pipe()
+        # programs started by the task shouldn't keep the sentinel open
+        fcntl.fcntl(write_fd, fcntl.F_SETFD, fcntl.fcntl(write_fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+        fork_lock.acquire()
+        try:
+            p.start()  # the child inherits write_fd and holds it until it exits
+        finally:
+            fork_lock.release()
+            os.close(write_fd)
+        self._sentinels[read_fd] = p
+
+    def _reap_child(self, fd, report=True):
+        ''' Called when the sentinel of a child process is readable, i.e. the
+        child exited. Puts a response on the result queue if it crashed,
+        unless report is False '''
+        os.close(fd)
+        p = self._sentinels.pop(fd)
+        p.join()
+        for task_id, parked in self._parked_tasks.items():
+            if parked is p:
+                # will be run from the start if it's scheduled again
+                self._parked_tasks.pop(task_id)
+                self._resume_conns.pop(task_id).close()
+        if not p.exitcode or not report:
+            return
+        for task_id, running in self._running_tasks.iteritems():
+            if running is p:
                 error_msg = 'Worker task %s died unexpectedly with exit code %s' % (task_id, p.exitcode)
                 logger.info(error_msg)
                 self._task_result_queue.put(
-                        (task_id, FAILED, error_msg, [], []))
+                        (task_id, FAILED, error_msg, [], [], None))
+
+    def _next_result(self, timeout):
+        ''' Waits for the next result on the queue, handling exits of child
+        processes while waiting. Returns None if nothing happens for timeout
+        seconds '''
+        # the queue has no public way of waiting on it together with other
+        # file descriptors, so select on its underlying pipe
+        result_fd = self._task_result_queue._reader.fileno()
+        while True:
+            try:
+                return self._task_result_queue.get_nowait()
+            except Queue.Empty:
+                pass
+            try:
+                ready, _, _ = select.select([result_fd] + self._sentinels.keys(), [], [], timeout)
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                continue
+            if not ready:
+                return None
+            for fd in ready:
+                if fd != result_fd:
+                    self._reap_child(fd)
 
     def _handle_next_task(self):
         ''' We have to catch three ways a task can be "done"
@@ -453,14 +1283,13 @@ class Worker(object):
         3. Child process dies: we need to catch this separately
         '''
         while True:
-            self._purge_children()  # Deal with subprocess failures
-
-            try:
-                task_id, status, error_message, missing, new_requirements = (
-                    self._task_result_queue.get(
-                        timeout=float(self.__wait_interval)))
-            except Queue.Empty:
+            self._kill_expired_tasks()
+            result = self._next_result(self._time_to_wait())
+            if result is None:
+                if self._kill_expired_tasks():
+                    continue  # their results are on the queue now
                 return
+            task_id, status, error_message, missing, new_requirements, resource_usage = result
 
             task = self._scheduled_tasks[task_id]
             if not task:
@@ -469,12 +1298,17 @@ class Worker(object):
                 # Maybe it yielded something?
             new_deps = []
             if new_requirements:
-                new_req = [interface.load_task(task, name, params)
-                           for name, params in new_requirements]
-                for t in new_req:
-                    self.add(t)
+                new_req = self._add_new_requirements(task, new_requirements)
                 new_deps = [t.task_id for t in new_req]
 
+            # only passed when there is some, for schedulers not knowing about it
+            extra = {}
+            if resource_usage is not None:
+                task.trigger_event(Event.RESOURCE_USAGE, task, resource_usage)
+                if 'max_rss_kb' in resource_usage:
+                    self._learn_memory(task.task_family, resource_usage['max_rss_kb'])
+                extra['resource_usage'] = resource_usage
+
             self._scheduler.add_task(self._id,
                                      task_id,
                                      status=status,
@@ -483,11 +1317,28 @@ class Worker(object):
                                      runnable=None,
                                      params=task.to_str_params(),
                                      family=task.task_family,
-                                     new_deps=new_deps)
+                                     new_deps=new_deps,
+                                     **extra)
 
             if status == RUNNING:
                 continue
-            self._running_tasks.pop(task_id)
+            if status == DONE and self._plan_cache is not None:
+                self._plan_cache.done(task, task.deps())
+            if self._hdfs_metadata_cache is not None:
+                # another process wrote (or failed writing) the outputs
+                for output in flatten(task.output()):
+                    if getattr(output, 'path', None):
+                        self._hdfs_metadata_cache.invalidate(output.path)
+            p = self._running_tasks.pop(task_id)
+            self._deadlines.pop(task_id, None)
+            if status == SUSPENDED and task_id in self._resume_conns:
+                # still alive and waiting for its new requirements
+                self._parked_tasks[task_id] = p
+                self._limit_parked_tasks()
+            elif p not in self._running_tasks.values():  # done with the whole batch
+                self._release_process(p)
+                if task_id in self._resume_conns:
+                    self._resume_conns.pop(task_id).close()
 
             # re-add task to reschedule missing dependencies
             if missing:
@@ -505,6 +1356,60 @@ class Worker(object):
             self.run_succeeded &= status in (DONE, SUSPENDED)
             return
 
+    def _memory_control(self):
+        return self.__memory_budget_mb > 0 or self.__memory_reserve_mb > 0
+
+    def _load_family_memory(self):
+        ''' Learns the memory used by task families from resource usage
+        reported to the scheduler in earlier runs '''
+        if not self._memory_control():
+            return
+        try:
+            usage = self._scheduler.resource_usage()
+        except (AttributeError, rpc.RPCError):
+            logger.debug('Could not get resource usage from the scheduler', exc_info=1)
+            return
+        for family, totals in usage.iteritems():
+            if totals.get('max_rss_kb'):
+                self._learn_memory(family, totals['max_rss_kb'])
+
+    def _learn_memory(self, family, max_rss_kb):
+        self._family_memory_mb[family] = max(self._family_memory_mb.get(family, 0), max_rss_kb / 1024.0)
+
+    def _memory_estimate(self, task):
+        ''' MB the task is expected to use: its memory_mb if declared, else
+        the largest peak RSS seen for its family, else 0 '''
+        if task.memory_mb is not None:
+            return task.memory_mb
+        return self._family_memory_mb.get(task.task_family, 0)
+
+    def _fits_in_memory(self, needed_mb):
+        if self.__memory_budget_mb > 0:
+            in_use = sum(self._memory_estimate(self._scheduled_tasks[task_id])
+                         for task_id in self._running_tasks.keys() + self._parked_tasks.keys())
+            if in_use + needed_mb > self.__memory_budget_mb:
+                return False
+        if self.__memory_reserve_mb > 0:
+            available = _available_memory_mb()
+            if available is not None and available - needed_mb < self.__memory_reserve_mb:
+                return False
+        return True
+
+    def _wait_for_memory(self, task_id):
+        ''' Lets running tasks finish until the task fits in the memory budget
+        and the memory available on the host. It's started anyway when
+        nothing else is running. '''
+        if not self._memory_control() or task_id in self._parked_tasks:
+            return
+        needed_mb = self._memory_estimate(self._scheduled_tasks[task_id])
+        while not self._fits_in_memory(needed_mb):
+            if not self._running_tasks:
+                logger.warning('Running %s although it might not fit in memory (needs ~%d MB)', task_id, needed_mb)
+                return
+            logger.info('Waiting for memory to run %s (needs ~%d MB), %d tasks running',
+                        task_id, needed_mb, len(self._running_tasks))
+            self._handle_next_task()
+
     def _sleeper(self):
         # TODO is exponential backoff necessary?
         while True:
@@ -531,13 +1436,14 @@ class Worker(object):
         self.run_succeeded = True
 
         self._add_worker()
+        self._load_family_memory()
 
         while True:
-            while len(self._running_tasks) >= self.worker_processes:
+            while self._running_count() >= self.worker_processes:
                 logger.debug('%d running tasks, waiting for next task to finish', len(self._running_tasks))
                 self._handle_next_task()
 
-            task_id, running_tasks, n_pending_tasks, n_unique_pending = self._get_work()
+            task_id, running_tasks, n_pending_tasks, n_unique_pending, batch_task_ids = self._get_work()
 
             if task_id is None:
                 self._log_remote_tasks(running_tasks, n_pending_tasks, n_unique_pending)
@@ -553,10 +1459,41 @@ class Worker(object):
 
             # task_id is not None:
             logger.debug("Pending tasks: %s", n_pending_tasks)
-            self._run_task(task_id)
+            self._starting = set(batch_task_ids or [task_id])
+            self._wait_for_memory(task_id)
+            task_ids = self._cancel_starting(batch_task_ids or [task_id])
+            if not task_ids:
+                continue
+            if batch_task_ids or _batchable(self._scheduled_tasks[task_id]):
+                # batchable tasks always go through run_batch(), even alone
+                self._run_batch(task_ids)
+            else:
+                self._run_task(task_id)
 
         while len(self._running_tasks):
             logger.debug('Shut down Worker, %d more tasks to go', len(self._running_tasks))
             self._handle_next_task()
 
+        self._abandon_parked_tasks()
+        self._shutdown_children()
+
+        if self._profiled:
+            self._profiler.report(self._profiled)
+            self._profiled.clear()
+
+        if self._completeness_cache is not None:
+            logger.info('Completeness cache: %d hits, %d misses',
+                        self._completeness_cache.hits, self._completeness_cache.misses)
+
+        if self._plan_cache is not None:
+            if self._write_caches:
+                self._plan_cache.save()
+            logger.info('Plan cache: %d hits, %d misses',
+                        self._plan_cache.hits, self._plan_cache.misses)
+
+        if self._hdfs_metadata_cache is not None:
+            logger.info('HDFS metadata cache: %d hits, %d misses, %d invalidations',
+                        self._hdfs_metadata_cache.hits, self._hdfs_metadata_cache.misses,
+                        self._hdfs_metadata_cache.invalidations)
+
         return self.run_succeeded
@@ -0,0 +1,301 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""A long-running worker that runs tasks submitted by luigi invocations on the same host.
+
+Every ``luigi`` invocation normally builds its own worker, checks the
+completeness of the whole graph and forks fresh processes. When many
+overlapping (e.g. cron driven) invocations run on one host, start a daemon
+once::
+
+    luigi-worker-daemon --socket /var/run/luigi/worker.sock --workers 8
+
+and point the invocations at it, on the command line with
+``--worker-daemon /var/run/luigi/worker.sock`` or in client.cfg::
+
+    [core]
+    worker-daemon: /var/run/luigi/worker.sock
+
+The invocations then only send their root tasks over the socket and wait
+for the result. The daemon keeps one worker with a warm process pool and
+runs submissions that arrive together in one go, so shared dependencies are
+checked and run once. With ``--completeness-cache`` it also remembers which
+tasks were complete between submissions, see :py:mod:`luigi.completeness_cache`.
+
+Tasks are rebuilt in the daemon from their module, class name and
+parameters, so their modules must be importable by the daemon. They are
+always run in processes apart from the daemon, even with ``--workers 1``.
+Only the user running the daemon can connect to its socket.
+"""
+
+import json
+import logging
+import os
+import Queue
+import signal
+import socket
+import SocketServer
+import threading
+
+import configuration
+import interface
+import scheduler
+from task import Register
+import worker
+
+logger = logging.getLogger('luigi-interface')
+
+
+class WorkerDaemonError(Exception):
+    pass
+
+
+def submit(socket_path, tasks):
+    """ Runs tasks with the daemon listening on socket_path.
+
+    Returns True if all tasks and their dependencies were successfully run
+    (or already completed), like :py:meth:`luigi.interface.Interface.run`.
+    """
+    request = {'tasks': [{'module': interface.task_module_name(task),
+                          'name': task.__class__.__name__,
+                          'params': task.to_str_params()} for task in tasks]}
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        f = sock.makefile('r+')
+        f.write(json.dumps(request) + '\n')
+        f.flush()
+        line = f.readline()
+    except socket.error as ex:
+        raise WorkerDaemonError('Can not talk to worker daemon at %s: %s' % (socket_path, ex))
+    finally:
+        sock.close()
+    if not line:
+        raise WorkerDaemonError('Worker daemon at %s closed the connection' % socket_path)
+    response = json.loads(line)
+    if 'error' in response:
+        raise WorkerDaemonError(response['error'])
+    return response['success']
+
+
+class _Submission(object):
+    def __init__(self, task_specs):
+        self.task_specs = task_specs  # module, name and params of each task
+        self.tasks = None  # built by the thread running them
+        self.error = None
+        self.success = None
+        self.done = threading.Event()
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+    ''' Reads one submission per connection and replies when it's done '''
+
+    def handle(self):
+        try:
+            task_specs = json.loads(self.rfile.readline())['tasks']
+        except Exception as ex:
+            logger.exception('Invalid submission')
+            response = {'error': 'Invalid submission: %s' % ex}
+        else:
+            submission = self.server.worker_daemon.run_tasks(task_specs)
+            if submission.error is not None:
+                response = {'error': 'Invalid submission: %s' % submission.error}
+            else:
+                response = {'success': submission.success}
+        self.wfile.write(json.dumps(response) + '\n')
+
+
+class _Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class _DaemonWorker(worker.Worker):
+    ''' A worker that keeps its pool processes between runs and never runs
+    tasks in the daemon process itself '''
+
+    def __init__(self, *args, **kwargs):
+        worker.Worker.__init__(self, *args, **kwargs)
+        self._daemon_id = self._id
+        self._runs = 0
+
+    def _runs_apart(self, task):
+        return True
+
+    def reset(self):
+        ''' Forgets the tasks of the last run, they are loaded again when
+        submitted again. The next run gets a worker id of its own, the
+        scheduler would otherwise hand it tasks of earlier runs again, e.g.
+        failed ones due for a retry. '''
+        self._runs += 1
+        self._id = self._keep_alive_thread.worker_id = '%s-run-%d' % (self._daemon_id, self._runs)
+        self._scheduled_tasks.clear()
+        self._suspended_tasks.clear()
+        self.unfulfilled_counts.clear()
+        self._first_task = None
+        Register.clear_instance_cache()
+
+    def _shutdown_children(self):
+        idle = set(self._pool_idle)
+        for fd, p in self._sentinels.items():
+            if p not in idle:
+                self._reap_child(fd)
+
+    def close(self):
+        worker.Worker._shutdown_children(self)
+        self.stop()
+
+
+class WorkerDaemon(object):
+    """ Accepts submissions on a Unix socket and runs them with one long-lived worker.
+
+    Connections are handled in threads that only queue submissions, all tasks
+    are run by the thread calling :py:meth:`serve_forever`.
+    """
+
+    def __init__(self, socket_path, sch, worker_processes=1, worker_executor='pool'):
+        self._socket_path = socket_path
+        self._worker = _DaemonWorker(scheduler=sch, worker_processes=worker_processes,
+                                     worker_executor=worker_executor)
+        self._submissions = Queue.Queue()
+        self._stopped = threading.Event()
+        self._server = None
+
+    def run_tasks(self, task_specs):
+        """ Queues tasks to be run and waits for them.
+
+        :param list task_specs: dicts with the module, name and params of
+                                each task, as sent by :py:func:`submit`.
+        :return: the submission, with success True if all tasks completed,
+                 or an error if they could not be built.
+        """
+        submission = _Submission(task_specs)
+        self._submissions.put(submission)
+        submission.done.wait()
+        return submission
+
+    def serve_forever(self):
+        self._remove_stale_socket()
+        umask = os.umask(0177)  # only the user running the daemon may submit tasks
+        try:
+            self._server = _Server(self._socket_path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.worker_daemon = self
+        server_thread = threading.Thread(target=self._server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+        logger.info('Worker daemon listening on %s', self._socket_path)
+        try:
+            while not self._stopped.is_set():
+                try:
+                    submission = self._submissions.get(timeout=1)
+                except Queue.Empty:
+                    continue
+                self._run([submission] + self._pending())
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            os.remove(self._socket_path)
+            self._worker.close()
+            for submission in self._pending():
+                submission.success = False
+                submission.done.set()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _pending(self):
+        submissions = []
+        while True:
+            try:
+                submissions.append(self._submissions.get_nowait())
+            except Queue.Empty:
+                return submissions
+
+    def _run(self, submissions):
+        ''' Runs the tasks of all submissions together, then tells each
+        submission whether its own tasks completed '''
+        try:
+            # built here and not in the handler threads, reset() clears the
+            # instance cache between runs
+            for submission in submissions:
+                try:
+                    submission.tasks = [interface.init_task(t['module'], t['name'], t['params'], {})
+                                        for t in submission.task_specs]
+                except Exception as ex:
+                    logger.exception('Invalid submission')
+                    submission.error = str(ex)
+            valid = [submission for submission in submissions if submission.error is None]
+            added = {}
+            for submission in valid:
+                for task in submission.tasks:
+                    added[task] = self._worker.add(task)
+            self._worker.run()
+            for submission in valid:
+                submission.success = all(added[task] and self._is_complete(task)
+                                         for task in submission.tasks)
+        except Exception:
+            logger.exception('Worker daemon failed running tasks')
+        finally:
+            self._worker.reset()
+            for submission in submissions:
+                if submission.success is None:
+                    submission.success = False
+                submission.done.set()
+
+    def _is_complete(self, task):
+        try:
+            return task.complete()
+        except Exception:
+            logger.exception('Failed checking if %s is complete', task)
+            return False
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self._socket_path):
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self._socket_path)
+        except socket.error:
+            os.remove(self._socket_path)
+        else:
+            raise WorkerDaemonError('A worker daemon is already listening on %s' % self._socket_path)
+        finally:
+            sock.close()
+
+
+def run(socket_path, worker_processes=1, worker_executor='pool', local_scheduler=False,
+        scheduler_host='localhost', scheduler_port=8082):
+    """ Runs a worker daemon until it gets SIGTERM or SIGINT """
+    if local_scheduler:
+        sch = scheduler.CentralPlannerScheduler()
+    else:
+        import rpc
+        sch = rpc.RemoteScheduler(host=scheduler_host, port=scheduler_port)
+    daemon = WorkerDaemon(socket_path, sch, worker_processes=worker_processes,
+                          worker_executor=worker_executor)
+
+    def shutdown_handler(signum, frame):
+        daemon.stop()
+    signal.signal(signal.SIGTERM, shutdown_handler)
+    signal.signal(signal.SIGINT, shutdown_handler)
+    daemon.serve_forever()
+
+
+def set_completeness_cache(path):
+    """ Makes the daemon remember complete tasks in a SQLite file at path """
+    config = configuration.get_config()
+    if not config.has_section('completeness_cache'):
+        config.add_section('completeness_cache')
+    config.set('completeness_cache', 'path', path)
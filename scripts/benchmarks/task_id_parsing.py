@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+""" Measures turning task_ids back into families and parameters, e.g.::
+
+    PYTHONPATH=. python scripts/benchmarks/task_id_parsing.py --tasks 100000
+
+Creates tasks, parses their task_ids once (cold) and once more (memoized)
+and checks that the parameters match the ones of the task.
+"""
+
+import argparse
+import datetime
+import time
+
+import luigi
+import luigi.task
+
+
+class HourlyTask(luigi.Task):
+    hour = luigi.DateHourParameter()
+    source = luigi.Parameter(default='events')
+    columns = luigi.Parameter(is_list=True, default=['user', 'country'])
+
+
+def timed(description, n, f):
+    t0 = time.time()
+    result = f()
+    elapsed = time.time() - t0
+    print '%-24s %.2fs, %.0f/s' % (description, elapsed, n / elapsed)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100000)
+    args = parser.parse_args()
+
+    start = datetime.datetime(2000, 1, 1)
+    hours = [start + datetime.timedelta(hours=i) for i in xrange(args.tasks)]
+
+    tasks = timed('task_id serialization', args.tasks, lambda: [HourlyTask(hour) for hour in hours])
+    task_ids = [t.task_id for t in tasks]
+    parsed = timed('parsing', args.tasks, lambda: [luigi.task.id_to_name_and_params(t) for t in task_ids])
+    timed('parsing, memoized', args.tasks, lambda: [luigi.task.id_to_name_and_params(t) for t in task_ids])
+
+    for t, (family, params) in zip(tasks, parsed):
+        assert (family, params) == (t.task_family, t.to_str_params()), t.task_id
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+""" Measures how many tasks can be instantiated per second, e.g.::
+
+    PYTHONPATH=. python scripts/benchmarks/task_instantiation.py --tasks 100000
+
+Every task has distinct parameters, so each instantiation misses the
+instance cache like the tasks of a large range do.
+"""
+
+import argparse
+import datetime
+import time
+
+import luigi
+
+
+class HourlyTask(luigi.Task):
+    hour = luigi.DateHourParameter()
+    source = luigi.Parameter(default='events')
+    limit = luigi.IntParameter(default=100)
+    verbose = luigi.BooleanParameter(default=False, significant=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100000)
+    args = parser.parse_args()
+
+    start = datetime.datetime(2000, 1, 1)
+    hours = [start + datetime.timedelta(hours=i) for i in xrange(args.tasks)]
+
+    t0 = time.time()
+    for hour in hours:
+        HourlyTask(hour)
+    elapsed = time.time() - t0
+    print '%d tasks in %.2fs, %.0f tasks/s' % (args.tasks, elapsed, args.tasks / elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+""" Measures task throughput of the worker executors.
+
+Runs many tiny tasks with each executor and prints tasks per second, e.g.::
+
+    PYTHONPATH=. python scripts/benchmarks/worker_executor.py --tasks 2000 --workers 4
+
+Use ``--ballast-mb`` to make the parent process bigger, which makes forking
+more expensive, like a worker holding a large dependency graph does.
+"""
+
+import argparse
+import logging
+import time
+
+import luigi
+from luigi.scheduler import CentralPlannerScheduler
+from luigi.worker import Worker
+
+
+class TinyTask(luigi.Task):
+    n = luigi.IntParameter()
+
+    def __init__(self, *args, **kwargs):
+        super(TinyTask, self).__init__(*args, **kwargs)
+        self.done = False
+
+    def complete(self):
+        return self.done
+
+    def run(self):
+        pass
+
+
+class AllTiny(luigi.WrapperTask):
+    tasks = luigi.IntParameter()
+
+    def requires(self):
+        return [TinyTask(i) for i in xrange(self.tasks)]
+
+
+def bench(executor, tasks, workers):
+    luigi.Task.clear_instance_cache()
+    w = Worker(scheduler=CentralPlannerScheduler(), worker_processes=workers,
+               worker_executor=executor)
+    try:
+        w.add(AllTiny(tasks))
+        t0 = time.time()
+        w.run()
+        return time.time() - t0
+    finally:
+        w.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--ballast-mb', type=int, default=0)
+    parser.add_argument('--executors', default='process,pool,thread')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    ballast = bytearray(args.ballast_mb * 1024 * 1024)  # noqa, kept alive on purpose
+
+    for executor in args.executors.split(','):
+        elapsed = bench(executor, args.tasks, args.workers)
+        print '%-8s %6d tasks in %6.2fs  %8.1f tasks/s' % (executor, args.tasks, elapsed, args.tasks / elapsed)
+
+
+if __name__ == '__main__':
+    main()
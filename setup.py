@@ -73,7 +73,8 @@ setup(
     },
     scripts=[
         'bin/luigid',
-        'bin/luigi'
+        'bin/luigi',
+        'bin/luigi-worker-daemon'
     ],
     tests_require=['tox', 'virtualenv'],
     cmdclass={'test': Tox},
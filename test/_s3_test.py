@@ -87,6 +87,18 @@ class TestS3Target(unittest.TestCase):
         file_str = read_file.read()
         self.assertEquals(self.tempFileContents, file_str)
 
+    @mock_s3
+    def test_stamp(self):
+        client = S3Client(AWS_ACCESS_KEY, AWS_SECRET_KEY)
+        client.s3.create_bucket('mybucket')
+        t = S3Target('s3://mybucket/tempfile', client=client)
+        self.assertEqual(t.stamp(), None)
+        client.put(self.tempFilePath, 's3://mybucket/tempfile')
+        stamp = t.stamp()
+        self.assertNotEqual(stamp, None)
+        client.put_string('changed', 's3://mybucket/tempfile')
+        self.assertNotEqual(t.stamp(), stamp)
+
     @mock_s3
     def test_read_no_file(self):
         client = S3Client(AWS_ACCESS_KEY, AWS_SECRET_KEY)
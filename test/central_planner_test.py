@@ -13,7 +13,7 @@
 # the License.
 
 import time
-from luigi.scheduler import CentralPlannerScheduler, DONE, FAILED, DISABLED
+from luigi.scheduler import CentralPlannerScheduler, DONE, FAILED, DISABLED, RUNNING
 import unittest
 import luigi.notifications
 luigi.notifications.DEBUG = True
@@ -83,6 +83,16 @@ class CentralPlannerTest(unittest.TestCase):
         self.assertEqual(self.sch.get_work(worker='Y')['task_id'], 'C')
         self.assertEqual(self.sch.get_work(worker='X')['task_id'], 'B')
 
+    def test_cancel_task(self):
+        self.sch.add_task(WORKER, 'A')
+        self.assertFalse(self.sch.cancel_task('A'))  # not running yet
+        self.assertEqual(self.sch.get_work(WORKER)['task_id'], 'A')
+        self.assertEqual(self.sch.ping(worker='Y'), {'cancel': []})
+        self.assertTrue(self.sch.cancel_task('A'))
+        self.assertEqual(self.sch.ping(WORKER), {'cancel': ['A']})
+        self.assertEqual(self.sch.ping(WORKER), {'cancel': []})
+        self.assertFalse(self.sch.cancel_task('B'))
+
     def test_retry(self):
         # Try to build A but fails, will retry after 100s
         self.setTime(0)
@@ -531,6 +541,40 @@ class CentralPlannerTest(unittest.TestCase):
         self.sch.add_task(WORKER, 'F', deps=['A', 'B'])
         self.check_task_order('DCABEF')
 
+    def test_resource_usage(self):
+        self.sch.add_task(WORKER, 'A(1)', family='A', status=DONE,
+                          resource_usage={'user_time': 1.0, 'max_rss_kb': 100})
+        self.sch.add_task(WORKER, 'A(2)', family='A', status=FAILED,
+                          resource_usage={'user_time': 2.0, 'max_rss_kb': 50})
+        self.sch.add_task(WORKER, 'B', family='B', status=DONE)
+        self.assertEqual(self.sch.resource_usage(),
+                         {'A': {'count': 2, 'user_time': 3.0, 'max_rss_kb': 100}})
+        self.assertEqual(self.sch.graph()['A(1)']['resource_usage'], {'user_time': 1.0, 'max_rss_kb': 100})
+        self.assertEqual(self.sch.graph()['B']['resource_usage'], None)
+
+    def _add_batchable(self, n, day='1', max_batch_size=3, worker=WORKER):
+        self.sch.add_task(worker, 'A(n=%d, day=%s)' % (n, day), family='A', params={'n': str(n), 'day': day},
+                          batch_params=['n'], max_batch_size=max_batch_size)
+
+    def test_batch(self):
+        for n in range(4):
+            self._add_batchable(n)
+        self._add_batchable(4, day='2')
+        self.sch.add_task(WORKER, 'B', family='B')
+        batch = self.sch.get_work(WORKER)['batch_task_ids']
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(set(t['status'] for i, t in self.sch.graph().items() if i in batch), set([RUNNING]))
+        # the rest have other params, exceed the batch size or aren't batchable
+        self.assertFalse('batch_task_ids' in self.sch.get_work(WORKER))
+        self.assertFalse('batch_task_ids' in self.sch.get_work(WORKER))
+        self.assertFalse('batch_task_ids' in self.sch.get_work(WORKER))
+        self.assertEqual(self.sch.get_work(WORKER)['task_id'], None)
+
+    def test_batch_only_own_tasks(self):
+        self._add_batchable(1)
+        self._add_batchable(2, worker='other')
+        self.assertFalse('batch_task_ids' in self.sch.get_work(WORKER))
+
 
 if __name__ == '__main__':
     unittest.main()
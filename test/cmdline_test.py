@@ -121,11 +121,14 @@ class CmdlineTest(unittest.TestCase):
     def test_cmdline_logger(self, setup_mock, warn):
         with mock.patch("luigi.interface.EnvironmentParamsContainer.env_params") as env_params:
             env_params.return_value.logging_conf_file = None
+            env_params.return_value.worker_daemon = None
+            env_params.return_value.dry_run = False
             luigi.run(['SomeTask', '--n', '7', '--local-scheduler', '--no-lock'])
             self.assertEqual([mock.call(None)], setup_mock.call_args_list)
 
         with mock.patch("luigi.configuration.get_config") as getconf:
             getconf.return_value.get.side_effect = ConfigParser.NoOptionError(section='foo', option='bar')
+            getconf.return_value.getint.side_effect = lambda section, option, default=None: default
             getconf.return_value.get_boolean.return_value = True
 
             luigi.interface.setup_interface_logging.call_args_list = []
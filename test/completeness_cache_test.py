@@ -0,0 +1,147 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import luigi
+import luigi.completeness_cache
+from luigi.completeness_cache import CompletenessCache
+from luigi.mock import MockFile
+from luigi.scheduler import CentralPlannerScheduler
+from luigi.worker import Worker
+from helpers import with_config
+
+# created by setUp and removed by tearDown of each test
+TMP_DIR = os.path.join(tempfile.gettempdir(), 'luigi-completeness-cache-test-%d' % os.getpid())
+CACHE_PATH = os.path.join(TMP_DIR, 'completeness.db')
+
+
+class CountingTask(luigi.Task):
+    n = luigi.IntParameter()
+    checks = []
+
+    def output(self):
+        return luigi.LocalTarget(os.path.join(TMP_DIR, 'out-%d' % self.n))
+
+    def complete(self):
+        CountingTask.checks.append(self.n)
+        return super(CountingTask, self).complete()
+
+
+class Parent(luigi.WrapperTask):
+    def requires(self):
+        return [CountingTask(1), CountingTask(2)]
+
+
+class TmpDirTestCase(unittest.TestCase):
+    def setUp(self):
+        os.mkdir(TMP_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+
+class CompletenessCacheTest(TmpDirTestCase):
+    def setUp(self):
+        super(CompletenessCacheTest, self).setUp()
+        self.cache = CompletenessCache(os.path.join(TMP_DIR, 'unit.db'), default_ttl=60, ttls={'MockFile': 0})
+        self.cache.clear()
+        self.task = CountingTask(1)
+
+    def test_put_get(self):
+        self.assertFalse(self.cache.get(self.task))
+        self.cache.put(self.task)
+        self.assertTrue(self.cache.get(self.task))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_invalidate(self):
+        self.cache.put(self.task)
+        self.cache.invalidate(self.task.output().path)
+        self.assertFalse(self.cache.get(self.task))
+
+    def test_expiry(self):
+        self.cache._default_ttl = 0.01
+        self.cache.put(self.task)
+        time.sleep(0.02)
+        self.assertFalse(self.cache.get(self.task))
+
+    def test_zero_ttl_not_cached(self):
+        class MockTask(luigi.Task):
+            def output(self):
+                return MockFile('/foo')
+
+        self.cache.put(MockTask())
+        self.assertFalse(self.cache.get(MockTask()))
+
+
+class WorkerCompletenessCacheTest(TmpDirTestCase):
+    def setUp(self):
+        super(WorkerCompletenessCacheTest, self).setUp()
+        open(CountingTask(1).output().path, 'w').close()
+        CountingTask.checks = []
+        luigi.completeness_cache._cache = None
+
+    def _add(self, task=None):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X')
+        try:
+            w.add(task or CountingTask(1))
+            return w
+        finally:
+            w.stop()
+
+    @with_config({'completeness_cache': {'path': CACHE_PATH}})
+    def test_second_run_uses_cache(self):
+        self._add()
+        self.assertEqual(CountingTask.checks, [1])
+        w = self._add()
+        self.assertEqual(CountingTask.checks, [1])
+        self.assertEqual(w._completeness_cache.hits, 1)
+
+    @with_config({'completeness_cache': {'path': CACHE_PATH}})
+    def test_hit_keeps_expiry(self):
+        self._add(Parent())
+        expires = self._expiries()
+        time.sleep(0.01)
+        self._add(Parent())
+        self.assertEqual(self._expiries(), expires)
+
+    @with_config({'completeness_cache': {'path': CACHE_PATH}})
+    def test_miss_looked_up_once(self):
+        w = self._add(Parent())
+        self.assertEqual((w._completeness_cache.hits, w._completeness_cache.misses), (0, 2))
+
+    def _expiries(self):
+        return luigi.completeness_cache.get_cache()._connection().execute(
+            'SELECT expires FROM complete').fetchall()
+
+    @with_config({'completeness_cache': {'path': CACHE_PATH}})
+    def test_remove_invalidates(self):
+        self._add()
+        CountingTask(1).output().remove()
+        self._add()
+        self.assertEqual(CountingTask.checks, [1, 1])
+
+    def test_disabled_by_default(self):
+        self.assertEqual(luigi.completeness_cache.get_cache(), None)
+        self._add()
+        self._add()
+        self.assertEqual(CountingTask.checks, [1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,13 +12,14 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
+import datetime
 import helpers
 import unittest
 
 import luigi
 
 from luigi.task_status import PENDING, RUNNING, DONE
-from luigi.db_task_history import DbTaskHistory
+from luigi.db_task_history import DbTaskHistory, TaskEvent, TaskRecord
 
 
 class DummyTask(luigi.Task):
@@ -73,6 +74,26 @@ class DbTaskHistoryTest(unittest.TestCase):
                 self.assertTrue(param_name in record.parameters)
                 self.assertEquals(str(param_value), record.parameters[param_name].value)
 
+    def test_average_durations(self):
+        self.run_task(DummyTask())
+        self.run_task(DummyTask(foo='bar'))
+        self.history.task_scheduled(ParamTask('foo', 1).task_id)  # never ran
+        durations = self.history.find_average_durations(['DummyTask', 'ParamTask', 'Other'])
+        self.assertEqual(durations.keys(), ['DummyTask'])
+        self.assertTrue(0 <= durations['DummyTask'] < 60)
+
+    def test_average_durations_of_latest_runs(self):
+        start = datetime.datetime(2014, 1, 1)
+        session = self.history.session_factory()
+        for seconds in [10, 20, 30, None]:  # the last one is still running
+            events = [TaskEvent(event_name=RUNNING, ts=start)]
+            if seconds is not None:
+                events.append(TaskEvent(event_name=DONE, ts=start + datetime.timedelta(seconds=seconds)))
+            session.add(TaskRecord(name='DummyTask', host='hostname', events=events))
+        session.commit()
+        self.assertEqual(self.history.find_average_durations(['DummyTask'], limit=2), {'DummyTask': 25})
+        self.assertEqual(self.history.find_average_durations(['DummyTask']), {'DummyTask': 20})
+
     def run_task(self, task):
         self.history.task_scheduled(task.task_id)
         self.history.task_started(task.task_id, 'hostname')
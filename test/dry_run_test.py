@@ -0,0 +1,111 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import unittest
+
+import mock
+
+import luigi
+import luigi.dry_run
+from luigi.interface import EnvironmentParamsContainer
+from luigi.mock import MockFile
+
+
+class Missing(luigi.ExternalTask):
+    def output(self):
+        return MockFile('/dry_run/missing')
+
+
+class Leaf(luigi.Task):
+    n = luigi.IntParameter()
+    runs = []
+
+    def output(self):
+        return MockFile('/dry_run/leaf-%d' % self.n)
+
+    def run(self):
+        Leaf.runs.append(self.n)
+
+
+class Done(Leaf):
+    def complete(self):
+        return True
+
+
+class Middle(luigi.Task):
+    def requires(self):
+        return [Leaf(i) for i in range(4)] + [Done(0)]
+
+    def output(self):
+        return MockFile('/dry_run/middle')
+
+
+class Root(luigi.Task):
+    def requires(self):
+        return [Middle(), Missing()]
+
+    def output(self):
+        return MockFile('/dry_run/root')
+
+
+class DryRunTest(unittest.TestCase):
+    def setUp(self):
+        Leaf.runs = []
+
+    def test_counts(self):
+        plan = luigi.dry_run.plan([Root()], durations={})
+        self.assertEqual(dict(plan.per_family()), {'Leaf': 4, 'Middle': 1, 'Root': 1})
+        self.assertEqual(plan.missing, [Missing().task_id])
+        self.assertEqual(plan.critical_path(), (3, None))
+        self.assertEqual(plan.wall_time(), None)
+        self.assertEqual(Leaf.runs, [])
+
+    def test_estimates(self):
+        durations = {'Leaf': 10.0, 'Middle': 100.0, 'Root': 1.0}
+        self.assertEqual(luigi.dry_run.plan([Root()], durations=durations).critical_path(), (3, 111.0))
+        self.assertEqual(luigi.dry_run.plan([Root()], workers=1, durations=durations).wall_time(), 141.0)
+        self.assertEqual(luigi.dry_run.plan([Root()], workers=2, durations=durations).wall_time(), 121.0)
+        self.assertEqual(luigi.dry_run.plan([Root()], workers=8, durations=durations).wall_time(), 111.0)
+
+    def test_unknown_durations(self):
+        plan = luigi.dry_run.plan([Root()], durations={'Leaf': 10.0, 'Middle': 20.0})
+        self.assertEqual(plan.unknown_families, set(['Root']))
+        self.assertEqual(plan.critical_path(), (3, 45.0))
+
+    def test_summary(self):
+        summary = luigi.dry_run.plan([Root()], workers=2, durations={'Leaf': 90.0}).summary()
+        self.assertTrue('6 tasks to run, 1 missing' in summary)
+        self.assertTrue('Estimated wall time with 2 workers: 6m 0s' in summary)
+
+    def test_caches_not_written(self):
+        completeness_cache = mock.Mock(get=mock.Mock(return_value=False))
+        plan_cache = mock.Mock(is_done=mock.Mock(return_value=False))
+        with mock.patch('luigi.completeness_cache.get_cache', return_value=completeness_cache):
+            with mock.patch('luigi.plan_cache.get_cache', return_value=plan_cache):
+                luigi.dry_run.plan([Root()], durations={})
+        self.assertTrue(completeness_cache.get.called)
+        self.assertFalse(completeness_cache.put.called)
+        self.assertFalse(plan_cache.done.called)
+        self.assertFalse(plan_cache.save.called)
+
+    def test_cmdline(self):
+        try:
+            self.assertTrue(luigi.run(['Root', '--local-scheduler', '--no-lock', '--dry-run']))
+        finally:
+            EnvironmentParamsContainer.dry_run.reset_global()
+        self.assertEqual(Leaf.runs, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -213,3 +213,13 @@ class TestFileSystem(unittest.TestCase):
         self.assertFalse(self.fs.exists(self.path))
         os.mkdir(self.path)
         self.assertTrue(self.fs.exists(self.path))
+
+    def test_exists_many(self):
+        os.mkdir(self.path)
+        for name in ('a', 'c'):
+            open(os.path.join(self.path, name), 'w').close()
+        paths = [os.path.join(self.path, name) for name in ('a', 'b', 'c')]
+        paths.append(os.path.join(self.path, 'missing', 'd'))
+        paths.append(os.path.join(self.path, 'missing', 'e'))
+        self.assertEqual(self.fs.exists_many(paths),
+                         dict(zip(paths, [True, False, True, False, False])))
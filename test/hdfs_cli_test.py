@@ -0,0 +1,116 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import unittest
+
+import mock
+
+import luigi
+from luigi import hdfs
+from luigi.tools import range as luigi_range
+
+LS_D = '''drwxr-xr-x   - luigi supergroup          0 2014-11-04 10:00 /data/a
+-rw-r--r--   3 luigi supergroup         42 2014-11-04 10:00 /data/b/part-00000
+'''
+NOT_FOUND = 'ls: `/data/c\': No such file or directory\n'
+
+
+class _Popen(object):
+    ''' Stands in for subprocess.Popen and records the commands '''
+    calls = []
+
+    def __init__(self, returncode=0, stdout='', stderr=''):
+        self.returncode = returncode
+        self._output = stdout, stderr
+
+    def __call__(self, cmd, **kwargs):
+        _Popen.calls.append(cmd)
+        return self
+
+    def communicate(self):
+        return self._output
+
+
+class BatchedCliTest(unittest.TestCase):
+    def setUp(self):
+        _Popen.calls = []
+        self.client = hdfs.HdfsClient()
+
+    def _patch(self, **kwargs):
+        return mock.patch('subprocess.Popen', _Popen(**kwargs))
+
+    def test_exists_many_one_call(self):
+        with self._patch(returncode=1, stdout=LS_D, stderr=NOT_FOUND):
+            result = self.client.exists_many(['/data/a/', '/data/b/part-00000', '/data/c'])
+        self.assertEqual(result, {'/data/a/': True, '/data/b/part-00000': True, '/data/c': False})
+        self.assertEqual(len(_Popen.calls), 1)
+        self.assertEqual(_Popen.calls[0][-5:], ['-ls', '-d', '/data/a/', '/data/b/part-00000', '/data/c'])
+
+    def test_exists_many_chunks(self):
+        paths = ['/data/%d' % i for i in range(hdfs.MAX_PATHS_PER_COMMAND + 1)]
+        stderr = ''.join('ls: `%s\': No such file or directory\n' % p for p in paths)
+        with self._patch(returncode=1, stderr=stderr):
+            result = self.client.exists_many(paths)
+        self.assertFalse(any(result.values()))
+        self.assertEqual(len(_Popen.calls), 2)
+
+    def test_exists_many_other_error(self):
+        with self._patch(returncode=1, stderr='ls: Permission denied\n'):
+            self.assertRaises(hdfs.HDFSCliError, self.client.exists_many, ['/data/a'])
+
+    def test_listdir_many_skips_missing(self):
+        with self._patch(returncode=1, stdout=LS_D, stderr=NOT_FOUND):
+            listing = list(self.client.listdir_many(['/data/*', '/data/c'], include_size=True))
+        self.assertEqual(listing, [('/data/a', 0), ('/data/b/part-00000', 42)])
+        self.assertEqual(len(_Popen.calls), 1)
+
+    def test_stamp(self):
+        with self._patch(stdout='1415095200000 42\n'):
+            self.assertEqual(self.client.stamp('/data/b/part-00000'), (1415095200000, 42))
+        self.assertEqual(_Popen.calls[0][-3:], ['-stat', '%Y %b', '/data/b/part-00000'])
+        with self._patch(returncode=1, stderr=NOT_FOUND):
+            self.assertEqual(self.client.stamp('/data/c'), None)
+
+    def test_cdh3_lists_parents(self):
+        client = hdfs.HdfsClientCdh3()
+        with mock.patch.object(client, 'listdir', return_value=['/data/a', '/data/b']) as listdir:
+            result = client.exists_many(['/data/a', '/data/c'])
+        self.assertEqual(result, {'/data/a': True, '/data/c': False})
+        listdir.assert_called_once_with('/data')
+
+
+class MultipleOutputs(luigi.Task):
+    def output(self):
+        return [hdfs.HdfsTarget('/data/a'), hdfs.HdfsTarget('/data/c')]
+
+
+class CompleteTest(unittest.TestCase):
+    def test_complete_checks_outputs_together(self):
+        _Popen.calls = []
+        with mock.patch('subprocess.Popen', _Popen(returncode=1, stdout=LS_D, stderr=NOT_FOUND)):
+            self.assertFalse(MultipleOutputs().complete())
+        self.assertEqual(len(_Popen.calls), 1)
+
+    def test_range_lists_globs_together(self):
+        fs = mock.Mock(spec=hdfs.HdfsClient)
+        fs.listdir_many.return_value = ['/data/2014-11-04/10', '/data/2014-11-04/11']
+        listing = luigi_range.RangeHourly._list_existing(
+            fs, '/data/*/*', ['/data/2014-11-04/10', '/data/2014-11-05/11'])
+        self.assertEqual(listing, set(['/data/2014-11-04/10', '/data/2014-11-04/11']))
+        self.assertEqual(fs.listdir_many.call_count, 1)
+        self.assertFalse(fs.listdir.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import unittest
+
+import mock
+
+import luigi
+from luigi import hdfs
+from luigi import hdfs_metadata_cache
+from luigi.hdfs_metadata_cache import CachingClient, MetadataCache
+from luigi.mock import MockFile
+from luigi.scheduler import CentralPlannerScheduler
+from luigi.worker import Worker
+from helpers import with_config
+
+
+class FakeClient(object):
+    ''' Counts the calls reaching HDFS '''
+
+    def __init__(self):
+        self.paths = {'/data': 'd', '/data/a': '-', '/data/b': '-'}
+        self.calls = []
+
+    def exists(self, path):
+        self.calls.append(('exists', path))
+        return path in self.paths
+
+    def exists_many(self, paths):
+        self.calls.append(('exists_many', paths))
+        return dict((path, path in self.paths) for path in paths)
+
+    def listdir(self, path, include_size=False, include_type=False, **kwargs):
+        self.calls.append(('listdir', path))
+        for p in sorted(self.paths):
+            if p.startswith(path + '/'):
+                yield (p, 3, self.paths[p])
+
+    def mkdir(self, path, parents=True, raise_if_exists=False):
+        self.paths[path] = 'd'
+
+    def rename(self, path, dest):
+        self.paths[dest] = self.paths.pop(path)
+
+    def remove(self, path, recursive=True, skip_trash=False):
+        del self.paths[path]
+
+
+class CachingClientTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeClient()
+        self.client = CachingClient(self.fake, MetadataCache(ttl=60))
+
+    def test_exists_cached(self):
+        self.assertTrue(self.client.exists('/data/a'))
+        self.assertTrue(self.client.exists('/data/a/'))
+        self.assertEqual(len(self.fake.calls), 1)
+
+    def test_negative_not_cached_by_default(self):
+        self.assertFalse(self.client.exists('/data/c'))
+        self.assertFalse(self.client.exists('/data/c'))
+        self.assertEqual(len(self.fake.calls), 2)
+
+    def test_negative_ttl(self):
+        client = CachingClient(self.fake, MetadataCache(ttl=60, negative_ttl=5))
+        self.assertEqual(list(client.listdir('/data')), ['/data/a', '/data/b'])
+        self.assertFalse(client.exists('/data/c'))
+        self.assertEqual(self.fake.calls, [('listdir', '/data')])
+
+    def test_listing_answers_exists(self):
+        self.assertEqual(list(self.client.listdir('/data', include_size=True)), [('/data/a', 3), ('/data/b', 3)])
+        self.assertEqual(list(self.client.listdir('/data')), ['/data/a', '/data/b'])
+        self.assertEqual(self.client.exists_many(['/data/a', '/data/b']), {'/data/a': True, '/data/b': True})
+        self.assertEqual(self.fake.calls, [('listdir', '/data')])
+
+    def test_write_through_invalidation(self):
+        self.assertTrue(self.client.exists('/data/a'))
+        self.client.rename('/data/a', '/data/c')
+        self.assertFalse(self.client.exists('/data/a'))
+        self.assertTrue(self.client.exists('/data/c'))
+        self.client.remove('/data/c')
+        self.assertFalse(self.client.exists('/data/c'))
+
+    def test_ancestors_invalidated(self):
+        self.client = CachingClient(self.fake, MetadataCache(ttl=60, negative_ttl=60))
+        self.assertFalse(self.client.exists('/new'))
+        self.assertFalse(self.client.exists('/new/x'))
+        self.assertEqual(list(self.client.listdir('/data')), ['/data/a', '/data/b'])
+        self.client.mkdir('/new/x/y')
+        self.fake.paths.update({'/new': 'd', '/new/x': 'd'})
+        self.assertTrue(self.client.exists('/new'))
+        self.assertTrue(self.client.exists('/new/x'))
+        self.client.mkdir('/data/c/d')
+        self.fake.paths['/data/c'] = 'd'
+        self.assertEqual(list(self.client.listdir('/data')), ['/data/a', '/data/b', '/data/c', '/data/c/d'])
+
+    def test_expiry(self):
+        with mock.patch('time.time', return_value=1000):
+            self.assertTrue(self.client.exists('/data/a'))
+        with mock.patch('time.time', return_value=1061):
+            self.assertTrue(self.client.exists('/data/a'))
+        self.assertEqual(len(self.fake.calls), 2)
+
+    def test_forked_process_drops_negatives(self):
+        cache = MetadataCache(ttl=60, negative_ttl=60)
+        cache.put_exists('/data/a', True)
+        cache.put_exists('/data/c', False)
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertTrue(cache.exists('/data/a'))
+            self.assertEqual(cache.exists('/data/c'), None)
+
+
+class ConfigTest(unittest.TestCase):
+    def test_disabled_by_default(self):
+        client = hdfs.get_autoconfig_client()
+        self.assertFalse(isinstance(client, CachingClient))
+
+    @with_config({'hdfs_metadata_cache': {'ttl': '30'}})
+    def test_enabled(self):
+        client = hdfs.get_autoconfig_client()
+        self.assertTrue(isinstance(client, CachingClient))
+        self.assertTrue(client is hdfs.get_autoconfig_client())  # still checked together
+        self.assertTrue(hdfs_metadata_cache.get_cache() is client._cache)
+
+
+class Writer(luigi.Task):
+    def output(self):
+        return MockFile('/data/written')
+
+    def run(self):
+        self.output().open('w').close()
+
+
+class WorkerTest(unittest.TestCase):
+    @with_config({'hdfs_metadata_cache': {'ttl': '30'}})
+    def test_outputs_invalidated_when_done(self):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X')
+        try:
+            self.assertTrue(w.add(Writer()))
+            cache = hdfs_metadata_cache.get_cache()
+            cache.put_exists('/data/written', True)
+            self.assertTrue(w.run())
+            self.assertEqual(cache.exists('/data/written'), None)
+        finally:
+            w.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
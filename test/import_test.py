@@ -0,0 +1,69 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import luigi
+
+# Importing luigi takes a few tens of ms on a laptop, twice as much when it
+# still imported the worker, the scheduler client and the command line
+# interface. Which modules are loaded is checked by test_lazy_modules_not_imported.
+IMPORT_TIME_BUDGET = 0.15
+
+MEASURE = '''
+import json, sys, time
+t0 = time.time()
+import luigi
+elapsed = time.time() - t0
+print json.dumps({"seconds": elapsed, "modules": sorted(m for m in sys.modules if sys.modules[m] is not None)})
+'''
+
+
+def import_luigi():
+    ''' Imports luigi in a new interpreter, returns the time and modules loaded '''
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    output = subprocess.check_output([sys.executable, '-c', MEASURE], env=env)
+    return json.loads(output.splitlines()[-1])
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_lazy_modules_not_imported(self):
+        modules = import_luigi()['modules']
+        for name in ('luigi.rpc', 'luigi.interface', 'luigi.worker', 'luigi.scheduler',
+                     'luigi.notifications', 'argparse', 'optparse', 'urllib2', 'multiprocessing'):
+            self.assertFalse(name in modules, '%s imported by import luigi' % name)
+
+    def test_range_tools_registered(self):
+        self.assertTrue('luigi.tools.range' in import_luigi()['modules'])
+        self.assertTrue(luigi.task.Register.get_task_cls('RangeHourly') is luigi.tools.range.RangeHourly)
+
+    def test_import_time(self):
+        seconds = min(import_luigi()['seconds'] for _ in range(3))
+        self.assertTrue(seconds < IMPORT_TIME_BUDGET,
+                        'import luigi took %.3fs, budget is %.3fs' % (seconds, IMPORT_TIME_BUDGET))
+
+    def test_lazy_attributes(self):
+        self.assertTrue(luigi.RemoteScheduler is luigi.rpc.RemoteScheduler)
+        self.assertTrue(luigi.build is luigi.interface.build)
+        self.assertRaises(AttributeError, getattr, luigi, 'no_such_attribute')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,9 +12,11 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
+import gc
 import luigi
 import luigi.date_interval
 import unittest
+from luigi.task import Register
 import luigi.notifications
 luigi.notifications.DEBUG = True
 
@@ -80,5 +82,45 @@ class InstanceTest(unittest.TestCase):
         self.assertNotEqual(dummy_1, dummy_2)
         self.assertEqual(dummy_1, dummy_1b)
 
+
+class InstanceCachePolicyTest(unittest.TestCase):
+    class DummyTask(luigi.Task):
+        x = luigi.IntParameter()
+
+    def tearDown(self):
+        Register.set_instance_cache_policy('dict')
+
+    def test_stats(self):
+        Register.clear_instance_cache()
+        self.DummyTask(1)
+        self.DummyTask(1)
+        self.DummyTask(2)
+        self.assertEqual(Register.instance_cache_stats(), {'hits': 1, 'misses': 2, 'size': 2})
+
+    def test_weak(self):
+        Register.set_instance_cache_policy('weak')
+        a = self.DummyTask(1)
+        self.assertTrue(a is self.DummyTask(1))
+        self.DummyTask(2)
+        gc.collect()
+        self.assertEqual(Register.instance_cache_stats()['size'], 1)
+        self.assertTrue(a is self.DummyTask(1))
+
+    def test_lru(self):
+        Register.set_instance_cache_policy('lru', 2)
+        a = self.DummyTask(1)
+        self.DummyTask(2)
+        self.assertTrue(a is self.DummyTask(1))
+        self.DummyTask(3)  # evicts 2, the least recently used
+        self.assertEqual(Register.instance_cache_stats()['size'], 2)
+        self.assertTrue(a is self.DummyTask(1))
+        self.assertEqual(Register.instance_cache_stats()['misses'], 3)
+        self.DummyTask(2)
+        self.assertEqual(Register.instance_cache_stats()['misses'], 4)
+
+    def test_unknown_policy(self):
+        Register.set_instance_cache_policy('foo')
+        self.assertTrue(self.DummyTask(1) is self.DummyTask(1))
+
 if __name__ == '__main__':
     unittest.main()
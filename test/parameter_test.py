@@ -17,6 +17,7 @@ from datetime import timedelta
 import luigi.date_interval
 import luigi
 import luigi.interface
+import luigi.configuration
 from worker_test import EmailTest
 import luigi.notifications
 from luigi.parameter import ParameterException
@@ -245,6 +246,30 @@ class TestParamWithDefaultFromConfig(unittest.TestCase):
         self.assertEquals("baz", A().p)
         self.assertEquals("boo", A(p="boo").p)
 
+    @with_config({"foo": {"bar": "1"}})
+    def testConfigChanged(self):
+        p = luigi.IntParameter(config_path=dict(section="foo", name="bar"))
+        self.assertEquals(1, p.value)
+        luigi.configuration.get_config().set("foo", "bar", "2")
+        self.assertEquals(2, p.value)
+        luigi.configuration.get_config().remove_option("foo", "bar")
+        self.assertFalse(p.has_value)
+
+    @with_config({"foo": {"bar": "1"}})
+    def testConfigParsedOnce(self):
+        parsed = []
+
+        class CountingParameter(luigi.IntParameter):
+            def parse(self, s):
+                parsed.append(s)
+                return super(CountingParameter, self).parse(s)
+
+        p = CountingParameter(config_path=dict(section="foo", name="bar"))
+        self.assertEquals(1, p.value)
+        self.assertTrue(p.has_value)
+        self.assertEquals(1, p.value)
+        self.assertEquals(parsed, ["1"])
+
     @with_config({"foo": {"bar": "2001-02-03T04"}})
     def testDateHour(self):
         p = luigi.DateHourParameter(config_path=dict(section="foo", name="bar"))
@@ -0,0 +1,197 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+import luigi
+import luigi.plan_cache
+from luigi.mock import MockFile
+from luigi.plan_cache import PlanCache
+from luigi.scheduler import CentralPlannerScheduler
+from luigi.worker import Worker
+from helpers import with_config
+
+# created by setUp and removed by tearDown of each test
+TMP_DIR = os.path.join(tempfile.gettempdir(), 'luigi-plan-cache-test-%d' % os.getpid())
+CACHE_PATH = os.path.join(TMP_DIR, 'plan.pickle')
+
+
+class Input(luigi.ExternalTask):
+    def output(self):
+        return luigi.LocalTarget(os.path.join(TMP_DIR, 'input'))
+
+
+class Checked(luigi.Task):
+    ''' Counts calls to complete() '''
+    n = luigi.IntParameter()
+    checks = []
+    runs = []
+
+    def requires(self):
+        return Input()
+
+    def output(self):
+        return luigi.LocalTarget(os.path.join(TMP_DIR, 'out-%d' % self.n))
+
+    def complete(self):
+        Checked.checks.append(self.n)
+        return super(Checked, self).complete()
+
+    def run(self):
+        Checked.runs.append(self.n)
+        open(self.output().path, 'w').close()
+
+
+class TmpDirTestCase(unittest.TestCase):
+    def setUp(self):
+        os.mkdir(TMP_DIR)
+        open(Input().output().path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+
+class PlanCacheTest(TmpDirTestCase):
+    def setUp(self):
+        super(PlanCacheTest, self).setUp()
+        self.path = os.path.join(TMP_DIR, 'unit.pickle')
+        open(Checked(1).output().path, 'w').close()
+
+    def test_done_saved(self):
+        cache = PlanCache(self.path)
+        self.assertFalse(cache.is_done(Checked(1)))
+        cache.done(Checked(1))
+        cache.save()
+        cache = PlanCache(self.path)
+        self.assertTrue(cache.is_done(Checked(1)))
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_output_changed(self):
+        cache = PlanCache(self.path)
+        cache.done(Checked(1))
+        cache.save()
+        with open(Checked(1).output().path, 'w') as f:
+            f.write('changed')
+        self.assertFalse(PlanCache(self.path).is_done(Checked(1)))
+
+    def test_input_changed(self):
+        cache = PlanCache(self.path, check_inputs=True)
+        cache.done(Checked(1), [Input()])
+        cache.save()
+        self.assertTrue(PlanCache(self.path, check_inputs=True).is_done(Checked(1)))
+        with open(Input().output().path, 'w') as f:
+            f.write('changed')
+        self.assertFalse(PlanCache(self.path, check_inputs=True).is_done(Checked(1)))
+
+    def test_inputs_not_checked_by_default(self):
+        cache = PlanCache(self.path)
+        cache.done(Checked(1), [Input()])
+        cache.save()
+        with open(Input().output().path, 'w') as f:
+            f.write('changed')
+        cache = PlanCache(self.path)
+        with mock.patch.object(Input, 'output') as output:
+            self.assertTrue(cache.is_done(Checked(1)))
+        self.assertFalse(output.called)
+
+    def test_code_changed(self):
+        cache = PlanCache(self.path)
+        cache.done(Checked(1))
+        cache.save()
+        cache = PlanCache(self.path)
+        cache._code_hashes[Checked] = 'other'
+        self.assertFalse(cache.is_done(Checked(1)))
+
+    def test_unstamped_not_cached(self):
+        class MockTask(luigi.Task):
+            def output(self):
+                return MockFile('/foo')
+
+        cache = PlanCache(self.path)
+        cache.done(MockTask())
+        self.assertFalse(cache.is_done(MockTask()))
+
+    def test_max_entries(self):
+        cache = PlanCache(self.path, max_entries=1)
+        open(Checked(2).output().path, 'w').close()
+        cache.done(Checked(1))
+        cache.done(Checked(2))
+        cache.save()
+        cache = PlanCache(self.path)
+        self.assertFalse(cache.is_done(Checked(1)))
+        self.assertTrue(cache.is_done(Checked(2)))
+
+
+class WorkerPlanCacheTest(TmpDirTestCase):
+    def setUp(self):
+        super(WorkerPlanCacheTest, self).setUp()
+        Checked.checks = []
+        Checked.runs = []
+
+    def _build(self, is_done_calls=None):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X')
+        if is_done_calls is not None:
+            is_done = w._plan_cache.is_done
+
+            def counting_is_done(task):
+                is_done_calls.append(task.task_id)
+                return is_done(task)
+            w._plan_cache.is_done = counting_is_done
+        try:
+            self.assertTrue(w.add(Checked(1)))
+            self.assertTrue(w.run())
+            return w
+        finally:
+            w.stop()
+
+    @with_config({'plan_cache': {'path': CACHE_PATH}})
+    def test_second_run_uses_cache(self):
+        self._build()
+        self.assertEqual(Checked.runs, [1])
+        checks = len(Checked.checks)
+        w = self._build()
+        self.assertEqual(len(Checked.checks), checks)
+        self.assertEqual(w._plan_cache.hits, 1)
+
+    @with_config({'plan_cache': {'path': CACHE_PATH}})
+    def test_checked_once_per_task(self):
+        calls = []
+        self._build(calls)  # all misses
+        self.assertTrue(calls)
+        self.assertEqual(sorted(calls), sorted(set(calls)))
+        calls = []
+        self._build(calls)
+        self.assertEqual(calls, ['Checked(n=1)'])
+
+    @with_config({'plan_cache': {'path': CACHE_PATH, 'check-inputs': 'true'}})
+    def test_changed_input_is_checked_again(self):
+        self._build()
+        checks = len(Checked.checks)
+        with open(Input().output().path, 'w') as f:
+            f.write('changed')
+        self._build()
+        self.assertEqual(len(Checked.checks), checks + 1)
+        self.assertEqual(Checked.runs, [1])  # still complete
+
+    def test_disabled_by_default(self):
+        self.assertEqual(luigi.plan_cache.get_cache(), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import os
+import pstats
+import tempfile
+import unittest
+
+import luigi
+from luigi.profiling import TaskProfiler
+from luigi.scheduler import CentralPlannerScheduler
+from luigi.worker import Worker
+from helpers import with_config
+
+
+def busy_function():
+    return sum(range(1000))
+
+
+class ProfiledTask(luigi.Task):
+    n = luigi.IntParameter()
+
+    def __init__(self, *args, **kwargs):
+        super(ProfiledTask, self).__init__(*args, **kwargs)
+        self.done = False
+
+    def complete(self):
+        return self.done
+
+    def run(self):
+        busy_function()
+
+
+class OtherTask(ProfiledTask):
+    pass
+
+
+class TaskProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def _run(self, profiler, worker_processes=1, executor='process'):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X', profiler=profiler,
+                   worker_processes=worker_processes, worker_executor=executor)
+        try:
+            for task in [ProfiledTask(1), ProfiledTask(2), OtherTask(3)]:
+                self.assertTrue(w.add(task))
+            self.assertTrue(w.run())
+        finally:
+            w.stop()
+
+    def _functions(self, path):
+        return set(name for (_, _, name) in pstats.Stats(path).stats)
+
+    def test_profile(self):
+        profiler = TaskProfiler(self.directory, families=['ProfiledTask'])
+        self._run(profiler)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['ProfiledTask_n=1_.pstats', 'ProfiledTask_n=2_.pstats', 'family-ProfiledTask.pstats'])
+        self.assertTrue('busy_function' in self._functions(profiler.path('ProfiledTask(n=1)')))
+        stats = pstats.Stats(os.path.join(self.directory, 'family-ProfiledTask.pstats'))
+        self.assertEqual([calls[1] for (_, _, name), calls in stats.stats.iteritems() if name == 'busy_function'], [2])
+
+    def test_pool(self):
+        self._run(TaskProfiler(self.directory), worker_processes=2, executor='pool')
+        self.assertEqual(len(os.listdir(self.directory)), 5)
+
+    def test_sample_rate(self):
+        self._run(TaskProfiler(self.directory, sample_rate=0))
+        self.assertFalse(os.path.exists(self.directory) and os.listdir(self.directory))
+
+    def test_long_task_id(self):
+        profiler = TaskProfiler(self.directory)
+        self.assertTrue(len(os.path.basename(profiler.path('x' * 1000))) < 220)
+
+    @with_config({'profiling': {'families': 'A, B', 'sample-rate': '0.5', 'top': '5'}})
+    def test_from_config(self):
+        profiler = TaskProfiler.from_config(sample_rate=0.25)
+        self.assertEqual(profiler.families, set(['A', 'B']))
+        self.assertEqual(profiler.sample_rate, 0.25)
+        self.assertEqual(profiler.top, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
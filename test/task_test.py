@@ -1,6 +1,11 @@
 import doctest
+import os
+import shutil
+import tempfile
 import unittest
 
+import mock
+
 import luigi.task
 import luigi
 from datetime import datetime, timedelta
@@ -38,6 +43,129 @@ class TaskTest(unittest.TestCase):
         other = DummyTask.from_str_params(original.to_str_params(), {})
         self.assertEqual(original, other)
 
+    def test_params_added_later(self):
+        class A(luigi.Task):
+            x = luigi.IntParameter()
+
+        class B(A):
+            pass
+
+        self.assertEqual([name for name, _ in B.get_params()], ['x'])
+        A.y = luigi.IntParameter(default=3)
+        self.assertEqual([name for name, _ in B.get_params()], ['x', 'y'])
+        self.assertEqual(B(1).task_id, 'B(x=1, y=3)')
+        del A.y
+        self.assertEqual(B(1).task_id, 'B(x=1)')
+
+
+class RegisterTest(unittest.TestCase):
+
+    def test_new_classes(self):
+        luigi.task.Register.get_task_cls('DummyTask')
+
+        class RegisterTestTask(luigi.Task):
+            pass
+
+        self.assertEqual(luigi.task.Register.get_task_cls('RegisterTestTask'), RegisterTestTask)
+
+        class RegisterTestSubTask(RegisterTestTask):
+            pass
+        RegisterTestSubTask.__name__ = 'RegisterTestTask'
+
+        self.assertEqual(luigi.task.Register.get_task_cls('RegisterTestTask'), RegisterTestSubTask)
+
+        class RegisterTestTask(luigi.Task):
+            pass
+
+        self.assertEqual(luigi.task.Register.get_reg()['RegisterTestTask'], luigi.task.Register.AMBIGUOUS_CLASS)
+
+    def test_renamed(self):
+        class RegisterTestRenamed(luigi.Task):
+            pass
+
+        luigi.task.Register.get_task_cls('RegisterTestRenamed')
+        RegisterTestRenamed.task_namespace = 'register_test'
+        self.assertEqual(luigi.task.Register.get_task_cls('register_test.RegisterTestRenamed'), RegisterTestRenamed)
+
+
+class IdToNameAndParamsTest(unittest.TestCase):
+
+    def test_simple(self):
+        self.assertEqual(luigi.task.id_to_name_and_params('A()'), ('A', {}))
+        self.assertEqual(luigi.task.id_to_name_and_params('A(a=1, b=x_y)'), ('A', {'a': '1', 'b': 'x_y'}))
+        self.assertEqual(luigi.task.id_to_name_and_params('A(a=1,b=2)'), ('A', {'a': '1', 'b': '2'}))
+
+    def test_lists(self):
+        self.assertEqual(luigi.task.id_to_name_and_params('A(a=[1,2], b=(x, y), c=[])'),
+                         ('A', {'a': ['1', '2'], 'b': ['x', 'y'], 'c': []}))
+
+    def test_round_trip(self):
+        original = DummyTask(param='a, b', bool_param=True, int_param=1, float_param=1.5,
+                             date_param=datetime(2014, 9, 13).date(), datehour_param=datetime(2014, 9, 13, 9),
+                             timedelta_param=timedelta(44), list_param=['in', 'flames'])
+        family, params = luigi.task.id_to_name_and_params(original.task_id)
+        self.assertEqual(family, 'DummyTask')
+        self.assertEqual(params, original.to_str_params())
+
+    def test_namespace(self):
+        self.assertEqual(luigi.task.id_to_name_and_params('foo.A(a=1)'), ('foo.A', {'a': '1'}))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, luigi.task.id_to_name_and_params, 'A')
+        self.assertRaises(ValueError, luigi.task.id_to_name_and_params, 'A(a=[1, b=2)')
+        self.assertRaises(ValueError, luigi.task.id_to_name_and_params, 'A(a=1)B(b=2')
+
+    def test_result_not_shared(self):
+        luigi.task.id_to_name_and_params('A(a=[1], b=2)')[1]['a'].append('2')
+        self.assertEqual(luigi.task.id_to_name_and_params('A(a=[1], b=2)'), ('A', {'a': ['1'], 'b': '2'}))
+
+
+class BulkCompleteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_file_outputs(self):
+        tmp = self.tmp
+
+        class FileTask(luigi.Task):
+            n = luigi.IntParameter()
+
+            def output(self):
+                return luigi.LocalTarget(os.path.join(tmp, 'out-%d' % self.n))
+
+        for n in (1, 3):
+            open(FileTask(n).output().path, 'w').close()
+
+        self.assertEqual(FileTask.bulk_complete(range(5)), [1, 3])
+        self.assertEqual(FileTask.bulk_complete([(n,) for n in range(5)]), [(1,), (3,)])
+
+    def test_local_outputs_checked_one_by_one(self):
+        tmp = self.tmp
+
+        class TwoFilesTask(luigi.Task):
+            def output(self):
+                return [luigi.LocalTarget(os.path.join(tmp, name)) for name in ('a', 'b')]
+
+        open(os.path.join(tmp, 'a'), 'w').close()
+        with mock.patch.object(luigi.target.FileSystem, 'exists_many') as exists_many:
+            self.assertFalse(TwoFilesTask().complete())
+            open(os.path.join(tmp, 'b'), 'w').close()
+            self.assertTrue(TwoFilesTask().complete())
+        self.assertFalse(exists_many.called)
+
+    def test_custom_complete(self):
+        class CustomTask(luigi.Task):
+            n = luigi.IntParameter()
+
+            def complete(self):
+                return self.n > 2
+
+        self.assertEqual(CustomTask.bulk_complete(range(5)), [3, 4])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,12 @@
 from unittest import TestCase
 from mock import patch
 import random
+import threading
 from luigi import Task, build, Event
 from luigi.mock import MockFile, MockFileSystem
 from luigi.task import flatten
 import luigi
+import luigi.task
 
 class DummyException(Exception):
     pass
@@ -87,6 +89,51 @@ class TestEventCallbacks(TestCase):
         self.assertTrue(self.result[0] is t)
         self.assertEquals(self.result[1], 42.0)
 
+    def test_handler_added_later(self):
+        calls = []
+        t = TaskWithCallback()
+        t.trigger_event("bar event")
+
+        @Task.event_handler("bar event")
+        def on_bar():
+            calls.append("bar")
+
+        t.trigger_event("bar event")
+        Task.remove_event_handler("bar event", on_bar)
+        t.trigger_event("bar event")
+        self.assertEquals(calls, ["bar"])
+
+    def test_background_handler(self):
+        threads = []
+
+        @TaskWithCallback.event_handler("baz event", background=True)
+        def on_baz():
+            threads.append(threading.current_thread())
+
+        try:
+            TaskWithCallback().trigger_event("baz event")
+            luigi.task.flush_events()
+        finally:
+            TaskWithCallback.remove_event_handler("baz event", on_baz)
+        self.assertEquals(len(threads), 1)
+        self.assertNotEquals(threads[0], threading.current_thread())
+
+    def test_background_per_class_and_event(self):
+        threads = []
+
+        def on_baz():
+            threads.append(threading.current_thread())
+
+        TaskWithCallback.event_handler("baz event", background=True)(on_baz)
+        EmptyTask.event_handler("baz event")(on_baz)
+        try:
+            EmptyTask(fail=False).trigger_event("baz event")
+            self.assertEquals(threads, [threading.current_thread()])
+        finally:
+            TaskWithCallback.remove_event_handler("baz event", on_baz)
+            EmptyTask.remove_event_handler("baz event", on_baz)
+        self.assertEquals(Task._background_callbacks, set())
+
 
 #        A
 #      /   \
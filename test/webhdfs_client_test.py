@@ -0,0 +1,293 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import BaseHTTPServer
+import httplib
+import json
+import os
+import posixpath
+import SocketServer
+import StringIO
+import tempfile
+import threading
+import unittest
+import urlparse
+
+from luigi import hdfs
+from luigi import hdfs_metadata_cache
+from helpers import with_config
+
+
+class _Namenode(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    ''' In-memory WebHDFS, serving datanode requests too '''
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('localhost', 0), _Handler)
+        self.files = {'/': None}  # path -> contents, None for directories
+        self.connections = 0
+        self.requests = []
+        self.batch_listing = True
+        self.drop_reply = None  # op to run once, closing the connection instead of replying
+
+    def server_bind(self):
+        # skips the reverse DNS lookup of HTTPServer.server_bind
+        SocketServer.TCPServer.server_bind(self)
+        self.server_name, self.server_port = self.server_address
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    page_size = 2
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=()):
+        data = json.dumps(body) if body is not None else ''
+        self.send_response(status)
+        for header in headers:
+            self.send_header(*header)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self, path):
+        self._reply(404, {'RemoteException': {'exception': 'FileNotFoundException',
+                                              'message': 'File does not exist: %s' % path}})
+
+    def _status(self, path):
+        data = self.server.files[path]
+        return {'pathSuffix': posixpath.basename(path), 'modificationTime': 1415095200000,
+                'type': 'DIRECTORY' if data is None else 'FILE', 'length': len(data or '')}
+
+    def _children(self, path):
+        prefix = path.rstrip('/') + '/'
+        return sorted(p for p in self.server.files if p != '/' and posixpath.dirname(p) == prefix.rstrip('/') or
+                      (prefix == '/' and p != '/' and posixpath.dirname(p) == '/'))
+
+    def _handle(self):
+        url = urlparse.urlsplit(self.path)
+        path = url.path[len('/webhdfs/v1'):] or '/'
+        params = dict(urlparse.parse_qsl(url.query))
+        op = params['op']
+        self.server.requests.append(op)
+        files = self.server.files
+        if 'datanode' in params:
+            if op == 'OPEN':
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(files[path])))
+                self.end_headers()
+                self.wfile.write(files[path])
+            else:
+                files[path] = self.rfile.read(int(self.headers['Content-Length']))
+                self._reply(201)
+        elif op in ('OPEN', 'CREATE'):
+            if op == 'OPEN' and path not in files:
+                return self._not_found(path)
+            location = 'http://localhost:%d%s&datanode=true' % (self.server.server_port, self.path)
+            self._reply(307, headers=[('Location', location)])
+        elif op == 'GETFILESTATUS':
+            if path not in files:
+                return self._not_found(path)
+            self._reply(200, {'FileStatus': self._status(path)})
+        elif op == 'LISTSTATUS':
+            if path not in files:
+                return self._not_found(path)
+            statuses = [self._status(p) for p in self._children(path)]
+            self._reply(200, {'FileStatuses': {'FileStatus': statuses}})
+        elif op == 'LISTSTATUS_BATCH':
+            if not self.server.batch_listing:
+                return self._reply(400, {'RemoteException': {'exception': 'IllegalArgumentException',
+                                                             'message': 'Invalid value for webhdfs parameter "op"'}})
+            children = [p for p in self._children(path)
+                        if posixpath.basename(p) > params.get('startAfter', '')]
+            page = [self._status(p) for p in children[:self.page_size]]
+            self._reply(200, {'DirectoryListing': {'partialListing': {'FileStatuses': {'FileStatus': page}},
+                                                   'remainingEntries': len(children[self.page_size:])}})
+        elif op == 'MKDIRS':
+            while path not in files:
+                files[path] = None
+                path = posixpath.dirname(path)
+            self._reply(200, {'boolean': True})
+        elif op == 'RENAME':
+            if path not in files:
+                return self._reply(200, {'boolean': False})
+            for p in list(files):
+                if p == path or p.startswith(path + '/'):
+                    files[params['destination'] + p[len(path):]] = files.pop(p)
+            self._reply(200, {'boolean': True})
+        elif op == 'DELETE':
+            deleted = [p for p in files if p == path or p.startswith(path + '/')]
+            for p in deleted:
+                del files[p]
+            self._reply(200, {'boolean': bool(deleted)})
+        elif op == 'GETCONTENTSUMMARY':
+            under = [p for p in files if p == path or p.startswith(path + '/')]
+            self._reply(200, {'ContentSummary': {
+                'directoryCount': len([p for p in under if files[p] is None]),
+                'fileCount': len([p for p in under if files[p] is not None]),
+                'length': sum(len(files[p] or '') for p in under)}})
+        else:
+            self._reply(200)
+
+    def _handle_or_drop(self):
+        if self.server.drop_reply and ('op=%s&' % self.server.drop_reply) in self.path + '&':
+            self.server.drop_reply = None
+            self.wfile = StringIO.StringIO()
+            self.close_connection = 1
+        self._handle()
+
+    do_GET = do_PUT = do_DELETE = _handle_or_drop
+
+
+class WebHdfsClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = _Namenode()
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.client = hdfs.WebHdfsClient('localhost', self.server.server_port, 'luigi')
+        self.server.files.update({'/data': None, '/data/a': 'foo\nbar\n', '/data/b': 'baz',
+                                  '/data/c': None, '/data/c/part-00000': 'x'})
+
+    def tearDown(self):
+        self.client._pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_exists(self):
+        self.assertTrue(self.client.exists('/data/a'))
+        self.assertFalse(self.client.exists('/data/d'))
+        self.assertEqual(self.client.exists_many(['/data/a', '/data/d']),
+                         {'/data/a': True, '/data/d': False})
+
+    def test_stamp(self):
+        self.assertEqual(self.client.stamp('/data/a'), (1415095200000, 8))
+        self.assertEqual(self.client.stamp('/data/d'), None)
+        self.assertEqual(hdfs.HdfsTarget('/data/b', fs=self.client).stamp(), (1415095200000, 3))
+
+    def test_keep_alive(self):
+        for _ in range(5):
+            self.client.exists('/data/a')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_get_sent_again(self):
+        self.assertTrue(self.client.exists('/data/a'))
+        self.server.drop_reply = 'GETFILESTATUS'
+        self.assertTrue(self.client.exists('/data/b'))
+        self.assertEqual(self.server.requests.count('GETFILESTATUS'), 3)
+
+    def test_rename_not_sent_again(self):
+        self.assertTrue(self.client.exists('/data/a'))
+        self.server.drop_reply = 'RENAME'
+        self.assertRaises(httplib.HTTPException, self.client.rename, '/data/a', '/data/d')
+        self.assertEqual(self.server.requests.count('RENAME'), 1)
+        self.assertTrue(self.client.exists('/data/d'))
+
+    def test_listdir_pages(self):
+        self.assertEqual(list(self.client.listdir('/data')), ['/data/a', '/data/b', '/data/c'])
+        self.assertEqual(self.server.requests.count('LISTSTATUS_BATCH'), 2)
+        self.assertEqual(list(self.client.listdir('/data', include_size=True, include_type=True, ignore_directories=True)),
+                         [('/data/a', 8, 'f'), ('/data/b', 3, 'f')])
+        self.assertEqual(list(self.client.listdir('/data/c', recursive=True)), ['/data/c/part-00000'])
+
+    def test_listdir_without_batch(self):
+        self.server.batch_listing = False
+        self.assertEqual(list(self.client.listdir('/data')), ['/data/a', '/data/b', '/data/c'])
+        self.assertEqual(list(self.client.listdir('/data')), ['/data/a', '/data/b', '/data/c'])
+        self.assertEqual(self.server.requests.count('LISTSTATUS_BATCH'), 1)
+
+    def test_glob(self):
+        self.assertEqual(list(self.client.listdir('/data/[ab]')), ['/data/a', '/data/b'])
+        self.assertEqual(list(self.client.listdir_many(['/data/{a,c}', '/data/d*'])), ['/data/a', '/data/c/part-00000'])
+        self.assertTrue(self.client.exists('/data/*/part-*'))
+
+    def test_glob_uses_listed_statuses(self):
+        self.assertEqual(list(self.client.listdir_many(['/data/{a,c}', '/data/d*', '/missing/*', '/missing'])),
+                         ['/data/a', '/data/c/part-00000'])
+        self.assertEqual(self.server.requests.count('GETFILESTATUS'), 1)  # only for /missing
+
+    def test_mkdir_rename_remove(self):
+        self.client.mkdir('/out/x')
+        self.assertRaises(hdfs.FileAlreadyExists, self.client.mkdir, '/out/x', parents=False, raise_if_exists=True)
+        self.client.rename('/data/a', '/out/x/a')
+        self.assertFalse(self.client.exists('/data/a'))
+        self.client.rename('/data/c/*', '/out/x')
+        self.assertTrue(self.client.exists('/out/x/part-00000'))
+        self.client.remove('/out')
+        self.assertFalse(self.client.exists('/out/x/a'))
+        self.assertTrue(self.client.exists('/user/luigi/.Trash/Current/out/x/a'))
+        self.assertRaises(hdfs.HDFSCliError, self.client.remove, '/out')
+
+    def test_remove_to_trash(self):
+        self.client.remove('/data/a')
+        self.client.mkdir('/data/a')
+        self.client.remove('/data/a')
+        trash = [p for p in self.server.files if p.startswith('/user/luigi/.Trash/Current/data/a')]
+        self.assertEqual(len(trash), 2)
+        self.assertEqual(self.server.files['/user/luigi/.Trash/Current/data/a'], 'foo\nbar\n')
+        self.assertRaises(hdfs.HDFSCliError, self.client.remove, '/data/c', recursive=False)
+        self.client.remove('/data/b', skip_trash=True)
+        self.assertFalse(self.client.exists('/data/b'))
+        self.assertFalse(self.client.exists('/user/luigi/.Trash/Current/data/b'))
+
+    def test_count(self):
+        self.assertEqual(self.client.count('/data'), {'content_size': 12, 'dir_count': 2, 'file_count': 3})
+
+    def test_read_write(self):
+        target = hdfs.HdfsTarget('/out/file', fs=self.client)
+        with target.open('w') as f:
+            f.write('line 1\n')
+            f.write('line 2\n')
+        self.assertEqual(self.server.files['/out/file'], 'line 1\nline 2\n')
+        self.assertEqual(list(target.open('r')), ['line 1\n', 'line 2\n'])
+        self.assertEqual(target.open('r').read(), 'line 1\nline 2\n')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_read_write_cached(self):
+        client = hdfs_metadata_cache.CachingClient(self.client, hdfs_metadata_cache.MetadataCache(ttl=60))
+        target = hdfs.HdfsTarget('/out/file', fs=client)
+        with target.open('w') as f:
+            f.write('line 1\n')
+        self.assertTrue(target.exists())
+        self.assertEqual(target.open('r').read(), 'line 1\n')
+        self.assertTrue('CREATE' in self.server.requests)
+
+    def test_put_get(self):
+        fd, local_path = tempfile.mkstemp()
+        os.write(fd, 'data')
+        os.close(fd)
+        self.client.put(local_path, '/data/d')
+        os.remove(local_path)
+        self.client.get('/data/d', local_path)
+        self.assertEqual(open(local_path).read(), 'data')
+        os.remove(local_path)
+
+    @with_config({'hdfs': {'client': 'webhdfs', 'namenode_host': 'localhost'}})
+    def test_configured(self):
+        self.assertTrue(isinstance(hdfs.get_autoconfig_client(), hdfs.WebHdfsClient))
+
+    @with_config({'hdfs': {'client': 'webhdfs', 'namenode_host': 'localhost'}})
+    def test_configured_client_shared(self):
+        self.assertTrue(hdfs.get_autoconfig_client() is hdfs.get_autoconfig_client())
+        self.assertTrue(hdfs.HdfsTarget('/data/a').fs is hdfs.HdfsTarget('/data/b').fs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# Copyright (c) 2014 Spotify AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+
+import luigi
+import luigi.interface
+from luigi.scheduler import CentralPlannerScheduler
+from luigi.worker_daemon import WorkerDaemon, WorkerDaemonError, submit
+
+
+class PidTask(luigi.Task):
+    ''' Writes the pid of the process running it '''
+    path = luigi.Parameter()
+
+    def output(self):
+        return luigi.LocalTarget(self.path)
+
+    def run(self):
+        f = self.output().open('w')
+        f.write(str(os.getpid()))
+        f.close()
+
+
+class FailingTask(luigi.Task):
+    def run(self):
+        raise Exception('fail')
+
+
+class WorkerDaemonTest(unittest.TestCase):
+    worker_processes = 2
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'worker.sock')
+        self.sch = CentralPlannerScheduler(retry_delay=0.1)
+        self.daemon = WorkerDaemon(self.socket_path, self.sch,
+                                   worker_processes=self.worker_processes, worker_executor='pool')
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        while not os.path.exists(self.socket_path):
+            self.thread.join(0.01)
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.thread.join()
+        shutil.rmtree(self.tmp_dir)
+
+    def pid_of(self, name):
+        return open(os.path.join(self.tmp_dir, name)).read()
+
+    def test_submit(self):
+        a = PidTask(os.path.join(self.tmp_dir, 'a'))
+        self.assertTrue(submit(self.socket_path, [a]))
+        self.assertTrue(a.complete())
+        self.assertTrue(submit(self.socket_path, [a]))  # already done
+
+    def test_pool_is_reused(self):
+        self.assertTrue(submit(self.socket_path, [PidTask(os.path.join(self.tmp_dir, 'a'))]))
+        self.assertTrue(submit(self.socket_path, [PidTask(os.path.join(self.tmp_dir, 'b'))]))
+        self.assertEqual(self.pid_of('a'), self.pid_of('b'))
+        self.assertNotEqual(str(os.getpid()), self.pid_of('a'))
+
+    def test_failure(self):
+        self.assertFalse(submit(self.socket_path, [FailingTask()]))
+
+    def test_unknown_module(self):
+        class Unknown(object):
+            __module__ = 'worker_daemon_test'
+
+            def to_str_params(self):
+                return {}
+        self.assertRaises(WorkerDaemonError, submit, self.socket_path, [Unknown()])
+
+    def test_no_daemon(self):
+        self.assertRaises(WorkerDaemonError, submit, os.path.join(self.tmp_dir, 'other.sock'), [])
+
+    def test_socket_private(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0600)
+
+    def test_add_failure(self):
+        def add(task):
+            raise Exception('broken')
+        self.daemon._worker.add = add
+        self.assertFalse(submit(self.socket_path, [PidTask(os.path.join(self.tmp_dir, 'a'))]))
+
+    def test_state_reset(self):
+        for name in ('a', 'b', 'c'):
+            self.assertTrue(submit(self.socket_path, [PidTask(os.path.join(self.tmp_dir, name))]))
+        self.assertEqual(self.daemon._worker._scheduled_tasks, {})
+        self.assertEqual([k for k, v in self.daemon._worker._worker_info].count('first_task'), 0)
+
+    def test_failed_task_of_earlier_run_not_handed_out(self):
+        self.assertFalse(submit(self.socket_path, [FailingTask()]))
+        time.sleep(0.2)
+        self.sch.prune()  # FailingTask is due for a retry
+        self.assertTrue(submit(self.socket_path, [PidTask(os.path.join(self.tmp_dir, 'a'))]))
+        self.assertFalse(submit(self.socket_path, [FailingTask()]))
+
+    def test_tasks_built_by_daemon_thread(self):
+        threads = []
+        init_task = luigi.interface.init_task
+
+        def record_thread(*args):
+            threads.append(threading.current_thread())
+            return init_task(*args)
+        with mock.patch('luigi.interface.init_task', side_effect=record_thread):
+            self.assertTrue(submit(self.socket_path, [PidTask(os.path.join(self.tmp_dir, 'a'))]))
+        self.assertEqual(threads, [self.thread])
+
+
+class SingleWorkerDaemonTest(WorkerDaemonTest):
+    worker_processes = 1
+
+
+if __name__ == '__main__':
+    unittest.main()
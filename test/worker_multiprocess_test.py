@@ -15,10 +15,19 @@
 import luigi.worker
 from luigi.worker import Worker
 from luigi import Task, RemoteScheduler, Parameter
+from luigi.scheduler import CentralPlannerScheduler
+import luigi
+import os
+import subprocess
+import threading
+import tempfile
+import time
 import unittest
 import logging
+import multiprocessing
 import luigi.notifications
 from mock import Mock
+from helpers import with_config
 
 luigi.notifications.DEBUG = True
 
@@ -88,5 +97,439 @@ class MultiprocessWorkerTest(unittest.TestCase):
         self.assertFalse(self.worker.run())
 
 
+class PidTask(Task):
+    ''' Writes the pid of the process running it to its output '''
+    directory = Parameter()
+    n = luigi.IntParameter()
+
+    def output(self):
+        return luigi.LocalTarget(os.path.join(self.directory, str(self.n)))
+
+    def run(self):
+        with self.output().open('w') as f:
+            f.write(str(os.getpid()))
+
+
+class UnpicklableTask(PidTask):
+    def __init__(self, *args, **kwargs):
+        super(UnpicklableTask, self).__init__(*args, **kwargs)
+        self.callback = lambda: None
+
+
+class PidTasks(luigi.WrapperTask):
+    directory = Parameter()
+    n = luigi.IntParameter()
+
+    def requires(self):
+        return [PidTask(self.directory, i) for i in range(self.n)] + [UnpicklableTask(self.directory, self.n)]
+
+
+class PoolExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def _run(self, n):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X',
+                   worker_processes=2, worker_executor='pool')
+        try:
+            self.assertTrue(w.add(PidTasks(self.directory, n)))
+            self.assertTrue(w.run())
+            self.assertEqual(w._pool_idle, [])
+        finally:
+            w.stop()
+        pids = [open(os.path.join(self.directory, str(i))).read() for i in range(n)]
+        unpicklable_pid = open(os.path.join(self.directory, str(n))).read()
+        return set(pids), unpicklable_pid
+
+    def test_processes_are_reused(self):
+        pids, unpicklable_pid = self._run(6)
+        self.assertTrue(len(pids) <= 2)
+        self.assertFalse(str(os.getpid()) in pids)
+        self.assertFalse(unpicklable_pid in pids)
+
+    @with_config({'core': {'worker-pool-max-tasks': '1'}})
+    def test_recycle_after_max_tasks(self):
+        pids, _ = self._run(4)
+        self.assertEqual(len(pids), 4)
+
+    def test_unknown_executor(self):
+        w = Worker(worker_executor='bogus')
+        w.stop()
+        self.assertEqual(w._executor, 'process')
+
+
+class ThreadUnsafePidTask(PidTask):
+    thread_safe = False
+
+
+class ThreadExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.worker = Worker(scheduler=CentralPlannerScheduler(), worker_id='X',
+                             worker_processes=3, worker_executor='thread')
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def _pid(self, n):
+        return open(os.path.join(self.directory, str(n))).read()
+
+    def test_runs_in_threads(self):
+        for i in range(4):
+            self.assertTrue(self.worker.add(PidTask(self.directory, i)))
+        self.assertTrue(self.worker.add(ThreadUnsafePidTask(self.directory, 4)))
+        self.assertTrue(self.worker.run())
+        self.assertEqual(set(self._pid(i) for i in range(4)), set([str(os.getpid())]))
+        self.assertNotEqual(self._pid(4), str(os.getpid()))
+
+    def test_failure(self):
+        class FailingTask(PidTask):
+            def run(self):
+                raise Exception('I am failing')
+
+        self.assertTrue(self.worker.add(FailingTask(self.directory, 0)))
+        self.assertFalse(self.worker.run())
+
+
+class CrashingTask(PidTask):
+    def run(self):
+        os._exit(1)
+
+
+class ChildExitTest(unittest.TestCase):
+    ''' Crashes are noticed through the sentinels, without waiting for wait_interval '''
+
+    def _run(self, executor):
+        directory = tempfile.mkdtemp()
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X', worker_processes=2,
+                   wait_interval=60, worker_executor=executor)
+        try:
+            self.assertTrue(w.add(CrashingTask(directory, 0)))
+            t0 = time.time()
+            self.assertFalse(w.run())
+            self.assertTrue(time.time() - t0 < 30)
+            self.assertEqual(w._sentinels, {})
+            self.assertEqual(w._running_tasks, {})
+        finally:
+            w.stop()
+
+    def test_process_crash(self):
+        self._run('process')
+
+    def test_pool_process_crash(self):
+        self._run('pool')
+
+
+class HangingTask(PidTask):
+    ''' Starts a child process and waits forever '''
+    worker_timeout = 1
+
+    def run(self):
+        child = subprocess.Popen(['sleep', '60'])
+        with open(os.path.join(self.directory, 'child'), 'w') as f:
+            f.write(str(child.pid))
+        time.sleep(60)
+
+
+class CancellableTask(HangingTask):
+    worker_timeout = None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    try:
+        return open('/proc/%d/stat' % pid).read().split()[2] != 'Z'
+    except IOError:
+        return True
+
+
+class TimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.sch = CentralPlannerScheduler()
+
+    def _run(self, task, executor='process', worker_processes=2, **kwargs):
+        w = Worker(scheduler=self.sch, worker_id='X', worker_processes=worker_processes,
+                   worker_executor=executor, **kwargs)
+        try:
+            self.assertTrue(w.add(task))
+            t0 = time.time()
+            self.assertFalse(w.run())
+            self.assertTrue(time.time() - t0 < 30)
+            self.assertEqual(w._running_tasks, {})
+        finally:
+            w.stop()
+        child = int(open(os.path.join(self.directory, 'child')).read())
+        self.assertFalse(_alive(child))
+        return self.sch.fetch_error(task.task_id)['error']
+
+    def test_timeout(self):
+        self.assertTrue('timed out after 1 seconds' in self._run(HangingTask(self.directory, 0)))
+
+    def test_pool_timeout(self):
+        self.assertTrue('timed out' in self._run(HangingTask(self.directory, 0), 'pool'))
+
+    def test_single_process_timeout(self):
+        self.assertTrue('timed out' in self._run(HangingTask(self.directory, 0), worker_processes=1))
+
+    def test_thread_executor_timeout(self):
+        self.assertTrue('timed out' in self._run(HangingTask(self.directory, 0), 'thread'))
+
+    @with_config({'core': {'worker-timeout': '1'}})
+    def test_default_timeout(self):
+        self.assertTrue('timed out' in self._run(CancellableTask(self.directory, 0)))
+
+    def test_cancel(self):
+        task = CancellableTask(self.directory, 0)
+
+        def cancel():
+            for _ in range(300):
+                if self.sch.cancel_task(task.task_id):
+                    return
+                time.sleep(0.1)
+        canceller = threading.Thread(target=cancel)
+        canceller.start()
+        try:
+            self.assertTrue('cancelled' in self._run(task, ping_interval=0.1))
+        finally:
+            canceller.join()
+
+    def test_cancel_before_start(self):
+        task = CancellableTask(self.directory, 0)
+        w = Worker(scheduler=self.sch, worker_id='X', worker_processes=2)
+
+        def cancel_while_waiting(task_id):
+            # as if the request arrived while waiting for memory
+            self.assertTrue(self.sch.cancel_task(task_id))
+            w._cancel_requests.update(self.sch.ping(worker='X')['cancel'])
+        w._wait_for_memory = cancel_while_waiting
+        try:
+            self.assertTrue(w.add(task))
+            self.assertFalse(w.run())
+        finally:
+            w.stop()
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'child')))
+        self.assertTrue('cancelled' in self.sch.fetch_error(task.task_id)['error'])
+        self.assertEqual(w._cancel_requests, set())
+
+    def test_cancel_parked(self):
+        task = CancellableTask(self.directory, 0)
+        w = Worker(scheduler=self.sch, worker_id='X', worker_processes=2)
+        try:
+            self.assertTrue(w.add(task))
+            reader, w._resume_conns[task.task_id] = multiprocessing.Pipe(duplex=False)
+            w._parked_tasks[task.task_id] = None
+            w._cancel_requests.add(task.task_id)
+            w._kill_expired_tasks()
+        finally:
+            w.stop()
+        self.assertEqual(w._parked_tasks, {})
+        self.assertFalse(reader.recv())  # told to abandon the task
+        self.assertEqual(self.sch.task_list('FAILED', '').keys(), [task.task_id])
+
+
+class YieldingTask(PidTask):
+    ''' Yields three requirements one at a time and logs each start of run() '''
+
+    def run(self):
+        with open(os.path.join(self.directory, 'starts'), 'a') as f:
+            f.write('start\n')
+        for i in range(3):
+            yield PidTask(self.directory, 100 + i)
+        super(YieldingTask, self).run()
+
+
+class WideYieldingTask(PidTask):
+    ''' Yields a requirement of its own twice, waiting in between '''
+
+    def run(self):
+        for i in range(2):
+            yield PidTask(self.directory, 100 * (self.n + 1) + i)
+        super(WideYieldingTask, self).run()
+
+
+class RequiresOne(luigi.WrapperTask):
+    directory = Parameter()
+    n = luigi.IntParameter()
+
+    def requires(self):
+        return WideYieldingTask(self.directory, self.n)
+
+
+class WideYieldingTasks(luigi.WrapperTask):
+    ''' Required twice, the yielding tasks rank above their requirements,
+    so all of them start and get parked unless that's limited '''
+    directory = Parameter()
+
+    def requires(self):
+        return [WideYieldingTask(self.directory, i) for i in range(6)] + \
+            [RequiresOne(self.directory, i) for i in range(6)]
+
+
+class _ParkCountingWorker(Worker):
+    max_parked = 0
+
+    def _handle_next_task(self):
+        Worker._handle_next_task(self)
+        self.max_parked = max(self.max_parked, len(self._parked_tasks))
+
+
+class KeepSuspendedTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def _starts(self, executor, keep_suspended):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X', worker_processes=2,
+                   worker_executor=executor, keep_suspended=keep_suspended)
+        try:
+            self.assertTrue(w.add(YieldingTask(self.directory, 0)))
+            self.assertTrue(w.run())
+            self.assertEqual(w._parked_tasks, {})
+            self.assertEqual(w._resume_conns, {})
+        finally:
+            w.stop()
+        self.assertTrue(YieldingTask(self.directory, 0).complete())
+        return open(os.path.join(self.directory, 'starts')).read().count('start')
+
+    def test_rerun_without(self):
+        self.assertEqual(self._starts('process', False), 4)
+
+    def test_process(self):
+        self.assertEqual(self._starts('process', True), 1)
+
+    def test_thread(self):
+        self.assertEqual(self._starts('thread', True), 1)
+
+    def test_pool_runs_from_start(self):
+        self.assertEqual(self._starts('pool', True), 4)
+
+    def test_parked_limit(self):
+        w = _ParkCountingWorker(scheduler=CentralPlannerScheduler(), worker_id='X', worker_processes=2,
+                                keep_suspended=True)
+        try:
+            self.assertTrue(w.add(WideYieldingTasks(self.directory)))
+            self.assertTrue(w.run())
+            self.assertEqual(w._parked_tasks, {})
+        finally:
+            w.stop()
+        self.assertTrue(0 < w.max_parked <= 2)
+        self.assertTrue(WideYieldingTasks(self.directory).complete())
+
+    def test_abandoned_when_requirement_fails(self):
+        class YieldingCrash(PidTask):
+            def run(self):
+                yield CrashingTask(self.directory, 1)
+
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X', worker_processes=2,
+                   keep_suspended=True)
+        try:
+            self.assertTrue(w.add(YieldingCrash(self.directory, 0)))
+            self.assertFalse(w.run())
+            self.assertEqual(w._parked_tasks, {})
+            self.assertEqual(w._sentinels, {})
+        finally:
+            w.stop()
+
+
+class BigTask(PidTask):
+    memory_mb = 60
+
+    def run(self):
+        start = time.time()
+        time.sleep(0.2)
+        with self.output().open('w') as f:
+            f.write('%f %f' % (start, time.time()))
+
+
+class MemoryAdmissionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def _intervals(self, tasks):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X', worker_processes=3)
+        try:
+            for t in tasks:
+                self.assertTrue(w.add(t))
+            self.assertTrue(w.run())
+        finally:
+            w.stop()
+        return sorted(tuple(map(float, t.output().open('r').read().split())) for t in tasks)
+
+    def _overlaps(self, intervals):
+        return any(b[0] < a[1] for a, b in zip(intervals, intervals[1:]))
+
+    @with_config({'core': {'worker-memory-budget-mb': '100'}})
+    def test_budget(self):
+        intervals = self._intervals([BigTask(self.directory, i) for i in range(3)])
+        self.assertFalse(self._overlaps(intervals))
+
+    def test_no_budget(self):
+        intervals = self._intervals([BigTask(self.directory, i) for i in range(3)])
+        self.assertTrue(self._overlaps(intervals))
+
+    @with_config({'core': {'worker-memory-budget-mb': '10'}})
+    def test_too_big_runs_alone(self):
+        intervals = self._intervals([BigTask(self.directory, i) for i in range(2)])
+        self.assertFalse(self._overlaps(intervals))
+
+    def test_learned_estimate(self):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X')
+        w.stop()
+        w._learn_memory('PidTask', 2048)
+        w._learn_memory('PidTask', 1024)
+        self.assertEqual(w._memory_estimate(PidTask(self.directory, 0)), 2.0)
+        self.assertEqual(w._memory_estimate(BigTask(self.directory, 0)), 60)
+
+    def _learned_memory(self, worker_processes):
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X', worker_processes=worker_processes)
+        try:
+            self.assertTrue(w.add(PidTask(self.directory, 0)))
+            self.assertTrue(w.run())
+        finally:
+            w.stop()
+        return w._family_memory_mb.get('PidTask')
+
+    @unittest.skipUnless(os.path.exists('/proc/self/clear_refs'), 'needs /proc/self/clear_refs')
+    @with_config({'core': {'worker-memory-budget-mb': '1000'}})
+    def test_learned_estimate_excludes_inherited_memory(self):
+        ballast = bytearray(200 * 1024 * 1024)  # noqa, inherited by the forked task
+        self.assertTrue(self._learned_memory(2) < 50)
+        del ballast
+
+    @with_config({'core': {'worker-memory-budget-mb': '1000'}})
+    def test_nothing_learned_in_worker_process(self):
+        self.assertEqual(self._learned_memory(1), None)
+
+
+class BatchPidTask(PidTask):
+    batch_params = ['n']
+    max_batch_size = 4
+
+
+class BatchPidTasks(luigi.WrapperTask):
+    directory = Parameter()
+    n = luigi.IntParameter()
+
+    def requires(self):
+        return [BatchPidTask(self.directory, i) for i in range(self.n)]
+
+
+class BatchProcessTest(unittest.TestCase):
+    def test_batches_share_a_process(self):
+        directory = tempfile.mkdtemp()
+        w = Worker(scheduler=CentralPlannerScheduler(), worker_id='X', worker_processes=2)
+        try:
+            self.assertTrue(w.add(BatchPidTasks(directory, 8)))
+            self.assertTrue(w.run())
+        finally:
+            w.stop()
+        pids = set(open(os.path.join(directory, str(i))).read() for i in range(8))
+        self.assertEqual(len(pids), 2)
+        self.assertFalse(str(os.getpid()) in pids)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -17,6 +17,7 @@ from luigi.scheduler import CentralPlannerScheduler
 import luigi.worker
 from luigi.worker import Worker
 from luigi import Task, ExternalTask, RemoteScheduler
+from luigi.event import Event
 from helpers import with_config
 import unittest
 import logging
@@ -452,6 +453,277 @@ class WorkerTest(unittest.TestCase):
         self.assertFalse(a.has_run)
         w.stop()
 
+    def test_bulk_complete_siblings(self):
+        bulk_calls = []
+
+        class Sibling(DummyTask):
+            n = luigi.IntParameter()
+
+            @classmethod
+            def bulk_complete(cls, parameter_tuples):
+                bulk_calls.append(sorted(parameter_tuples))
+                return [p for p in parameter_tuples if p[0] % 2 == 0]
+
+            def complete(self):
+                raise Exception('complete() should not be called for bulk checked siblings')
+
+        class Parent(DummyTask):
+            def requires(self):
+                return [Sibling(n) for n in range(4)]
+
+        self.assertTrue(self.w.add(Parent()))
+        self.assertEqual(bulk_calls, [[(0,), (1,), (2,), (3,)]])
+        self.assertEqual(sorted(self.sch.task_list('DONE', '').keys()), ['Sibling(n=0)', 'Sibling(n=2)'])
+        self.assertEqual(sorted(self.sch.task_list('PENDING', '').keys()), ['Parent()', 'Sibling(n=1)', 'Sibling(n=3)'])
+
+    def test_bulk_complete_error_falls_back(self):
+        class Sibling(DummyTask):
+            n = luigi.IntParameter()
+
+            @classmethod
+            def bulk_complete(cls, parameter_tuples):
+                raise Exception('doh')
+
+            def complete(self):
+                return self.n == 1
+
+        class Parent(DummyTask):
+            def requires(self):
+                return [Sibling(n) for n in range(2)]
+
+        self.assertTrue(self.w.add(Parent()))
+        self.assertEqual(self.sch.task_list('DONE', '').keys(), ['Sibling(n=1)'])
+
+    def test_parallel_complete_checks(self):
+        class Checked(DummyTask):
+            n = luigi.IntParameter()
+
+            def complete(self):
+                if self.n == 3:
+                    raise Exception('doh')
+                return self.n % 2 == 0
+
+        tasks = [Checked(n) for n in range(4)]
+        self.w._bulk_check_complete(tasks, parallel=True)
+        self.assertEqual(self.w._precomputed_complete,
+                         {'Checked(n=0)': True, 'Checked(n=1)': False, 'Checked(n=2)': True})
+        self.w._precomputed_complete.clear()
+
+    def test_resource_usage(self):
+        usages = []
+
+        @DummyTask.event_handler(Event.RESOURCE_USAGE)
+        def record(task, usage):
+            usages.append(usage)
+
+        try:
+            self.assertTrue(self.w.add(DummyTask()))
+            self.assertTrue(self.w.run())
+        finally:
+            DummyTask.remove_event_handler(Event.RESOURCE_USAGE, record)
+        self.assertEqual(len(usages), 1)
+        for key in ('user_time', 'system_time', 'voluntary_switches'):
+            self.assertTrue(usages[0][key] >= 0)
+        # the memory of a task run in the worker process can't be measured
+        self.assertFalse('max_rss_kb' in usages[0])
+        self.assertEqual(self.sch.resource_usage()['DummyTask']['count'], 1)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/clear_refs'), 'needs /proc/self/clear_refs')
+    def test_resource_usage_excludes_inherited_memory(self):
+        ballast = bytearray(200 * 1024 * 1024)  # noqa, inherited by the forked task
+
+        class Allocating(luigi.Task):
+            def run(self):
+                self.buffer = bytearray(20 * 1024 * 1024)
+
+        usages = []
+
+        @Allocating.event_handler(Event.RESOURCE_USAGE)
+        def record(task, usage):
+            usages.append(usage)
+
+        w = Worker(scheduler=self.sch, worker_processes=2)
+        try:
+            self.assertTrue(w.add(Allocating()))
+            self.assertTrue(w.run())
+        finally:
+            w.stop()
+            Allocating.remove_event_handler(Event.RESOURCE_USAGE, record)
+        self.assertEqual(len(usages), 1)
+        self.assertTrue(10 * 1024 <= usages[0]['max_rss_kb'] < 100 * 1024, usages[0])
+        del ballast
+
+    def _run_duplicate_dynamic_dependencies(self):
+        requirement_counts = []
+
+        class DynamicDuplicates(Task):
+            p = luigi.Parameter()
+
+            def output(self):
+                return luigi.LocalTarget(os.path.join(self.p, 'parent'))
+
+            def run(self):
+                yield [DynamicDummyTask(os.path.join(self.p, str(i % 3))) for i in range(9)]
+                with self.output().open('w') as f:
+                    f.write('Done!')
+
+        @DynamicDuplicates.event_handler(Event.NEW_REQUIREMENTS_TIME)
+        def count(task, seconds, n):
+            requirement_counts.append(n)
+
+        t = DynamicDuplicates(p=tempfile.mktemp())
+        self.assertTrue(self.w.add(t))
+        self.assertTrue(self.w.run())
+        self.assertTrue(t.complete())
+        self.assertTrue(requirement_counts)
+        self.assertEqual(set(requirement_counts), set([3]))  # duplicates are loaded once
+
+    def test_dynamic_dependencies_batched(self):
+        batches = []
+        add_tasks = self.sch.add_tasks
+
+        def recording_add_tasks(worker, tasks):
+            batches.append([kwargs['task_id'] for kwargs in tasks])
+            add_tasks(worker, tasks)
+
+        self.sch.add_tasks = recording_add_tasks
+        self._run_duplicate_dynamic_dependencies()
+        self.assertTrue(batches)
+        for batch in batches:
+            self.assertEqual(len(batch), 3)
+
+    def test_dynamic_dependencies_without_add_tasks(self):
+        def missing_add_tasks(worker, tasks):
+            raise AttributeError('add_tasks')
+
+        self.sch.add_tasks = missing_add_tasks
+        self._run_duplicate_dynamic_dependencies()
+        self.assertFalse(self.w._batch_add_supported)
+
+
+class BatchTask(Task):
+    n = luigi.IntParameter()
+    batch_params = ['n']
+    max_batch_size = 3
+    batches = []
+    failing = set()
+
+    def __init__(self, *args, **kwargs):
+        super(BatchTask, self).__init__(*args, **kwargs)
+        self.has_run = False
+
+    def complete(self):
+        return self.has_run
+
+    @classmethod
+    def run_batch(cls, tasks):
+        cls.batches.append(sorted(t.n for t in tasks))
+        for t in tasks:
+            t.has_run = t.n not in cls.failing
+        return dict((t, ValueError(t.n)) for t in tasks if t.n in cls.failing)
+
+
+class BatchTest(unittest.TestCase):
+    class All(luigi.WrapperTask):
+        n = luigi.IntParameter()
+
+        def requires(self):
+            return [BatchTask(i) for i in range(self.n)]
+
+    def setUp(self):
+        self.sch = CentralPlannerScheduler(retry_delay=100, remove_delay=1000, worker_disconnect_delay=10)
+        self.w = Worker(scheduler=self.sch, worker_id='X')
+        BatchTask.batches = []
+        BatchTask.failing = set()
+        luigi.task.Register.clear_instance_cache()
+
+    def tearDown(self):
+        self.w.stop()
+        luigi.task.Register.clear_instance_cache()
+
+    def test_batches(self):
+        self.assertTrue(self.w.add(self.All(7)))
+        self.assertTrue(self.w.run())
+        self.assertEqual(sorted(len(b) for b in BatchTask.batches), [1, 3, 3])
+        self.assertEqual(sorted(sum(BatchTask.batches, [])), range(7))
+        self.assertEqual(self.sch.task_list('DONE', '').keys().count('All(n=7)'), 1)
+
+    def test_partial_failure(self):
+        BatchTask.failing = set([1])
+        self.assertTrue(self.w.add(self.All(3)))
+        self.assertFalse(self.w.run())
+        self.assertEqual(BatchTask.batches, [[0, 1, 2]])
+        self.assertEqual(sorted(self.sch.task_list('FAILED', '').keys()), ['BatchTask(n=1)'])
+        self.assertEqual(sorted(self.sch.task_list('DONE', '').keys()), ['BatchTask(n=0)', 'BatchTask(n=2)'])
+
+    def test_default_run_batch(self):
+        class Plain(DummyTask):
+            n = luigi.IntParameter()
+            batch_params = ['n']
+
+        self.assertTrue(self.w.add(Plain(0)))
+        self.assertTrue(self.w.add(Plain(1)))
+        self.assertTrue(self.w.run())
+        self.assertTrue(Plain(0).has_run and Plain(1).has_run)
+
+    def test_default_run_batch_failure_traceback(self):
+        messages = []
+
+        class Failing(DummyTask):
+            n = luigi.IntParameter()
+            batch_params = ['n']
+
+            def run(self):
+                if self.n:
+                    raise ValueError('broken %d' % self.n)
+                super(Failing, self).run()
+
+            def on_failure(self, exception):
+                messages.append(super(Failing, self).on_failure(exception))
+                return messages[-1]
+
+        self.assertTrue(self.w.add(Failing(0)))
+        self.assertTrue(self.w.add(Failing(1)))
+        self.assertFalse(self.w.run())
+        self.assertEqual(len(messages), 1)
+        self.assertTrue("raise ValueError('broken %d' % self.n)" in messages[0], messages[0])
+        self.assertEqual(self.sch.task_list('DONE', '').keys(), ['Failing(n=0)'])
+
+    def test_returned_exception_reported(self):
+        BatchTask.failing = set([1])
+        messages = []
+
+        def on_failure(task, exception):
+            messages.append(Task.on_failure(task, exception))
+            return messages[-1]
+
+        BatchTask.on_failure = on_failure
+        try:
+            self.assertTrue(self.w.add(self.All(2)))
+            self.assertFalse(self.w.run())
+        finally:
+            del BatchTask.on_failure
+        self.assertEqual(len(messages), 1)
+        self.assertTrue('ValueError: 1' in messages[0], messages[0])
+
+    def test_yielding_run_not_batched(self):
+        class Yielding(DummyTask):
+            n = luigi.IntParameter()
+            batch_params = ['n']
+
+            def run(self):
+                yield DummyTask()
+                super(Yielding, self).run()
+
+        self.assertTrue(self.w.add(Yielding(0)))
+        self.assertTrue(self.w.add(Yielding(1)))
+        self.assertTrue(self.w.run())
+        self.assertTrue(DummyTask().complete())
+        self.assertTrue(Yielding(0).has_run and Yielding(1).has_run)
+        self.assertEqual(sorted(self.sch.task_list('DONE', '').keys()),
+                         ['DummyTask()', 'Yielding(n=0)', 'Yielding(n=1)'])
+
+
 class WorkerPingThreadTests(unittest.TestCase):
     def test_ping_retry(self):
         """ Worker ping fails once. Ping continues to try to connect to scheduler